@@ -0,0 +1,97 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+"""
+Group-by, filter and aggregation over the columns of describe_instances
+items, compared with plain loops over the dicts.
+
+    $ PYTHONPATH=. python benchmarks/bench_columns.py --items 1000000 [--no-numpy]
+"""
+import argparse
+import random
+import time
+
+from petaexpress.iaas import columns
+from petaexpress.iaas.columns import to_columns, mask_and
+
+FIELDS = ['instance_id', 'instance_type', 'status', 'vcpus_current',
+          'memory_current', 'vxnets.vxnet_id']
+
+
+def make_instance(i):
+    return {
+        'instance_id': 'i-%08x' % i,
+        'instance_type': random.choice(['c1m1', 'c2m4', 'c4m8', 'c8m16']),
+        'status': random.choice(['running', 'stopped', 'suspended']),
+        'vcpus_current': random.choice([1, 2, 4, 8]),
+        'memory_current': random.choice([1024, 4096, 8192]),
+        'vxnets': [{'vxnet_id': 'vxnet-%07d' % (i % 20)}],
+    }
+
+
+def timed(func):
+    start = time.time()
+    result = func()
+    return result, (time.time() - start) * 1000
+
+
+def with_dicts(items):
+    ret = {}
+    for item in items:
+        if item['status'] != 'running' or item['memory_current'] < 4096:
+            continue
+        group = ret.setdefault(item['instance_type'], {'count': 0, 'cpu': 0})
+        group['count'] += 1
+        group['cpu'] += item['vcpus_current']
+    return ret
+
+
+def with_columns(cols):
+    mask = mask_and(cols.where('status', '==', 'running'),
+                    cols.where('memory_current', '>=', 4096))
+    return cols.filter(mask).group_by('instance_type',
+                                      count=('instance_id', 'count'),
+                                      cpu=('vcpus_current', 'sum'))
+
+
+def with_columns_unfiltered(cols):
+    return cols.group_by('vxnets.vxnet_id', count=('instance_id', 'count'),
+                         cpu=('vcpus_current', 'sum'),
+                         memory=('memory_current', 'mean'))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=1000000)
+    parser.add_argument('--no-numpy', action='store_true')
+    args = parser.parse_args()
+    if args.no_numpy:
+        columns.numpy = None
+
+    random.seed(0)
+    items = [make_instance(i) for i in range(args.items)]
+    cols, build = timed(lambda: to_columns(items, FIELDS))
+    print('%d instances, numpy %s' % (args.items,
+                                      'installed' if columns.numpy else 'missing'))
+    print('%-32s %10.1f ms' % ('to_columns', build))
+    print('%-32s %10.1f ms' % ('dicts: filter + group_by', timed(lambda: with_dicts(items))[1]))
+    print('%-32s %10.1f ms' % ('columns: filter + group_by', timed(lambda: with_columns(cols))[1]))
+    print('%-32s %10.1f ms' % ('columns: group_by vxnets', timed(lambda: with_columns_unfiltered(cols))[1]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+"""
+Contention benchmark of ConnectionPool.
+
+Every thread checks a connection out of the pool and puts it back,
+spread over a number of hosts like a multi-bucket QingStor transfer.
+The lock is only held for deque operations, so throughput stays flat
+as threads are added instead of collapsing.
+
+    $ PYTHONPATH=. python benchmarks/bench_connection_pool.py --hosts 64
+"""
+import argparse
+import threading
+import time
+
+from petaexpress.conn.connection import ConnectionPool
+
+
+class FakeConnection(object):
+
+    def close(self):
+        pass
+
+
+def run(pool, threads, hosts, ops):
+    barrier = threading.Event()
+
+    def worker(index):
+        barrier.wait()
+        for i in range(ops):
+            host = 'bucket-%d.qingstor.com' % ((index + i) % hosts)
+            conn = pool.get_conn(host, 443) or FakeConnection()
+            pool.put_conn(host, 443, conn)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for w in workers:
+        w.start()
+    start = time.time()
+    barrier.set()
+    for w in workers:
+        w.join()
+    elapsed = time.time() - start
+    pool.close()
+    return threads * ops / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--hosts', type=int, default=64)
+    parser.add_argument('--ops', type=int, default=20000)
+    parser.add_argument('--threads', type=int, nargs='+',
+                        default=[1, 8, 32, 64, 128])
+    args = parser.parse_args()
+
+    print('%8s %16s' % ('threads', 'checkouts'))
+    for threads in args.threads:
+        ops = max(args.ops // threads, 100)
+        rate = run(ConnectionPool(), threads, args.hosts, ops)
+        print('%8d %14.0f/s' % (threads, rate))
+
+if __name__ == '__main__':
+    main()
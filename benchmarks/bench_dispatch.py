@@ -0,0 +1,64 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+"""
+Cost of creating an APIConnection and of looking up its api methods.
+
+    $ PYTHONPATH=. python benchmarks/bench_dispatch.py
+"""
+import argparse
+import timeit
+
+from petaexpress.iaas.connection import APIConnection
+
+METHODS = ['describe_instances', 'describe_volumes', 'describe_tags',
+           'describe_vpc_borders', 'describe_wan_accesss']
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', type=int, default=20000)
+    args = parser.parse_args()
+
+    def construct():
+        conn = APIConnection('access_key_id', 'secret_access_key', 'zone')
+        conn.describe_instances
+
+    conn = APIConnection('access_key_id', 'secret_access_key', 'zone')
+
+    def construct_shared_pool():
+        c = APIConnection('access_key_id', 'secret_access_key', 'zone',
+                          pool=conn._conn)
+        c.describe_instances
+
+    def dispatch():
+        for method in METHODS:
+            getattr(conn, method)
+
+    construct()
+    dispatch()
+    number = args.number
+    construction = timeit.timeit(construct, number=number // 10) / (number // 10)
+    shared = timeit.timeit(construct_shared_pool, number=number // 10) / (number // 10)
+    lookup = timeit.timeit(dispatch, number=number) / number / len(METHODS)
+    print('%-24s %8.2f us' % ('construct + first call', construction * 1e6))
+    print('%-24s %8.2f us' % ('  with a shared pool', shared * 1e6))
+    print('%-24s %8.3f us' % ('method lookup', lookup * 1e6))
+
+
+if __name__ == '__main__':
+    main()
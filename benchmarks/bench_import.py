@@ -0,0 +1,92 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+"""
+Import time of the packages, measured with `python -X importtime` in fresh
+interpreters. With --max-ms, exit with an error if a median is above it.
+
+    $ PYTHONPATH=. python benchmarks/bench_import.py --runs 10 --max-ms 50
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+MODULES = ['petaexpress', 'petaexpress.iaas', 'petaexpress.iaas.connection',
+           'petaexpress.qingstor']
+
+
+def top_level_imports(code):
+    """ Run python code with -X importtime.
+    @return list of (module, cumulative microseconds) of the imports which
+            are not nested in another one.
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [os.path.dirname(os.path.dirname(os.path.abspath(__file__)))] +
+        [p for p in env.get('PYTHONPATH', '').split(os.pathsep) if p])
+    output = subprocess.check_output(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        stderr=subprocess.STDOUT, env=env).decode()
+    imports = []
+    for line in output.splitlines():
+        # import time: self [us] | cumulative | imported package
+        parts = line.split('|')
+        if len(parts) == 3 and parts[1].strip().isdigit() \
+                and not parts[2].startswith('  '):
+            imports.append((parts[2].strip(), int(parts[1])))
+    return imports
+
+
+def import_time(module, startup):
+    """ @return the microseconds of importing a module with its parent
+                packages and dependencies, excluding the modules imported
+                by the interpreter startup.
+    """
+    return sum(us for name, us in top_level_imports('import %s' % module)
+               if name not in startup)
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--max-ms', type=float, default=None,
+                        help='fail if the median of a module is above it')
+    parser.add_argument('modules', nargs='*', default=MODULES)
+    args = parser.parse_args()
+
+    startup = set(name for name, _ in top_level_imports('pass'))
+    failed = []
+    for module in args.modules:
+        import_time(module, startup)    # compile the byte code first
+        ms = median([import_time(module, startup)
+                     for _ in range(args.runs)]) / 1000.0
+        print('%-32s %8.1f ms' % (module, ms))
+        if args.max_ms is not None and ms > args.max_ms:
+            failed.append(module)
+    if failed:
+        print('slower than %s ms: %s' % (args.max_ms, ', '.join(failed)))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
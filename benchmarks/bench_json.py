@@ -0,0 +1,77 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+"""
+Compare the installed json codecs on the payload shapes of
+describe_instances and get_monitoring_data responses.
+
+    $ PYTHONPATH=. python benchmarks/bench_json.py --items 1000
+"""
+import argparse
+import time
+
+from benchmarks.bench_response_parse import make_body
+from petaexpress.misc import json_tool
+
+
+def make_monitoring_body(points):
+    # compressed meter data: [first timestamp, value], values,
+    # [timestamp offset, value] after gaps and "NA"
+    meters = []
+    for meter_id in ('cpu', 'memory', 'disk-os', 'if-52:54:00:00:00:00'):
+        data = [[1391854500, [12, 30]]]
+        for i in range(1, points):
+            if i % 50 == 0:
+                data.append('NA')
+            elif i % 20 == 0:
+                data.append([600, [i % 100, i % 7]])
+            else:
+                data.append([i % 100, i % 7])
+        meters.append({'meter_id': meter_id, 'data': data})
+    body = {'action': 'GetMonitorResponse', 'ret_code': 0,
+            'resource_id': 'i-00000000', 'meter_set': meters}
+    return json_tool.STDLIB_CODEC.dumps(body).encode('utf-8')
+
+
+def bench(func, arg, rounds):
+    start = time.time()
+    for _ in range(rounds):
+        func(arg)
+    return (time.time() - start) / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=1000)
+    parser.add_argument('--points', type=int, default=2000)
+    parser.add_argument('--rounds', type=int, default=30)
+    args = parser.parse_args()
+
+    payloads = [('describe_instances', make_body(args.items)),
+                ('get_monitoring_data', make_monitoring_body(args.points))]
+    print('%-20s %-8s %10s %10s' % ('payload', 'codec', 'load', 'dump'))
+    for name, body in payloads:
+        obj = json_tool.STDLIB_CODEC.loads(body)
+        for codec_name in json_tool.available_codecs():
+            json_tool.set_codec(codec_name)
+            load = bench(json_tool.json_load, body, args.rounds)
+            dump = bench(json_tool.json_dump, obj, args.rounds)
+            print('%-20s %-8s %7.2f ms %7.2f ms' % (name, codec_name, load, dump))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+"""
+Memory kept by describe_instances items loaded as dicts compared with
+the models of petaexpress.iaas.models.
+
+    $ PYTHONPATH=. python benchmarks/bench_models.py --items 100000
+"""
+import argparse
+import gc
+import json
+import random
+import tracemalloc
+
+from petaexpress.iaas.models import iter_models, Instance
+from petaexpress.misc.json_tool import json_load
+
+
+def make_instance(i):
+    ts = '2026-%02d-%02dT%02d:%02d:%02dZ' % (i % 12 + 1, i % 28 + 1, i % 24,
+                                             i % 60, (i * 7) % 60)
+    return {
+        'instance_id': 'i-%08x' % i,
+        'instance_name': 'web-%d' % (i % 500),
+        'description': '',
+        'instance_type': random.choice(['c1m1', 'c2m4', 'c4m8']),
+        'instance_class': 0,
+        'vcpus_current': 2,
+        'memory_current': 4096,
+        'status': random.choice(['running', 'stopped']),
+        'transition_status': '',
+        'sub_code': 0,
+        'create_time': ts,
+        'status_time': ts,
+        'alarm_status': '',
+        'graphics_protocol': 'vnc',
+        'owner': 'usr-00000001',
+        'zone_id': 'pek3a',
+        'keypair_ids': ['kp-%08x' % (i % 10)],
+        'volume_ids': ['vol-%08x' % i],
+        'image': {'image_id': 'img-00000001', 'image_name': 'Ubuntu Server 22.04',
+                  'os_family': 'ubuntu', 'platform': 'linux',
+                  'processor_type': '64bit', 'provider': 'system'},
+        'vxnets': [{'vxnet_id': 'vxnet-%07d' % (i % 20), 'vxnet_name': 'default',
+                    'vxnet_type': 1, 'nic_id': '52:54:%02x:%02x:%02x:%02x' % (
+                        i >> 24 & 255, i >> 16 & 255, i >> 8 & 255, i & 255),
+                    'private_ip': '10.%d.%d.%d' % (i >> 16 & 255, i >> 8 & 255, i & 255),
+                    'role': 1}],
+        'security_group': {'security_group_id': 'sg-00000001',
+                           'is_default': 1},
+        'eip': {'eip_id': '', 'eip_addr': '', 'bandwidth': 0},
+        'tags': [{'tag_id': 'tag-00000001', 'tag_name': 'prod', 'color': '#f00'}],
+        'dns_aliases': [],
+        'extra': {'block_bus': 'virtio', 'nic_mqueue': 0},
+    }
+
+
+def retained(build, data):
+    gc.collect()
+    tracemalloc.start()
+    result = build(data)
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size / 1024.0 / 1024.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=100000)
+    args = parser.parse_args()
+
+    random.seed(0)
+    data = json.dumps({'instance_set': [make_instance(i) for i in range(args.items)]})
+
+    def load_dicts(data):
+        return json_load(data)['instance_set']
+
+    def load_models(data):
+        return list(iter_models(json_load(data)['instance_set'], Instance))
+
+    dicts = retained(load_dicts, data)
+    models = retained(load_models, data)
+    print('%d instances' % args.items)
+    print('%-8s %8.1f MB' % ('dicts', dicts))
+    print('%-8s %8.1f MB  (%.1fx smaller)' % ('models', models, dicts / models))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+"""
+CPU cost of parsing a large describe_instances response.
+
+Compares the former path (decode, parse to check ret_code, parse again)
+with the single parse of APIConnection._parse_response, which uses orjson
+when it is installed.
+
+    $ PYTHONPATH=. python benchmarks/bench_response_parse.py --items 1000
+"""
+import argparse
+import json
+import time
+
+from petaexpress.iaas.connection import APIConnection
+
+
+def make_body(items):
+    instance = {
+        'instance_id': 'i-00000000', 'instance_name': 'web server',
+        'status': 'running', 'transition_status': '', 'memory_current': 4096,
+        'vcpus_current': 2, 'create_time': '2026-01-01T00:00:00Z',
+        'vxnets': [{'vxnet_id': 'vxnet-0', 'private_ip': '192.168.0.2',
+                    'nic_id': '52:54:00:00:00:00', 'vxnet_type': 1}],
+        'image': {'image_id': 'img-00000000', 'platform': 'linux',
+                  'os_family': 'ubuntu', 'processor_type': '64bit'},
+        'tags': [{'tag_id': 'tag-00000000', 'tag_name': 'prod', 'color': '#fff'}],
+        'security_group': {'security_group_id': 'sg-00000000'},
+        'description': 'x' * 64,
+    }
+    return json.dumps({'action': 'DescribeInstancesResponse', 'ret_code': 0,
+                       'total_count': items,
+                       'instance_set': [instance] * items}).encode()
+
+
+def former_parse(resp_str):
+    resp_str = resp_str.decode()
+    if resp_str and json.loads(resp_str).get('ret_code') in (5000, 5100):
+        return None
+    return json.loads(resp_str) if resp_str else ''
+
+
+def bench(func, body, rounds):
+    start = time.time()
+    for _ in range(rounds):
+        func(body)
+    return (time.time() - start) / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=1000)
+    parser.add_argument('--rounds', type=int, default=50)
+    args = parser.parse_args()
+
+    conn = APIConnection('access key id', 'secret access key', 'zone')
+    body = make_body(args.items)
+    print('body: %.1f KB' % (len(body) / 1024.0))
+    print('%-24s %8.2f ms' % ('decode + parse twice', bench(former_parse, body, args.rounds)))
+    print('%-24s %8.2f ms' % ('parse once', bench(conn._parse_response, body, args.rounds)))
+
+
+if __name__ == '__main__':
+    main()
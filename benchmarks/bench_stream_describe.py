@@ -0,0 +1,63 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+"""
+Peak memory of loading a large describe_instances response at once
+compared with streaming its items, with and without field projection.
+
+    $ PYTHONPATH=. python benchmarks/bench_stream_describe.py --items 5000
+"""
+import argparse
+import tracemalloc
+from io import BytesIO
+
+from benchmarks.bench_response_parse import make_body
+from petaexpress.misc.json_stream import ResponseStream
+from petaexpress.misc.json_tool import json_load
+
+
+def load_at_once(body):
+    data = body.read()
+    return [i['instance_id'] for i in json_load(data)['instance_set']]
+
+
+def stream(body, fields=None):
+    return [i['instance_id'] for i in ResponseStream(body, fields=fields)]
+
+
+def peak(func, data, *args):
+    tracemalloc.start()
+    func(BytesIO(data), *args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024.0 / 1024.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=5000)
+    args = parser.parse_args()
+
+    data = make_body(args.items)
+    print('body: %.1f MB' % (len(data) / 1024.0 / 1024.0))
+    print('%-24s %8.1f MB' % ('load at once', peak(load_at_once, data)))
+    print('%-24s %8.1f MB' % ('stream', peak(stream, data)))
+    print('%-24s %8.1f MB' % ('stream instance_id', peak(stream, data, ['instance_id'])))
+
+
+if __name__ == '__main__':
+    main()
@@ -14,4 +14,28 @@
 # limitations under the License.
 # =========================================================================
 
-__import__('pkg_resources').declare_namespace(__name__)
+import os as _os
+import sys as _sys
+
+
+def _extend_path(path, name):
+    """ Add the directories of the package found in sys.path, like
+        `pkgutil.extend_path` does for a namespace package spread over
+        several distributions, without importing pkgutil or pkg_resources
+        which take longer to import than the package itself.
+    """
+    path = list(path)
+    seen = set(_os.path.realpath(p) for p in path)
+    for entry in _sys.path:
+        if not isinstance(entry, str):
+            continue
+        portion = _os.path.join(entry or _os.curdir, name)
+        if _os.path.isdir(portion):
+            real = _os.path.realpath(portion)
+            if real not in seen:
+                seen.add(real)
+                path.append(portion)
+    return path
+
+
+__path__ = _extend_path(__path__, __name__)
@@ -0,0 +1,458 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+"""
+Http connection over asyncio streams, requires Python 3.5 or higher.
+"""
+
+import asyncio
+import os
+import ssl
+import time
+from collections import deque
+
+from petaexpress.conn.compression import create_decoder
+from petaexpress.conn.connection import HttpConnection
+
+
+class AsyncConnection(object):
+    """ A keep-alive http connection over asyncio streams
+    """
+
+    def __init__(self, key, reader, writer):
+        self.key = key
+        self.reader = reader
+        self.writer = writer
+        self.created_time = time.time()
+        self.reused = False
+
+    @classmethod
+    async def open(cls, host, port, secure, timeout=None):
+        ssl_context = ssl.create_default_context() if secure else None
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=ssl_context,
+                                    server_hostname=host if secure else None),
+            timeout)
+        return cls((host, port, secure), reader, writer)
+
+    def is_usable(self):
+        return not self.writer.is_closing() and not self.reader.at_eof()
+
+    def close(self):
+        self.writer.close()
+
+
+class AsyncConnectionPool(object):
+    """ Keep-alive connection pool for multiple hosts used by
+        one event loop. The number of sockets opened to one host
+        is bounded by `max_connections`, extra requests wait for
+        a connection to be given back.
+    """
+
+    def __init__(self, timeout=60, max_idle=None, max_connections=100,
+                 max_lifetime=None):
+        """
+        @param timeout - seconds a connection may stay idle in the pool
+        @param max_idle - max number of idle connections kept per host
+        @param max_connections - max number of connections opened per host
+        @param max_lifetime - seconds since creation after which a connection
+                              is not reused any more
+        """
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_connections = max_connections
+        self.max_lifetime = max_lifetime
+        self.queues = {}
+        self.semaphores = {}
+
+    def size(self):
+        return sum([len(queue) for queue in self.queues.values()])
+
+    def _is_conn_valid(self, conn_info):
+        (conn, time_stamp) = conn_info
+        curr_time = time.time()
+        if curr_time - time_stamp > self.timeout:
+            return False
+        if self.max_lifetime is not None and \
+                curr_time - conn.created_time > self.max_lifetime:
+            return False
+        return conn.is_usable()
+
+    async def get_conn(self, host, port, secure, timeout=None):
+        # get an idle connection of the host or open a new one
+        key = (host, port, secure)
+        semaphore = self.semaphores.get(key)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_connections)
+            self.semaphores[key] = semaphore
+        await semaphore.acquire()
+        try:
+            queue = self.queues.get(key)
+            while queue:
+                conn_info = queue.pop()
+                if self._is_conn_valid(conn_info):
+                    conn = conn_info[0]
+                    conn.reused = True
+                    return conn
+                conn_info[0].close()
+            return await AsyncConnection.open(host, port, secure, timeout)
+        except BaseException:
+            semaphore.release()
+            raise
+
+    def put_conn(self, conn):
+        # give back a connection whose response has been read completely
+        queue = self.queues.setdefault(conn.key, deque())
+        queue.append((conn, time.time()))
+        while queue and (not self._is_conn_valid(queue[0]) or
+                         (self.max_idle is not None and len(queue) > self.max_idle)):
+            queue.popleft()[0].close()
+        self.semaphores[conn.key].release()
+
+    def discard_conn(self, conn):
+        # give back a connection which can not be reused
+        conn.close()
+        self.semaphores[conn.key].release()
+
+    async def close(self):
+        # close all idle connections
+        for queue in self.queues.values():
+            while queue:
+                queue.pop()[0].close()
+        self.queues = {}
+
+
+class AsyncHTTPResponse(object):
+    """ Response read from an asyncio connection.
+        The connection is given back to the pool once the body has
+        been read completely, or discarded by `close`.
+    """
+
+    def __init__(self, pool, conn, method, timeout=None):
+        self._pool = pool
+        self._conn = conn
+        self._method = method
+        self._timeout = timeout
+        self._cached_response = None
+        self._chunked = False
+        self._chunk_left = 0
+        self._keep_alive = True
+        self._closed = False
+        self.status = None
+        self.reason = None
+        self.version = None
+        self.headers = []
+        self.length = None
+        self._decoder = None
+        self._decoded = b''
+
+    def _wait(self, coro):
+        return asyncio.wait_for(coro, self._timeout)
+
+    async def begin(self):
+        reader = self._conn.reader
+        line = await self._wait(reader.readline())
+        if not line:
+            raise ConnectionResetError('connection closed by remote host')
+        parts = line.decode('latin-1').rstrip('\r\n').split(None, 2)
+        if len(parts) < 2 or not parts[0].startswith('HTTP/'):
+            raise ValueError('invalid status line: %r' % line)
+        self.version = parts[0]
+        self.status = int(parts[1])
+        self.reason = parts[2] if len(parts) > 2 else ''
+        while True:
+            line = await self._wait(reader.readline())
+            line = line.decode('latin-1').rstrip('\r\n')
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            self.headers.append((name.strip(), value.strip()))
+
+        connection = (self.getheader('connection') or '').lower()
+        if self.version == 'HTTP/1.0':
+            self._keep_alive = connection == 'keep-alive'
+        else:
+            self._keep_alive = connection != 'close'
+
+        encoding = (self.getheader('transfer-encoding') or '').lower()
+        length = self.getheader('content-length')
+        if self._method == 'HEAD' or self.status in (204, 304) or \
+                100 <= self.status < 200:
+            self.length = 0
+        elif 'chunked' in encoding:
+            self._chunked = True
+        elif length is not None:
+            self.length = int(length)
+        else:
+            # body is delimited by closing the connection
+            self._keep_alive = False
+        if self.length == 0:
+            self._release()
+
+    def decode_content(self):
+        """ Decompress the body according to its Content-Encoding,
+            called when the connection asked for a compressed response.
+        """
+        self._decoder = create_decoder(self.getheader('content-encoding'))
+
+    def getheader(self, name, default=None):
+        name = name.lower()
+        for key, value in self.headers:
+            if key.lower() == name:
+                return value
+        return default
+
+    def getheaders(self):
+        return list(self.headers)
+
+    def isclosed(self):
+        return self._closed
+
+    def _release(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._keep_alive:
+            self._pool.put_conn(self._conn)
+        else:
+            self._pool.discard_conn(self._conn)
+
+    def close(self):
+        # stop reading, the connection can not be reused
+        if not self._closed:
+            self._closed = True
+            self._pool.discard_conn(self._conn)
+
+    async def _read_some(self, amt):
+        # a failed read leaves the connection in an unknown state, close
+        # it so that its slot of the pool is given back
+        try:
+            return await self._read_body(amt)
+        except BaseException:
+            self.close()
+            raise
+
+    async def _read_body(self, amt):
+        reader = self._conn.reader
+        if self._closed:
+            return b''
+        if self._chunked:
+            if self._chunk_left == 0:
+                line = await self._wait(reader.readline())
+                size = int(line.split(b';')[0].strip() or b'0', 16)
+                if size == 0:
+                    # skip trailers
+                    while (await self._wait(reader.readline())).strip():
+                        pass
+                    self._release()
+                    return b''
+                self._chunk_left = size
+            size = self._chunk_left if amt is None else min(amt, self._chunk_left)
+            data = await self._wait(reader.readexactly(size))
+            self._chunk_left -= size
+            if self._chunk_left == 0:
+                await self._wait(reader.readexactly(2))
+            return data
+        if self.length is not None:
+            size = self.length if amt is None else min(amt, self.length)
+            data = await self._wait(reader.read(size))
+            if not data:
+                raise asyncio.IncompleteReadError(b'', self.length)
+            self.length -= len(data)
+            if self.length == 0:
+                self._release()
+            return data
+        data = await self._wait(reader.read(amt or 65536))
+        if not data:
+            self._release()
+        return data
+
+    async def read(self, amt=None):
+        """ Read the response.
+
+        If this method is called without amt argument, the response body
+        will be cached. Subsequent calls without arguments will return
+        the cached response.
+        """
+        if amt is not None and self._decoder is not None:
+            return await self._read_decoded(amt)
+        if amt is not None:
+            return await self._read_some(amt)
+        if self._cached_response is None:
+            chunks = []
+            while True:
+                data = await self._read_some(None)
+                if not data:
+                    break
+                chunks.append(data)
+            data = b''.join(chunks)
+            if self._decoder is not None:
+                data = self._decoder.decompress(data) + self._decoder.flush()
+            self._cached_response = data
+        return self._cached_response
+
+    async def _read_decoded(self, amt):
+        while len(self._decoded) < amt:
+            data = await self._read_some(amt)
+            if not data:
+                self._decoded += self._decoder.flush()
+                break
+            self._decoded += self._decoder.decompress(data)
+        data, self._decoded = self._decoded[:amt], self._decoded[amt:]
+        return data
+
+
+class AsyncHttpConnection(HttpConnection):
+    """
+    Connection control to restful service over asyncio streams
+    """
+
+    BLOCK_SIZE = 64 * 1024
+
+    def _init_async_pool(self, pool=None, max_connections=100):
+        # replace the thread-safe pool by one bound to the event loop
+        self._conn = pool if pool else AsyncConnectionPool(
+            max_connections=max_connections)
+
+    async def close(self):
+        """ Close idle connections of the pool
+        """
+        await self._conn.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _get_body_length(self, body):
+        try:
+            return len(body)
+        except TypeError:
+            pass
+        try:
+            return os.fstat(body.fileno()).st_size - body.tell()
+        except (AttributeError, OSError):
+            pass
+        try:
+            position = body.tell()
+            body.seek(0, os.SEEK_END)
+            length = body.tell() - position
+            body.seek(position)
+            return length
+        except (AttributeError, OSError):
+            return None
+
+    async def _write_request(self, conn, method, path, header, body,
+                             chunked=False):
+        """ Write the request, a file-like body is sent block by block,
+            in chunks if `chunked` since its length is unknown.
+        """
+        writer = conn.writer
+        lines = ['%s %s HTTP/1.1' % (method, path)]
+        for name, value in header.items():
+            lines.append('%s: %s' % (name, value))
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        if hasattr(body, 'read'):
+            while True:
+                block = body.read(self.BLOCK_SIZE)
+                if not block:
+                    break
+                if isinstance(block, str):
+                    block = block.encode('utf-8')
+                if chunked:
+                    block = b'%x\r\n%s\r\n' % (len(block), block)
+                writer.write(block)
+                await writer.drain()
+            if chunked:
+                writer.write(b'0\r\n\r\n')
+        elif body:
+            writer.write(body)
+        await writer.drain()
+
+    async def send(self, method, path, params=None, headers=None, host=None,
+                   auth_path=None, data=""):
+
+        if not params:
+            params = {}
+
+        if not headers:
+            headers = {}
+
+        if not host:
+            host = self.host
+
+        if not self.qy_access_key_id and not self.qy_secret_access_key:
+            if self._token:
+                path = '/iam/'
+
+        if self._proxy_protocol:
+            raise NotImplementedError(
+                "proxy is not supported by asyncio connections")
+
+        # Build the http request
+        request = self.build_http_request(method, path, params, auth_path,
+                                          headers, host, data)
+        request.authorize(self)
+        decode = self._set_content_encoding(request)
+
+        body = request.body
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        header = dict(request.header or {})
+        names = set([name.lower() for name in header])
+        if 'host' not in names:
+            header['Host'] = host if self.port in (80, 443) else \
+                '%s:%s' % (host, self.port)
+        chunked = False
+        if 'content-length' not in names and 'transfer-encoding' not in names \
+                and (body or method in ('POST', 'PUT')):
+            length = self._get_body_length(body) if body else 0
+            if length is not None:
+                header['Content-Length'] = str(length)
+            else:
+                # e.g. a pipe, the body is delimited by chunks
+                header['Transfer-Encoding'] = 'chunked'
+                chunked = True
+        elif 'transfer-encoding' in names:
+            chunked = any(name.lower() == 'transfer-encoding' and
+                          'chunked' in value.lower()
+                          for name, value in header.items())
+        if 'accept-encoding' not in names:
+            header['Accept-Encoding'] = 'identity'
+
+        while True:
+            conn = await self._conn.get_conn(host, self.port, self.secure,
+                                             self.http_socket_timeout)
+            response = AsyncHTTPResponse(self._conn, conn, method,
+                                         self.http_socket_timeout)
+            try:
+                await self._write_request(conn, method, request.path,
+                                          header, body, chunked)
+                await response.begin()
+                if decode:
+                    response.decode_content()
+            except (ConnectionError, asyncio.IncompleteReadError):
+                response.close()
+                # the server may have closed an idle keep-alive connection
+                if conn.reused and not hasattr(body, 'read'):
+                    continue
+                raise
+            except BaseException:
+                response.close()
+                raise
+            return response
@@ -16,8 +16,10 @@
 
 import sys
 import hmac
+import threading
 import base64
 import datetime
+from collections import OrderedDict
 from hashlib import sha1, sha256
 
 try:
@@ -27,7 +29,10 @@ except:
     import urllib
     is_python3 = False
 
-from past.builtins import basestring
+try:
+    basestring
+except NameError:
+    basestring = str
 
 from petaexpress.misc.json_tool import json_dump, json_load
 from petaexpress.misc.utils import get_utf8_value, get_ts, base64_url_decode,\
@@ -144,6 +149,50 @@ class QuerySignatureAuthHandler(HmacKeys):
                         '&signature=' + urllib.quote_plus(signature))
 
 
+# the max number of cached query signers
+MAX_QUERY_SIGNERS = 1024
+
+
+class SignerCache(object):
+    """ The `QuerySignatureAuthHandler`s of credential sets, shared by the
+        connections using the same one since signing does not change
+        their state. Signers are found by a digest of the credentials,
+        the least recently used ones are evicted.
+    """
+
+    def __init__(self, max_size=MAX_QUERY_SIGNERS):
+        """
+        @param max_size: the max number of signers kept.
+        """
+        self.max_size = max_size
+        self.signers = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.signers)
+
+    def _key(self, host, qy_access_key_id, qy_secret_access_key):
+        # the secret is not kept in plaintext as a key
+        value = '\n'.join([host or '', qy_access_key_id, qy_secret_access_key])
+        if is_python3:
+            value = value.encode('utf-8')
+        return sha256(value).hexdigest()
+
+    def get(self, host, qy_access_key_id, qy_secret_access_key):
+        """ Get the signer of a credential set, created if not cached.
+        """
+        key = self._key(host, qy_access_key_id, qy_secret_access_key)
+        with self.lock:
+            signer = self.signers.pop(key, None)
+            if signer is None:
+                signer = QuerySignatureAuthHandler(
+                    host, qy_access_key_id, qy_secret_access_key)
+                while len(self.signers) >= self.max_size:
+                    self.signers.popitem(last=False)
+            self.signers[key] = signer
+            return signer
+
+
 class AppSignatureAuthHandler(QuerySignatureAuthHandler):
     """ Provides App Signature Authentication.
     """
@@ -0,0 +1,94 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+"""
+Content encoding of http bodies
+"""
+
+import zlib
+
+# encodings asked for by connections, decoded transparently
+ACCEPT_ENCODING = 'gzip, deflate'
+
+
+def has_header(headers, name):
+    """ Check whether a header is set, case insensitively.
+    """
+    name = name.lower()
+    return any(key.lower() == name for key in headers or {})
+
+
+def set_header(headers, name, value):
+    """ Set a header, replacing the one with the same name in other case.
+    """
+    lower = name.lower()
+    for key in [key for key in headers if key.lower() == lower]:
+        del headers[key]
+    headers[name] = value
+
+
+class ContentDecoder(object):
+    """ Decompress a gzip or deflate body chunk by chunk
+    """
+
+    def __init__(self, encoding):
+        """
+        @param encoding: "gzip" or "deflate".
+        """
+        self.encoding = encoding
+        if encoding == 'gzip':
+            self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        else:
+            self.decompressor = zlib.decompressobj()
+        self.started = False
+
+    def decompress(self, data):
+        if not data:
+            return b''
+        if self.started or self.encoding == 'gzip':
+            return self.decompressor.decompress(data)
+        self.started = True
+        try:
+            return self.decompressor.decompress(data)
+        except zlib.error:
+            # some servers send raw deflate data without zlib header
+            self.decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+            return self.decompressor.decompress(data)
+
+    def flush(self):
+        return self.decompressor.flush()
+
+
+def create_decoder(content_encoding):
+    """ Create the decoder of a Content-Encoding header.
+        @return `ContentDecoder` or `None` if the body is not encoded
+    """
+    encoding = (content_encoding or '').strip().lower()
+    if encoding in ('gzip', 'x-gzip'):
+        return ContentDecoder('gzip')
+    if encoding == 'deflate':
+        return ContentDecoder('deflate')
+    return None
+
+
+def gzip_compress(data, level=6):
+    """ Compress a body with gzip.
+    """
+    if not isinstance(data, bytes):
+        data = data.encode('utf-8')
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
@@ -15,7 +15,10 @@
 # =========================================================================
 
 import time
+import weakref
 import threading
+from collections import deque
+from functools import partial
 try:
     import httplib
 except:
@@ -23,94 +26,234 @@ except:
 
 from petaexpress.misc.json_tool import json_load
 from petaexpress.conn.auth import QuerySignatureAuthHandler
+from petaexpress.conn.compression import (ACCEPT_ENCODING, create_decoder,
+                                          gzip_compress, has_header, set_header)
 
 
 class ConnectionQueue(object):
-    """ Http connection queue
+    """ Idle http connections of one host, reused in LIFO order
+        so that the most recently used (warmest) socket is handed out first
     """
 
-    def __init__(self, timeout=60):
-        self.queue = []
+    def __init__(self, timeout=60, max_idle=None, max_lifetime=None):
+        """
+        @param timeout - seconds a connection may stay idle in the queue
+        @param max_idle - max number of idle connections kept, `None` means no limit
+        @param max_lifetime - seconds since creation after which a connection
+                              is not reused any more, `None` means no limit
+        """
+        self.queue = deque()
         self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
 
     def size(self):
         return len(self.queue)
 
     def get_conn(self):
         # get a valid connection or `None`
-        for _ in range(len(self.queue)):
-            (conn, _) = self.queue.pop(0)
+        while self.queue:
+            conn_info = self.queue.pop()
+            (conn, _, _) = conn_info
+            if self._is_conn_outlived(conn_info):
+                self._close_conn(conn)
+                continue
             if self._is_conn_ready(conn):
                 return conn
-            else:
-                self.put_conn(conn)
+            # connections are put back once their response has been read,
+            # one still busy was put by the caller and is left to it
 
     def put_conn(self, conn):
-        self.queue.append((conn, time.time()))
+        now = time.time()
+        created_time = getattr(conn, '_created_time', None)
+        if created_time is None:
+            created_time = now
+            conn._created_time = now
+        conn_info = (conn, now, created_time)
+        if self._is_conn_outlived(conn_info):
+            self._close_conn(conn)
+            return
+        self.queue.append(conn_info)
+        if self.max_idle is not None:
+            while len(self.queue) > self.max_idle:
+                (cold, _, _) = self.queue.popleft()
+                self._close_conn(cold)
 
     def clear(self):
         # clear expired connections
-        while self.queue and self._is_conn_expired(self.queue[0]):
-            self.queue.pop(0)
+        alive = deque()
+        for conn_info in self.queue:
+            if self._is_conn_expired(conn_info) or self._is_conn_outlived(conn_info):
+                self._close_conn(conn_info[0])
+            else:
+                alive.append(conn_info)
+        self.queue = alive
+
+    def close(self):
+        # close all idle connections
+        while self.queue:
+            (conn, _, _) = self.queue.pop()
+            self._close_conn(conn)
 
     def _is_conn_expired(self, conn_info):
-        (_, time_stamp) = conn_info
+        (_, time_stamp, _) = conn_info
         return (time.time() - time_stamp) > self.timeout
 
+    def _is_conn_outlived(self, conn_info):
+        (_, _, created_time) = conn_info
+        if self.max_lifetime is None:
+            return False
+        return (time.time() - created_time) > self.max_lifetime
+
     def _is_conn_ready(self, conn):
         # sometimes the response may not be remove
         # after read at lasttime's connection
         response = getattr(conn, '_HTTPConnection__response', None)
         return (response is None) or response.isclosed()
 
+    def _close_conn(self, conn):
+        # a connection whose response is still being read is left to
+        # the garbage collector, closing it would close the response too
+        if self._is_conn_ready(conn):
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+class PoolReaper(object):
+    """ Background thread closing expired idle connections
+        of every registered connection pool
+    """
+
+    TICK = 1.0
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pools = weakref.WeakSet()
+        self.thread = None
+
+    def register(self, pool):
+        with self.lock:
+            self.pools.add(pool)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run,
+                                               name='petaexpress-pool-reaper')
+                self.thread.daemon = True
+                self.thread.start()
+
+    def unregister(self, pool):
+        with self.lock:
+            self.pools.discard(pool)
+
+    def _run(self):
+        while True:
+            time.sleep(self.TICK)
+            with self.lock:
+                pools = list(self.pools)
+                if not pools:
+                    self.thread = None
+                    return
+            curr_time = time.time()
+            for pool in pools:
+                if pool.last_clear_time + pool.clear_interval <= curr_time:
+                    pool.clear()
+            del pools
+
+
+_reaper = PoolReaper()
+
 
 class ConnectionPool(object):
     """ Http connection pool for multiple hosts.
-        It's thread-safe
+        It's thread-safe, expired connections are closed by a background
+        thread
     """
 
     CLEAR_INTERVAL = 5.0
 
-    def __init__(self, timeout=60):
+    def __init__(self, timeout=60, max_idle=None, max_total=None,
+                 max_lifetime=None, clear_interval=None):
+        """
+        @param timeout - seconds a connection may stay idle in the pool
+        @param max_idle - max number of idle connections kept per host
+        @param max_total - max number of idle connections kept for all hosts
+        @param max_lifetime - seconds since creation after which a connection
+                              is not reused any more
+        @param clear_interval - seconds between two background clearing
+        """
         self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_total = max_total
+        self.max_lifetime = max_lifetime
+        self.clear_interval = clear_interval or self.CLEAR_INTERVAL
         self.last_clear_time = time.time()
+        # the lock is only held for deque operations, which is cheaper
+        # than spreading hosts over several locks
         self.lock = threading.Lock()
         self.pool = {}
+        self.total = 0
+        self._registered = False
 
     def size(self):
-        with self.lock:
-            return sum([conn.size() for conn in self.pool.values()])
+        return self.total
 
     def put_conn(self, host, port, conn):
         # put connection into host's connection pool
+        # return `False` if the pool is full
+        key = (host, port)
         with self.lock:
-            key = (host, port)
-            queue = self.pool.setdefault(key, ConnectionQueue(self.timeout))
+            if self.max_total is not None and self.total >= self.max_total:
+                return False
+            queue = self.pool.get(key)
+            if queue is None:
+                queue = ConnectionQueue(self.timeout, self.max_idle,
+                                        self.max_lifetime)
+                self.pool[key] = queue
+            before = queue.size()
             queue.put_conn(conn)
+            self.total += queue.size() - before
+        if not self._registered:
+            self._registered = True
+            _reaper.register(self)
+        return True
 
     def get_conn(self, host, port):
         # get connection from host's connection pool
         # return a valid connection or `None`
-        self._clear()
+        key = (host, port)
         with self.lock:
-            key = (host, port)
-            if key in self.pool:
-                return self.pool[key].get_conn()
+            queue = self.pool.get(key)
+            if queue is None:
+                return None
+            before = queue.size()
+            conn = queue.get_conn()
+            self.total += queue.size() - before
+            return conn
 
-    def _clear(self):
+    def clear(self):
         # clear expired connections of all hosts
         with self.lock:
-            curr_time = time.time()
-            if self.last_clear_time + self.CLEAR_INTERVAL > curr_time:
-                return
             key_to_delete = []
-            for key in self.pool:
-                self.pool[key].clear()
-                if self.pool[key].size() == 0:
+            for key, queue in self.pool.items():
+                before = queue.size()
+                queue.clear()
+                self.total += queue.size() - before
+                if queue.size() == 0:
                     key_to_delete.append(key)
             for key in key_to_delete:
                 del self.pool[key]
-            self.last_clear_time = curr_time
+        self.last_clear_time = time.time()
+
+    def close(self):
+        # close all idle connections and stop background clearing
+        _reaper.unregister(self)
+        self._registered = False
+        with self.lock:
+            for queue in self.pool.values():
+                queue.close()
+            self.pool = {}
+            self.total = 0
 
 
 class HTTPRequest(object):
@@ -164,6 +307,39 @@ class HTTPResponse(httplib.HTTPResponse):
     def __init__(self, *args, **kwargs):
         httplib.HTTPResponse.__init__(self, *args, **kwargs)
         self._cached_response = ""
+        self._decoder = None
+        self._decoded = b""
+        self._release_callback = None
+
+    def on_release(self, callback):
+        """ Call `callback(reusable)` once, with True when the body has been
+            read completely, or False when the response is closed before,
+            leaving the connection in an unknown state.
+        """
+        self._release_callback = callback
+        if self.isclosed():
+            self._release(True)
+
+    def _release(self, reusable):
+        callback, self._release_callback = self._release_callback, None
+        if callback is not None:
+            callback(reusable)
+
+    def _close_conn(self):
+        # called by python 3 once the body has been read
+        httplib.HTTPResponse._close_conn(self)
+        self._release(True)
+
+    def close(self):
+        # python 2 closes the response once the body has been read
+        self._release(self.isclosed() or self.length == 0)
+        httplib.HTTPResponse.close(self)
+
+    def decode_content(self):
+        """ Decompress the body according to its Content-Encoding,
+            called when the connection asked for a compressed response.
+        """
+        self._decoder = create_decoder(self.getheader('content-encoding'))
 
     def read(self, amt=None):
         """Read the response.
@@ -174,11 +350,26 @@ class HTTPResponse(httplib.HTTPResponse):
         """
         if amt is None:
             if not self._cached_response:
-                self._cached_response = httplib.HTTPResponse.read(self)
+                data = httplib.HTTPResponse.read(self)
+                if self._decoder is not None:
+                    data = self._decoder.decompress(data) + self._decoder.flush()
+                self._cached_response = data
             return self._cached_response
+        elif self._decoder is not None:
+            return self._read_decoded(amt)
         else:
             return httplib.HTTPResponse.read(self, amt)
 
+    def _read_decoded(self, amt):
+        while len(self._decoded) < amt:
+            data = httplib.HTTPResponse.read(self, amt)
+            if not data:
+                self._decoded += self._decoder.flush()
+                break
+            self._decoded += self._decoder.decompress(data)
+        data, self._decoded = self._decoded[:amt], self._decoded[amt:]
+        return data
+
 
 class HttpConnection(object):
     """
@@ -217,6 +408,12 @@ class HttpConnection(object):
         self.credential_proxy_port = credential_proxy_port
         self.iam_access_key = None
         self.iam_secret_key = None
+        # Ask for compressed responses, `None` to disable
+        self.accept_encoding = ACCEPT_ENCODING
+        # Compress request bodies larger than that with gzip, the service
+        # must accept "Content-Encoding: gzip", disabled if `None`.
+        # Bodies with a Content-MD5 header are never compressed.
+        self.compress_threshold = None
 
     def set_proxy(self, host, port=None, headers=None, protocol="http"):
         """ set http (https) proxy
@@ -242,9 +439,17 @@ class HttpConnection(object):
         return conn or self._new_conn(host, port)
 
     def _set_conn(self, conn):
-        """ Set valid connection into pool
+        """ Set valid connection into pool, or close it if the pool is full
         """
-        self._conn.put_conn(conn.host, conn.port, conn)
+        if not self._conn.put_conn(conn.host, conn.port, conn):
+            conn.close()
+
+    def _release_conn(self, conn, reusable):
+        # called once the response of connection has been read or closed
+        if reusable:
+            self._set_conn(conn)
+        else:
+            conn.close()
 
     def _new_conn(self, host, port):
         """ Create new connection
@@ -284,6 +489,7 @@ class HttpConnection(object):
         request = self.build_http_request(method, path, params, auth_path,
                                           headers, host, data)
         request.authorize(self)
+        decode = self._set_content_encoding(request)
 
         conn_host = host
         conn_port = self.port
@@ -310,13 +516,43 @@ class HttpConnection(object):
 
         # Receive the response
         response = conn.getresponse()
+        if decode and isinstance(response, HTTPResponse):
+            response.decode_content()
 
-        # Reuse the connection
+        # Reuse the connection once the body has been read, so that
+        # busy connections are never handed out by the pool
         if response.status < 500:
-            self._set_conn(conn)
+            if isinstance(response, HTTPResponse):
+                response.on_release(partial(self._release_conn, conn))
+            else:
+                self._set_conn(conn)
 
         return response
 
+    def _set_content_encoding(self, request):
+        """ Ask for a compressed response unless the caller chose the
+            encoding, and compress a large request body unless its
+            Content-MD5, checked by the server, was computed already.
+            The headers are copied, those of the caller are kept as they
+            are for retries.
+            @return True if the response has to be decoded
+        """
+        request.header = dict(request.header or {})
+        body = request.body
+        if self.compress_threshold is not None and body \
+                and isinstance(body, (bytes, type(u''))) \
+                and len(body) >= self.compress_threshold \
+                and not has_header(request.header, 'Content-Encoding') \
+                and not has_header(request.header, 'Content-MD5'):
+            request.body = gzip_compress(body)
+            set_header(request.header, 'Content-Length', str(len(request.body)))
+            request.header['Content-Encoding'] = 'gzip'
+
+        if not self.accept_encoding or has_header(request.header, 'Accept-Encoding'):
+            return False
+        request.header['Accept-Encoding'] = self.accept_encoding
+        return True
+
     def _check_token(self):
         if not self._token or not self._token_exp or time.time() >= self._token_exp:
             try:
@@ -2,12 +2,37 @@
 interface to the IaaS service from PetaExpress.
 """
 
-from petaexpress.iaas.connection import APIConnection
+import sys
+
+# submodules imported on first access, e.g. `petaexpress.iaas.waiter`
+_LAZY_SUBMODULES = (
+    'accounts', 'actions', 'aio', 'cache', 'chunking', 'columns', 'connection',
+    'constants', 'consolidator', 'errors', 'inventory', 'inventory_cache',
+    'lb_backend', 'lb_listener', 'loader', 'models', 'monitor', 'multizone',
+    'paginator', 'resources', 'router_static', 'sg_rule', 'singleflight',
+    'waiter',
+)
+
+if sys.version_info < (3, 7):
+    from petaexpress.iaas.connection import APIConnection
+else:
+    def __getattr__(name):
+        """ Import `APIConnection` and the submodules when first used, so
+            that importing this package stays cheap.
+        """
+        if name == 'APIConnection':
+            from petaexpress.iaas.connection import APIConnection
+            return APIConnection
+        if name in _LAZY_SUBMODULES:
+            import importlib
+            return importlib.import_module('%s.%s' % (__name__, name))
+        raise AttributeError('module %r has no attribute %r' % (__name__, name))
 
 
 def connect_to_zone(zone, access_key_id, secret_access_key, lowercase=True):
     """ Connect to one of zones in petaexpress by access key.
     """
+    from petaexpress.iaas.connection import APIConnection
     if lowercase:
         zone = zone.strip().lower()
     return APIConnection(access_key_id, secret_access_key, zone)
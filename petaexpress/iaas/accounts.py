@@ -0,0 +1,174 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+"""
+Manage the connections of many accounts over one connection pool
+"""
+
+import threading
+from functools import partial
+
+from petaexpress.conn.auth import SignerCache
+from petaexpress.conn.connection import ConnectionPool
+
+from .connection import APIConnection
+from .multizone import describe_all, fan_out, merge_describe
+
+
+class AccountManager(object):
+    """ `APIConnection`s of many accounts sharing one `ConnectionPool`, so
+        the number of sockets depends on the hosts but not on the accounts.
+        Signers are shared by the connections of the same credentials, and
+        api methods are called for all the accounts concurrently.
+
+        >>> manager = AccountManager('pek3a', timeout=30)
+        >>> for name, key_id, secret in credentials:
+        ...     manager.add_account(name, key_id, secret)
+        >>> ret = manager.describe('describe_volumes', all_pages=True)
+        >>> ret['volume_set'][0]['account'], ret['failed_accounts']
+    """
+
+    def __init__(self, zone, pool=None, max_workers=20, timeout=None,
+                 cache_factory=None, **conn_kwargs):
+        """
+        @param zone - the default zone of accounts.
+        @param pool - the connection pool shared by all the accounts.
+        @param max_workers - the number of concurrent calls.
+        @param timeout - the default seconds to wait for each account,
+                         counted from the start of a call.
+        @param cache_factory - called without arguments to create the
+                               `ResponseCache` of each account, e.g.
+                               `ResponseCache`, responses are not cached
+                               if `None`.
+        @param conn_kwargs - other parameters of `APIConnection`, e.g. host,
+                             `signers` may be shared by several managers.
+        """
+        if 'cache' in conn_kwargs:
+            # one cache would be shared by all the accounts
+            raise ValueError('use cache_factory to cache the responses '
+                             'of each account')
+        self.zone = zone
+        self.pool = pool if pool else ConnectionPool()
+        self._own_pool = pool is None
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.cache_factory = cache_factory
+        # signers of the accounts, shared by those of the same credentials
+        self.signers = conn_kwargs.pop('signers', None)
+        if self.signers is None:
+            self.signers = SignerCache()
+        self.conn_kwargs = conn_kwargs
+        self.connections = {}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.connections)
+
+    def __contains__(self, name):
+        return name in self.connections
+
+    def names(self):
+        with self.lock:
+            return sorted(self.connections)
+
+    def add_account(self, name, qy_access_key_id, qy_secret_access_key,
+                    zone=None):
+        """ Add an account, or replace the one of the same name.
+        @param name: the name of account.
+        @param zone: the zone of account, `self.zone` if not specified.
+        @return the `APIConnection` of account.
+        """
+        cache = self.cache_factory() if self.cache_factory else None
+        conn = APIConnection(qy_access_key_id, qy_secret_access_key,
+                             zone or self.zone, pool=self.pool,
+                             max_workers=self.max_workers, cache=cache,
+                             signers=self.signers, **self.conn_kwargs)
+        with self.lock:
+            old = self.connections.get(name)
+            self.connections[name] = conn
+        if old is not None:
+            old.shutdown(wait=False)
+        return conn
+
+    def remove_account(self, name):
+        """ @return the `APIConnection` of removed account, or `None`.
+        """
+        with self.lock:
+            conn = self.connections.pop(name, None)
+        if conn is not None:
+            conn.shutdown(wait=False)
+        return conn
+
+    def connection(self, name):
+        """ Get the `APIConnection` of an account.
+        """
+        return self.connections[name]
+
+    def run(self, func, accounts=None, timeout=None):
+        """ Call a function with the connection of each account concurrently.
+        @param func: function accepting an `APIConnection`.
+        @param accounts: the names of accounts, all of them if not specified.
+        @param timeout: the seconds to wait for each account, `self.timeout`
+                        if not specified, the accounts which do not finish in
+                        time get `WaitTimeoutError`.
+        @return dict of name => result, or the exception it raised.
+        """
+        with self.lock:
+            names = list(accounts) if accounts is not None else list(self.connections)
+            calls = dict((name, partial(func, self.connections[name]))
+                         for name in names)
+        return fan_out(calls, self.max_workers,
+                       self.timeout if timeout is None else timeout)
+
+    def call(self, method_name, accounts=None, timeout=None, **params):
+        """ Call an api method for each account concurrently, see `run`.
+        @param method_name: the name of api method, e.g. "describe_volumes".
+        @param params: the parameters of api method.
+        @return dict of name => response, or the exception it raised.
+        """
+        return self.run(lambda conn: getattr(conn, method_name)(**params),
+                        accounts, timeout)
+
+    def describe(self, method_name, accounts=None, timeout=None,
+                 all_pages=False, **params):
+        """ Call a describe method for each account concurrently and merge
+            the items, each of them tagged with its `account`.
+        @param method_name: the name of describe method, e.g. "describe_volumes".
+        @param all_pages: fetch all the items of each account page by page
+                          instead of one page.
+        @param params: the parameters of describe method.
+        @return the merged response, see `merge_describe`, the accounts which
+                failed or timed out are in `failed_accounts`.
+        """
+        if all_pages:
+            results = self.run(
+                lambda conn: describe_all(conn, method_name, **params),
+                accounts, timeout)
+        else:
+            results = self.call(method_name, accounts, timeout, **params)
+        return merge_describe(method_name, results, 'account', 'failed_accounts')
+
+    def shutdown(self, wait=True):
+        """ Stop the threads of account connections, and close the pool
+            unless it was given.
+        """
+        with self.lock:
+            connections = list(self.connections.values())
+        for conn in connections:
+            conn.shutdown(wait=wait)
+        if self._own_pool:
+            self.pool.close()
@@ -0,0 +1,156 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+"""
+Asyncio interface to the IaaS service, requires Python 3.5 or higher.
+
+    >>> conn = AsyncAPIConnection('access key id', 'secret access key', 'zone id')
+    >>> ret = await conn.describe_instances(status=['running'])
+"""
+
+import asyncio
+import random
+
+from petaexpress.conn.aio import AsyncHttpConnection
+from .chunking import split_request, merge_responses
+from .connection import APIConnection
+from .loader import DescribeLoader
+from .monitor import MonitorProcessor
+
+
+class AsyncAPIConnection(AsyncHttpConnection, APIConnection):
+    """ Public connection to petaexpress service over asyncio.
+        Every api method of `APIConnection` returns a coroutine.
+    """
+
+    def __init__(self, qy_access_key_id, qy_secret_access_key, zone,
+                 host="api.petaexpress.com", port=443, protocol="https",
+                 pool=None, expires=None,
+                 retry_time=2, http_socket_timeout=60, debug=False,
+                 credential_proxy_host="169.254.169.254", credential_proxy_port=80,
+                 max_connections=100):
+        """
+        @param qy_access_key_id - the access key id
+        @param qy_secret_access_key - the secret access key
+        @param zone - the zone id to access
+        @param host - the host to make the connection to
+        @param port - the port to use when connect to host
+        @param protocol - the protocol to access to web server, "http" or "https"
+        @param pool - the `AsyncConnectionPool`
+        @param retry_time - the retry_time when message send fail
+        @param max_connections - max number of connections opened to the host
+        """
+        APIConnection.__init__(self, qy_access_key_id, qy_secret_access_key,
+                               zone, host, port, protocol, None, expires,
+                               retry_time, http_socket_timeout, debug,
+                               credential_proxy_host, credential_proxy_port)
+        self._init_async_pool(pool, max_connections)
+
+    async def send_request(self, action, body, url="/iaas/", verb="GET"):
+        """ Send request, a list parameter too long for one request is
+            split into chunks sent concurrently, see `chunking`.
+        """
+        chunks = split_request(action, body)
+        if chunks:
+            results = await asyncio.gather(*[
+                self.send_request(action, chunk, url, verb) for _, chunk in chunks
+            ], return_exceptions=True)
+            return merge_responses(chunks, results)
+
+        request = self._prepare_request(action, body)
+
+        retry_time = 0
+        while retry_time < self.retry_time:
+            # Use binary exponential backoff to desynchronize client requests
+            next_sleep = random.random() * (2 ** retry_time)
+            try:
+                response = await self.send(verb, url, request)
+                try:
+                    resp_str = await response.read()
+                except BaseException:
+                    response.close()
+                    raise
+                if response.status == 200:
+                    resp = self._parse_response(resp_str)
+                    if resp and resp.get("ret_code") in (5000, 5100) and retry_time < self.retry_time - 1:
+                        # 5000: INTERNAL ERROR
+                        # 5100: SERVER BUSY
+                        await asyncio.sleep(next_sleep)
+                        retry_time += 1
+                        continue
+                    return resp
+            except Exception:
+                if retry_time >= self.retry_time - 1:
+                    raise
+
+            await asyncio.sleep(next_sleep)
+            retry_time += 1
+
+    async def get_monitoring_data(self, resource, meters, step, start_time,
+                                  end_time, decompress=False, **ignore):
+        """ Get resource monitoring data.
+        """
+        resp = await APIConnection.get_monitoring_data(
+            self, resource, meters, step, start_time, end_time)
+        if decompress and resp and resp.get('meter_set'):
+            p = MonitorProcessor(resp['meter_set'], start_time, end_time, step)
+            resp = dict(resp, meter_set=p.decompress_monitoring_data())
+        return resp
+
+    async def get_loadbalancer_monitoring_data(self, resource, meters, step,
+                                               start_time, end_time,
+                                               decompress=False, **ignore):
+        """ Get load balancer monitoring data.
+        """
+        resp = await APIConnection.get_loadbalancer_monitoring_data(
+            self, resource, meters, step, start_time, end_time)
+        if decompress and resp and resp.get('meter_set'):
+            p = MonitorProcessor(resp['meter_set'], start_time, end_time, step)
+            resp = dict(resp, meter_set=p.decompress_lb_monitoring_data())
+        return resp
+
+
+class AsyncDescribeLoader(DescribeLoader):
+    """ `DescribeLoader` for `AsyncAPIConnection`, lookups must be made
+        from the event loop.
+
+        >>> loader = AsyncDescribeLoader(conn, 'volume')
+        >>> volumes = await asyncio.gather(*[loader.get(v) for v in volume_ids])
+    """
+
+    def _new_future(self):
+        return asyncio.get_event_loop().create_future()
+
+    def _schedule(self):
+        self.timer = asyncio.get_event_loop().call_later(self.window, self.flush)
+
+    def _dispatch(self, batch):
+        asyncio.ensure_future(self._describe(batch))
+
+    async def get(self, resource_id):
+        """ Look up a resource by ID and wait for the result.
+        """
+        return await self.load(resource_id)
+
+    async def _describe(self, batch):
+        method = getattr(self.conn, self.resource_type.describe_method)
+        try:
+            resp = await method(**self._build_params(batch))
+        except Exception as e:
+            self._resolve(batch, None, e)
+        else:
+            self._resolve(batch, resp)
@@ -0,0 +1,204 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+"""
+Cache of responses of read-only actions
+"""
+
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from petaexpress.misc.json_tool import json_dump, json_load
+
+READ_ONLY_PREFIXES = ('Describe', 'Get')
+
+# request parameters which do not name a resource type
+IGNORED_PARAMS = set(['action', 'zone', 'expires', 'offset', 'limit',
+                      'verbose', 'owner'])
+
+
+def is_read_only(action):
+    """ Whether the action does not change any resource
+    """
+    return action.startswith(READ_ONLY_PREFIXES)
+
+
+def canonical_key(action, body, scope=''):
+    """ Key of a request, identical for the same action and parameters
+        sent by the same identity to the same host.
+    @param scope: the identity and host of the request, e.g.
+                  "access_key_id@api.petaexpress.com", so that connections
+                  sharing one cache never see each other's responses.
+    """
+    params = dict((key, value) for key, value in body.items()
+                  if key not in ('action', 'expires'))
+    return '%s:%s:%s' % (scope, action,
+                         json_dump(params) or repr(sorted(params.items())))
+
+
+def dump_response(resp):
+    """ Serialize a response to be parsed again by `load_response`, which
+        is cheaper than copying it.
+    """
+    return json.dumps(resp, separators=(',', ':'))
+
+
+def load_response(body):
+    return json_load(body, raise_error=True)
+
+
+def _singular(word):
+    return word[:-1] if word.endswith('s') and len(word) > 3 else word
+
+
+def action_words(action):
+    """ Resource words of an action, e.g.
+        "ModifyInstanceAttributes" -> set(["instance", "attribute"])
+    """
+    words = re.findall('[A-Z][a-z0-9]*', action)[1:]
+    return set(_singular(word.lower()) for word in words)
+
+
+def param_words(body):
+    """ Resource words of request parameters, e.g.
+        {"security_group": "sg-x", "instances": [...]} -> set(["security", "group", "instance"])
+    """
+    words = set()
+    for key in body:
+        if key in IGNORED_PARAMS:
+            continue
+        words.update(_singular(word) for word in key.split('_'))
+    return words
+
+
+class ResponseCache(object):
+    """ LRU cache of the responses of read-only actions, entries expire
+        after the TTL of their action. Mutating actions invalidate the
+        entries of describe actions about the same resource type, e.g.
+        "TerminateInstances" invalidates "DescribeInstances".
+        It's thread-safe. Responses are kept serialized and parsed again on
+        every hit, which is cheaper than copying them, so that every caller
+        gets its own response and may modify it.
+    """
+
+    def __init__(self, ttl=5, ttls=None, max_size=1024):
+        """
+        @param ttl: default seconds a response is cached.
+        @param ttls: seconds a response is cached by action, e.g.
+                     {"DescribeZones": 3600}, 0 means not cached.
+        @param max_size: max number of cached responses.
+        """
+        self.ttl = ttl
+        self.ttls = ttls or {}
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.keys_by_action = {}
+        self.words_by_action = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # increased by every invalidation, responses of requests sent
+        # before may be stale and are not cached
+        self.generation = 0
+
+    def get_ttl(self, action):
+        return self.ttls.get(action, self.ttl)
+
+    def size(self):
+        return len(self.entries)
+
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'invalidations': self.invalidations,
+                    'size': len(self.entries)}
+
+    def get(self, action, key):
+        # return the cached response or `None`
+        with self.lock:
+            body = None
+            entry = self.entries.get(key)
+            if entry is not None:
+                (body, expire_time, _) = entry
+                if expire_time > time.time():
+                    self.entries[key] = self.entries.pop(key)
+                    self.hits += 1
+                else:
+                    self._remove(key)
+                    body = None
+            if body is None:
+                self.misses += 1
+                return None
+        # parsed out of the lock
+        return load_response(body)
+
+    def set(self, action, key, resp, generation=None):
+        """ Cache a successful response.
+        @param generation: `self.generation` when the request was sent, the
+                           response is dropped if the cache was invalidated
+                           since then.
+        """
+        ttl = self.get_ttl(action)
+        if not ttl or not isinstance(resp, dict) or resp.get('ret_code') != 0:
+            return
+        try:
+            body = dump_response(resp)
+        except (TypeError, ValueError):
+            return
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                return
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (body, time.time() + ttl, action)
+            self.keys_by_action.setdefault(action, set()).add(key)
+            if action not in self.words_by_action:
+                self.words_by_action[action] = action_words(action)
+            while len(self.entries) > self.max_size:
+                self._remove(next(iter(self.entries)))
+
+    def _remove(self, key):
+        (_, _, action) = self.entries.pop(key)
+        keys = self.keys_by_action[action]
+        keys.discard(key)
+        if not keys:
+            del self.keys_by_action[action]
+
+    def invalidate(self, action, body=None):
+        """ Drop the cached responses related to a mutating action
+        """
+        words = action_words(action)
+        if body:
+            words |= param_words(body)
+        with self.lock:
+            self.generation += 1
+            for cached_action in list(self.keys_by_action):
+                if not self.words_by_action[cached_action] & words:
+                    continue
+                for key in list(self.keys_by_action[cached_action]):
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+            self.keys_by_action.clear()
@@ -0,0 +1,122 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+"""
+Split oversized list parameters of an action into several requests
+"""
+
+from . import constants as const
+from .errors import ChunkedRequestError
+from .resources import MAX_LIST_SIZE
+
+# action => (list parameter to split, max number of items in one request)
+CHUNKED_PARAMS = {
+    const.ACTION_TERMINATE_INSTANCES: ('instances', MAX_LIST_SIZE),
+    const.ACTION_START_INSTANCES: ('instances', MAX_LIST_SIZE),
+    const.ACTION_STOP_INSTANCES: ('instances', MAX_LIST_SIZE),
+    const.ACTION_RESTART_INSTANCES: ('instances', MAX_LIST_SIZE),
+    const.ACTION_DELETE_VOLUMES: ('volumes', MAX_LIST_SIZE),
+    const.ACTION_DELETE_SNAPSHOTS: ('snapshots', MAX_LIST_SIZE),
+    const.ACTION_DELETE_IMAGES: ('images', MAX_LIST_SIZE),
+    const.ACTION_RELEASE_EIPS: ('eips', MAX_LIST_SIZE),
+    const.ACTION_DISSOCIATE_EIPS: ('eips', MAX_LIST_SIZE),
+    const.ACTION_DELETE_VXNETS: ('vxnets', MAX_LIST_SIZE),
+    const.ACTION_JOIN_VXNET: ('instances', MAX_LIST_SIZE),
+    const.ACTION_LEAVE_VXNET: ('instances', MAX_LIST_SIZE),
+    const.ACTION_DELETE_SECURITY_GROUPS: ('security_groups', MAX_LIST_SIZE),
+    const.ACTION_DELETE_LOADBALANCERS: ('loadbalancers', MAX_LIST_SIZE),
+    const.ACTION_ADD_LOADBALANCER_BACKENDS: ('backends', MAX_LIST_SIZE),
+    const.ACTION_DELETE_LOADBALANCER_BACKENDS: ('loadbalancer_backends', MAX_LIST_SIZE),
+    const.ACTION_DELETE_KEY_PAIRS: ('keypairs', MAX_LIST_SIZE),
+    const.ACTION_ATTACH_KEY_PAIRS: ('instances', MAX_LIST_SIZE),
+    const.ACTION_DETACH_KEY_PAIRS: ('instances', MAX_LIST_SIZE),
+    const.ACTION_DELETE_TAGS: ('tags', MAX_LIST_SIZE),
+    const.ACTION_ATTACH_TAGS: ('resource_tag_pairs', MAX_LIST_SIZE),
+    const.ACTION_DETACH_TAGS: ('resource_tag_pairs', MAX_LIST_SIZE),
+    const.ACTION_DELETE_NICS: ('nics', MAX_LIST_SIZE),
+}
+
+
+def split_request(action, body):
+    """ Split the request body if its list parameter is too long.
+    @return the list of (items, body) of each chunk, or `None` if the
+            request can be sent as is.
+    """
+    if action not in CHUNKED_PARAMS:
+        return None
+    param, size = CHUNKED_PARAMS[action]
+    values = body.get(param)
+    if not isinstance(values, list) or len(values) <= size:
+        return None
+
+    chunks = []
+    for i in range(0, len(values), size):
+        chunk = dict(body)
+        chunk[param] = values[i:i + size]
+        chunks.append((chunk[param], chunk))
+    return chunks
+
+
+def merge_responses(chunks, results):
+    """ Merge the results of chunks into one response.
+
+        List fields are concatenated and the job IDs are collected into
+        `job_ids` (`job_id` keeps the first one). Chunks which failed are
+        reported in `failed_chunks` with their items, `ret_code` and
+        `message`, the `ret_code` of response is the one of first failed
+        chunk. If chunks raised exceptions, `ChunkedRequestError` holding
+        the merged response is raised, or the first exception if all did.
+
+    @param chunks: the list of (items, body) returned by `split_request`.
+    @param results: the response or the exception of each chunk.
+    """
+    merged = {'ret_code': 0, 'job_ids': [], 'failed_chunks': []}
+    for (items, _), resp in zip(chunks, results):
+        if isinstance(resp, Exception):
+            merged['failed_chunks'].append({'items': items, 'error': resp})
+            continue
+        if not resp:
+            merged['failed_chunks'].append({'items': items, 'ret_code': None,
+                                            'message': 'empty response'})
+            continue
+        if resp.get('ret_code') != 0:
+            merged['failed_chunks'].append({'items': items,
+                                            'ret_code': resp.get('ret_code'),
+                                            'message': resp.get('message')})
+            if merged['ret_code'] == 0:
+                merged['ret_code'] = resp.get('ret_code')
+                merged['message'] = resp.get('message')
+            continue
+
+        for key, value in resp.items():
+            if key == 'ret_code':
+                continue
+            if key == 'job_id':
+                merged['job_ids'].append(value)
+                merged.setdefault('job_id', value)
+            elif isinstance(value, list):
+                merged.setdefault(key, []).extend(value)
+            else:
+                merged.setdefault(key, value)
+
+    errors = [c['error'] for c in merged['failed_chunks'] if 'error' in c]
+    if errors and len(errors) == len(chunks):
+        raise errors[0]
+    elif errors:
+        raise ChunkedRequestError(merged)
+    return merged
+
@@ -0,0 +1,539 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+"""
+Columnar snapshots of describe results for fleet analytics.
+
+Items are converted into one array per field: numbers into `array.array`,
+strings dictionary-encoded into integer codes, and lists (like the vxnets
+of instances) into offsets plus codes. NumPy is used to filter and
+aggregate when it is installed.
+
+    >>> cols = to_columns(conn.iter_describe('describe_instances', verbose=1),
+    ...                   ['instance_type', 'status', 'vcpus_current',
+    ...                    'memory_current', 'vxnets.vxnet_id'])
+    >>> running = cols.filter(cols.where('status', '==', 'running'))
+    >>> running.group_by('instance_type', cpu=('vcpus_current', 'sum'),
+    ...                  count=('vcpus_current', 'count'))
+    {'c2m4': {'cpu': 2000.0, 'count': 1000}, ...}
+"""
+
+import operator
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MISSING_CODE = -1
+NAN = float('nan')
+
+OPERATORS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+AGGREGATIONS = ('count', 'sum', 'mean', 'min', 'max')
+
+
+def _is_nan(value):
+    return value != value
+
+
+def _view(data, typecode):
+    """ A numpy array sharing the memory of an array.array.
+    """
+    if not len(data):
+        return numpy.zeros(0, dtype=numpy.dtype(typecode))
+    return numpy.frombuffer(data, dtype=numpy.dtype(typecode))
+
+
+def _to_array(typecode, values):
+    """ Copy a numpy array into an array.array.
+    """
+    data = array(typecode)
+    data.frombytes(values.astype(numpy.dtype(typecode)).tobytes())
+    return data
+
+
+class NumericColumn(object):
+    """ Numbers in an `array.array`, of integers ("q") if all the values are
+        integers, else of floats ("d") with NaN for missing values.
+    """
+
+    def __init__(self, name, data):
+        self.name = name
+        self.data = data
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, index):
+        value = self.data[index]
+        return None if _is_nan(value) else value
+
+    def values(self):
+        """ The values as numpy array if installed, else the array.
+        """
+        if numpy is None:
+            return self.data
+        return _view(self.data, self.data.typecode)
+
+    def take(self, indexes):
+        if numpy is not None:
+            return NumericColumn(self.name, _to_array(
+                self.data.typecode, self.values()[indexes]))
+        return NumericColumn(self.name, array(self.data.typecode,
+                                              [self.data[i] for i in indexes]))
+
+    def to_list(self):
+        return [self[i] for i in range(len(self))]
+
+
+class StringColumn(object):
+    """ Dictionary-encoded strings, `codes` are the indexes of values in
+        `categories`, or -1 for missing values.
+    """
+
+    def __init__(self, name, codes, categories):
+        self.name = name
+        self.codes = codes
+        self.categories = categories
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, index):
+        code = self.codes[index]
+        return None if code == MISSING_CODE else self.categories[code]
+
+    def code_of(self, value):
+        try:
+            return self.categories.index(value)
+        except ValueError:
+            return None
+
+    def values(self):
+        """ The codes as numpy array if installed, else the array.
+        """
+        if numpy is None:
+            return self.codes
+        return _view(self.codes, 'i')
+
+    def take(self, indexes):
+        if numpy is not None:
+            codes = _to_array('i', self.values()[indexes])
+        else:
+            codes = array('i', [self.codes[i] for i in indexes])
+        return StringColumn(self.name, codes, self.categories)
+
+    def to_list(self):
+        return [self[i] for i in range(len(self))]
+
+
+class ListColumn(object):
+    """ Lists of dictionary-encoded strings, the codes of row i are
+        `codes[offsets[i]:offsets[i + 1]]`.
+    """
+
+    def __init__(self, name, offsets, codes, categories):
+        self.name = name
+        self.offsets = offsets
+        self.codes = codes
+        self.categories = categories
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return [self.categories[c] for c in self.codes[start:end]]
+
+    def code_of(self, value):
+        try:
+            return self.categories.index(value)
+        except ValueError:
+            return None
+
+    def rows(self):
+        """ The row of each code.
+        """
+        if numpy is not None:
+            offsets = _view(self.offsets, 'l')
+            return numpy.repeat(numpy.arange(len(self)), numpy.diff(offsets))
+        rows = array('l')
+        offsets = self.offsets
+        for row in range(len(offsets) - 1):
+            rows.extend([row] * (offsets[row + 1] - offsets[row]))
+        return rows
+
+    def take(self, indexes):
+        if numpy is not None:
+            offsets = _view(self.offsets, 'l')
+            starts = offsets[:-1][indexes]
+            lengths = offsets[1:][indexes] - starts
+            new_offsets = numpy.concatenate(([0], numpy.cumsum(lengths)))
+            positions = numpy.repeat(starts - new_offsets[:-1], lengths) + \
+                numpy.arange(new_offsets[-1])
+            return ListColumn(self.name, _to_array('l', new_offsets),
+                              _to_array('i', _view(self.codes, 'i')[positions]),
+                              self.categories)
+        offsets, codes = array('l', [0]), array('i')
+        for i in indexes:
+            codes.extend(self.codes[self.offsets[i]:self.offsets[i + 1]])
+            offsets.append(len(codes))
+        return ListColumn(self.name, offsets, codes, self.categories)
+
+    def to_list(self):
+        return [self[i] for i in range(len(self))]
+
+
+def _is_number(value):
+    return isinstance(value, (bool, int, float)) or type(value).__name__ == 'long'
+
+
+def _encode(values, name):
+    """ Dictionary-encode strings.
+    @return the codes and the categories.
+    """
+    index = {None: MISSING_CODE}
+    codes = array('i', [index.setdefault(v, len(index) - 1) for v in values])
+    categories = [None] * (len(index) - 1)
+    for value, code in index.items():
+        if value is not None:
+            if _is_number(value) and not isinstance(value, bool):
+                raise ValueError('column [%s] mixes strings and %r' % (name, value))
+            categories[code] = value
+    return codes, categories
+
+
+def _build_column(name, values):
+    first = next((v for v in values if v is not None), None)
+    if isinstance(first, (list, tuple)):
+        offsets = array('l', [0])
+        flat = []
+        for value in values:
+            if value:
+                flat.extend(value)
+            offsets.append(len(flat))
+        codes, categories = _encode(flat, name)
+        return ListColumn(name, offsets, codes, categories)
+
+    if first is not None and _is_number(first):
+        for typecode in ('q', 'd'):
+            try:
+                return NumericColumn(name, array(typecode, values))
+            except (TypeError, OverflowError):
+                pass
+        try:
+            return NumericColumn(name, array('d', [NAN if v is None else v
+                                                   for v in values]))
+        except TypeError:
+            raise ValueError('column [%s] mixes numbers and other values' % name)
+
+    codes, categories = _encode(values, name)
+    return StringColumn(name, codes, categories)
+
+
+def _getter(path):
+    """ Make a function getting the value at a path of keys, lists met on
+        the way are mapped, e.g. "vxnets.vxnet_id" gives the IDs of all the
+        vxnets.
+    """
+    key = path[0]
+    if len(path) == 1:
+        return lambda item: item.get(key)
+    rest = _getter(path[1:])
+
+    def get(item):
+        value = item.get(key)
+        if value is None:
+            return None
+        if isinstance(value, (list, tuple)):
+            values = [rest(v) for v in value]
+            return [v for v in values if v is not None]
+        return rest(value)
+    return get
+
+
+def to_columns(items, fields):
+    """ Convert describe items into columns.
+    @param items: an iterable of items, e.g. `iter_describe` or the `*_set`
+                  of a response, dicts or models.
+    @param fields: the fields to convert, a dotted path reaches nested
+                   items, e.g. "image.os_family" or "vxnets.vxnet_id".
+    @return `Columns`
+    """
+    getters = [_getter(field.split('.')) for field in fields]
+    values = [[] for _ in fields]
+    appends = [(v.append, getter) for v, getter in zip(values, getters)]
+    length = 0
+    for item in items:
+        for append, getter in appends:
+            append(getter(item))
+        length += 1
+    return Columns(dict((field, _build_column(field, v))
+                        for field, v in zip(fields, values)), length)
+
+
+class Columns(object):
+    """ Columns of the same length, see `to_columns`.
+    """
+
+    def __init__(self, columns, length):
+        self.columns = columns
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    @property
+    def names(self):
+        return sorted(self.columns)
+
+    def row(self, index):
+        return dict((name, column[index]) for name, column in self.columns.items())
+
+    def where(self, name, op, value):
+        """ Select the rows of a condition on a column.
+        @param name: the name of column.
+        @param op: "==", "!=", "<", "<=", ">", ">=", or "in" with a list of values.
+                   For list columns, "==" and "in" select the rows containing
+                   the value(s).
+        @param value: the value to compare with.
+        @return a mask, numpy array of booleans or bytearray of 0 and 1.
+        """
+        column = self.columns[name]
+        if isinstance(column, NumericColumn):
+            values = column.values()
+            if op == 'in':
+                if numpy is not None:
+                    return numpy.isin(values, list(value))
+                value = set(value)
+                return bytearray(v in value for v in values)
+            compare = OPERATORS[op]
+            if numpy is not None:
+                return compare(values, value)
+            return bytearray(compare(v, value) for v in values)
+
+        wanted = value if op == 'in' else [value]
+        codes = [c for c in (column.code_of(v) for v in wanted) if c is not None]
+        if isinstance(column, ListColumn):
+            if op not in ('==', 'in'):
+                raise ValueError('[%s] is not supported by list column' % op)
+            if numpy is not None:
+                mask = numpy.zeros(len(self), dtype=numpy.bool_)
+                mask[column.rows()[numpy.isin(_view(column.codes, 'i'), codes)]] = True
+                return mask
+            mask = bytearray(len(self))
+            wanted = set(codes)
+            offsets = column.offsets
+            for row in range(len(self)):
+                for c in column.codes[offsets[row]:offsets[row + 1]]:
+                    if c in wanted:
+                        mask[row] = 1
+                        break
+            return mask
+
+        if op not in ('==', '!=', 'in'):
+            raise ValueError('[%s] is not supported by string column' % op)
+        values = column.values()
+        if numpy is not None:
+            mask = numpy.isin(values, codes)
+            return ~mask if op == '!=' else mask
+        codes = set(codes)
+        if op == '!=':
+            return bytearray(c not in codes for c in values)
+        return bytearray(c in codes for c in values)
+
+    def filter(self, mask):
+        """ Select the rows of a mask returned by `where`, masks are combined
+            with `&` and `|` if numpy is installed, or `mask_and` and `mask_or`.
+        @return `Columns`
+        """
+        if numpy is not None:
+            indexes = numpy.flatnonzero(numpy.asarray(mask, dtype=numpy.bool_))
+        else:
+            indexes = [i for i, selected in enumerate(mask) if selected]
+        return Columns(dict((name, column.take(indexes))
+                            for name, column in self.columns.items()),
+                       len(indexes))
+
+    def group_by(self, name, **aggregations):
+        """ Aggregate columns by the values of a column, rows of list columns
+            count in the group of each of their values.
+        @param name: the name of column to group by.
+        @param aggregations: result name => (column name, aggregation), the
+                             aggregation is one of "count", "sum", "mean",
+                             "min" and "max". "count" counts the values
+                             which are not missing.
+        @return dict of value => dict of result name => aggregated value.
+        """
+        for column_name, func in aggregations.values():
+            if func not in AGGREGATIONS:
+                raise ValueError('unknown aggregation [%s]' % func)
+            column = self.columns[column_name]
+            if isinstance(column, ListColumn) or \
+                    (func != 'count' and not isinstance(column, NumericColumn)):
+                raise ValueError('[%s] is not supported by column [%s]'
+                                 % (func, column_name))
+
+        keys, rows, labels = self._group_keys(self.columns[name])
+        if numpy is not None:
+            sizes, results = self._aggregate_numpy(keys, rows, len(labels),
+                                                   aggregations)
+        else:
+            sizes, results = self._aggregate(keys, rows, len(labels), aggregations)
+        return dict((label, dict((result, values[i])
+                                 for result, values in results.items()))
+                    for i, label in enumerate(labels) if sizes[i])
+
+    def _group_keys(self, column):
+        """ @return the group of each row, the row of each group key
+                    (None if one per row) and the labels of groups.
+        """
+        labels = list(getattr(column, 'categories', ()))
+        if isinstance(column, NumericColumn):
+            if numpy is not None:
+                uniques, keys = numpy.unique(column.values(), return_inverse=True)
+                return keys, None, [None if _is_nan(v) else v.item() for v in uniques]
+            index = {}
+            keys = array('l')
+            for value in column.data:
+                value = None if _is_nan(value) else value
+                if value not in index:
+                    index[value] = len(labels)
+                    labels.append(value)
+                keys.append(index[value])
+            return keys, None, labels
+
+        # missing values are the last group
+        labels.append(None)
+        missing = len(labels) - 1
+        if isinstance(column, ListColumn):
+            codes, rows = column.codes, column.rows()
+        else:
+            codes, rows = column.codes, None
+        if numpy is not None:
+            keys = _view(codes, 'i').astype(numpy.int64)
+            keys[keys == MISSING_CODE] = missing
+            return keys, rows, labels
+        return array('l', [missing if c == MISSING_CODE else c for c in codes]), \
+            rows, labels
+
+    def _column_values(self, column, rows):
+        values = column.values()
+        if isinstance(column, NumericColumn):
+            values = values.astype(numpy.float64)
+            present = ~numpy.isnan(values)
+        else:
+            present = values != MISSING_CODE
+            values = present.astype(numpy.float64)
+        if rows is not None:
+            values, present = values[rows], present[rows]
+        return values, present
+
+    def _aggregate_numpy(self, keys, rows, groups, aggregations):
+        sizes = numpy.bincount(keys, minlength=groups).tolist()
+        results = {}
+        for result, (column_name, func) in aggregations.items():
+            column = self.columns[column_name]
+            values, present = self._column_values(column, rows)
+            count = numpy.bincount(keys[present], minlength=groups)
+            if func == 'count':
+                results[result] = count.tolist()
+                continue
+            valid_keys, valid = keys[present], values[present]
+            if func in ('sum', 'mean'):
+                total = numpy.bincount(valid_keys, weights=valid, minlength=groups)
+                if func == 'mean':
+                    with numpy.errstate(invalid='ignore', divide='ignore'):
+                        total = total / count
+                results[result] = [None if c == 0 else v
+                                   for v, c in zip(total.tolist(), count.tolist())]
+            else:
+                init = numpy.inf if func == 'min' else -numpy.inf
+                out = numpy.full(groups, init)
+                ufunc = numpy.minimum if func == 'min' else numpy.maximum
+                ufunc.at(out, valid_keys, valid)
+                results[result] = [None if c == 0 else v
+                                   for v, c in zip(out.tolist(), count.tolist())]
+        return sizes, results
+
+    def _aggregate(self, keys, rows, groups, aggregations):
+        sizes = [0] * groups
+        for key in keys:
+            sizes[key] += 1
+        results = {}
+        for result, (column_name, func) in aggregations.items():
+            column = self.columns[column_name]
+            if isinstance(column, NumericColumn):
+                values = column.data
+                present = lambda v: not _is_nan(v)
+            else:
+                values = column.codes
+                present = lambda v: v != MISSING_CODE
+            if rows is not None:
+                values = [values[r] for r in rows]
+
+            count = [0] * groups
+            acc = [None] * groups
+            for key, value in zip(keys, values):
+                if not present(value):
+                    continue
+                count[key] += 1
+                if func in ('sum', 'mean'):
+                    acc[key] = value if acc[key] is None else acc[key] + value
+                elif func == 'min':
+                    acc[key] = value if acc[key] is None else min(acc[key], value)
+                elif func == 'max':
+                    acc[key] = value if acc[key] is None else max(acc[key], value)
+            if func == 'count':
+                results[result] = count
+            elif func == 'mean':
+                results[result] = [None if c == 0 else float(a) / c
+                                   for a, c in zip(acc, count)]
+            else:
+                results[result] = acc
+        return sizes, results
+
+
+def mask_and(a, b):
+    """ Rows selected by both masks.
+    """
+    if numpy is not None and not isinstance(a, bytearray):
+        return a & b
+    return bytearray(x and y for x, y in zip(a, b))
+
+
+def mask_or(a, b):
+    """ Rows selected by any of the masks.
+    """
+    if numpy is not None and not isinstance(a, bytearray):
+        return a | b
+    return bytearray(x or y for x, y in zip(a, b))
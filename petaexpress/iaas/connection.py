@@ -13,39 +13,77 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 # =========================================================================
+import importlib
 import random
 import sys
+import threading
 import time
-import uuid
-
-from petaexpress.iaas.actions.instance import InstanceAction
-from petaexpress.iaas.actions.instance_groups import InstanceGroupsAction
-from petaexpress.iaas.actions.volume import VolumeAction
-from petaexpress.iaas.actions.eip import EipAction
-from petaexpress.iaas.actions.router import RouterAction
-from petaexpress.iaas.actions.vxnet import VxnetAction
-from petaexpress.iaas.actions.keypair import KeypairAction
-from petaexpress.iaas.actions.image import ImageAction
-from petaexpress.iaas.actions.loadbalancer import LoadBalancerAction
-from petaexpress.iaas.actions.security_group import SecurityGroupAction
-from petaexpress.iaas.actions.snapshot import SnapshotAction
-from petaexpress.iaas.actions.tag import TagAction
-from petaexpress.iaas.actions.alarm_policy import AlarmPolicy
-from petaexpress.iaas.actions.cluster import ClusterAction
-from petaexpress.iaas.actions.nic import NicAction
-from petaexpress.iaas.actions.s2 import S2Action
-from petaexpress.iaas.actions.sdwan import SdwanAction
-from petaexpress.iaas.actions.migrate import MigrateAction
-from petaexpress.iaas.actions.vpc_border import VpcBorder
 
 from petaexpress.conn.auth import QuerySignatureAuthHandler
 from petaexpress.conn.connection import HttpConnection, HTTPRequest
 from petaexpress.misc.json_tool import json_load, json_dump
 from petaexpress.misc.utils import filter_out_none
 from . import constants as const
+from .cache import is_read_only, canonical_key, dump_response, load_response
+from .chunking import split_request, merge_responses
 from .consolidator import RequestChecker
 from .monitor import MonitorProcessor
-from .errors import InvalidAction
+from .errors import APIError, InvalidAction, InvalidParameterError
+from .paginator import DescribePaginator, check_response
+from .resources import get_resource_type_by_method
+from .singleflight import SingleFlight
+
+# the action classes of api methods as (module, class), the first class
+# defining a method wins
+ACTION_CLASSES = [
+    ('petaexpress.iaas.actions.instance', 'InstanceAction'),
+    ('petaexpress.iaas.actions.instance_groups', 'InstanceGroupsAction'),
+    ('petaexpress.iaas.actions.volume', 'VolumeAction'),
+    ('petaexpress.iaas.actions.eip', 'EipAction'),
+    ('petaexpress.iaas.actions.router', 'RouterAction'),
+    ('petaexpress.iaas.actions.vxnet', 'VxnetAction'),
+    ('petaexpress.iaas.actions.loadbalancer', 'LoadBalancerAction'),
+    ('petaexpress.iaas.actions.keypair', 'KeypairAction'),
+    ('petaexpress.iaas.actions.security_group', 'SecurityGroupAction'),
+    ('petaexpress.iaas.actions.snapshot', 'SnapshotAction'),
+    ('petaexpress.iaas.actions.image', 'ImageAction'),
+    ('petaexpress.iaas.actions.tag', 'TagAction'),
+    ('petaexpress.iaas.actions.nic', 'NicAction'),
+    ('petaexpress.iaas.actions.alarm_policy', 'AlarmPolicy'),
+    ('petaexpress.iaas.actions.s2', 'S2Action'),
+    ('petaexpress.iaas.actions.cluster', 'ClusterAction'),
+    ('petaexpress.iaas.actions.sdwan', 'SdwanAction'),
+    ('petaexpress.iaas.actions.migrate', 'MigrateAction'),
+    ('petaexpress.iaas.actions.vpc_border', 'VpcBorder'),
+]
+
+_dispatch_table = None
+_dispatch_lock = threading.Lock()
+
+
+def get_action_classes():
+    """ Import the action classes, in the order of `ACTION_CLASSES`.
+    """
+    return [getattr(importlib.import_module(module_name), class_name)
+            for module_name, class_name in ACTION_CLASSES]
+
+
+def get_dispatch_table():
+    """ Get the action class of each api method, the action modules are
+        imported when it's first needed.
+    @return dict of method name => action class.
+    """
+    global _dispatch_table
+    if _dispatch_table is None:
+        with _dispatch_lock:
+            if _dispatch_table is None:
+                table = {}
+                for cls in get_action_classes():
+                    for name in dir(cls):
+                        if not name.startswith('_'):
+                            table.setdefault(name, cls)
+                _dispatch_table = table
+    return _dispatch_table
 
 
 class APIConnection(HttpConnection):
@@ -57,7 +95,8 @@ class APIConnection(HttpConnection):
                  host="api.petaexpress.com", port=443, protocol="https",
                  pool=None, expires=None,
                  retry_time=2, http_socket_timeout=60, debug=False,
-                 credential_proxy_host="169.254.169.254", credential_proxy_port=80):
+                 credential_proxy_host="169.254.169.254", credential_proxy_port=80,
+                 max_workers=10, cache=None, coalesce=False, signers=None):
         """
         @param qy_access_key_id - the access key id
         @param qy_secret_access_key - the secret access key
@@ -67,11 +106,26 @@ class APIConnection(HttpConnection):
         @param protocol - the protocol to access to web server, "http" or "https"
         @param pool - the connection pool
         @param retry_time - the retry_time when message send fail
+        @param max_workers - the number of threads used by `submit` and `map`
+        @param cache - the `ResponseCache` of read-only actions, disabled if `None`
+        @param coalesce - concurrent identical read-only requests share one
+                          round trip, each gets its own copy of the response
+        @param signers - the `SignerCache` shared with other connections,
+                         e.g. of the accounts of a manager
         """
         # Set default zone
         self.zone = zone
         # Set retry times
         self.retry_time = retry_time
+        # Threads sending concurrent requests, created on first use
+        self.max_workers = max_workers
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self.cache = cache
+        self.single_flight = SingleFlight(dump_response, load_response) \
+            if coalesce else None
+        # requests built by api methods are captured instead of sent
+        self._capture = threading.local()
 
         super(APIConnection, self).__init__(
             qy_access_key_id, qy_secret_access_key, host, port, protocol,
@@ -80,36 +134,74 @@ class APIConnection(HttpConnection):
         if not self.qy_access_key_id and not self.qy_secret_access_key:
             self._check_token()
 
+        elif signers is not None:
+            self._auth_handler = signers.get(self.host, self.qy_access_key_id,
+                                             self.qy_secret_access_key)
         else:
             self._auth_handler = QuerySignatureAuthHandler(self.host,
                                                            self.qy_access_key_id, self.qy_secret_access_key)
 
-        # other apis
-        self.actions = [
-            InstanceAction(self),
-            InstanceGroupsAction(self),
-            VolumeAction(self),
-            EipAction(self),
-            RouterAction(self),
-            VxnetAction(self),
-            LoadBalancerAction(self),
-            KeypairAction(self),
-            SecurityGroupAction(self),
-            SnapshotAction(self),
-            ImageAction(self),
-            TagAction(self),
-            NicAction(self),
-            AlarmPolicy(self),
-            S2Action(self),
-            ClusterAction(self),
-            SdwanAction(self),
-            MigrateAction(self),
-            VpcBorder(self),
-        ]
+        # action objects of other apis, created on first use
+        self._actions = {}
+
+    @property
+    def actions(self):
+        """ The action objects of all the other apis.
+        """
+        return [self._get_action(cls) for cls in get_action_classes()]
+
+    def _get_action(self, cls):
+        action = self._actions.get(cls)
+        if action is None:
+            action = self._actions.setdefault(cls, cls(self))
+        return action
 
     def send_request(self, action, body, url="/iaas/", verb="GET"):
-        """ Send request
+        """ Send request, a list parameter too long for one request is
+            split into chunks sent concurrently, see `chunking`.
         """
+        captured = getattr(self._capture, 'requests', None)
+        if captured is not None:
+            captured.append((action, body, url, verb))
+            return None
+
+        chunks = split_request(action, body)
+        if chunks:
+            results = self.map('send_request', [
+                {'action': action, 'body': chunk, 'url': url, 'verb': verb}
+                for _, chunk in chunks
+            ], max_workers=min(len(chunks), self.max_workers))
+            return merge_responses(chunks, results)
+
+        request = self._prepare_request(action, body)
+
+        if self.cache is None and self.single_flight is None:
+            return self._send_request(request, url, verb)
+
+        if not is_read_only(action):
+            try:
+                return self._send_request(request, url, verb)
+            finally:
+                if self.cache is not None:
+                    self.cache.invalidate(action, request)
+
+        key = canonical_key(action, request,
+                            '%s@%s' % (self.qy_access_key_id, self.host))
+        generation = None
+        if self.cache is not None:
+            resp = self.cache.get(action, key)
+            if resp is not None:
+                return resp
+            generation = self.cache.generation
+
+        if self.single_flight is not None:
+            return self.single_flight.do(key, self._send_cacheable_request,
+                                         action, key, request, url, verb,
+                                         generation)
+        return self._send_cacheable_request(action, key, request, url, verb,
+                                            generation)
+
+    def _prepare_request(self, action, body):
         request = body
         request['action'] = action
         request.setdefault('zone', self.zone)
@@ -118,7 +210,18 @@ class APIConnection(HttpConnection):
             sys.stdout.flush()
         if self.expires:
             request['expires'] = self.expires
+        return request
+
+    def _send_cacheable_request(self, action, key, request, url, verb,
+                                generation=None):
+        resp = self._send_request(request, url, verb)
+        if self.cache is not None:
+            self.cache.set(action, key, resp, generation)
+        return resp
 
+    def _send_request(self, request, url, verb):
+        """ Send request, retry if failed
+        """
         retry_time = 0
         while retry_time < self.retry_time:
             # Use binary exponential backoff to desynchronize client requests
@@ -126,20 +229,15 @@ class APIConnection(HttpConnection):
             try:
                 response = self.send(verb, url, request)
                 if response.status == 200:
-                    resp_str = response.read()
-                    if type(resp_str) != str:
-                        resp_str = resp_str.decode()
-                    if self.debug:
-                        print(resp_str)
-                        sys.stdout.flush()
-                    if resp_str and json_load(resp_str).get("ret_code") in (5000, 5100) and retry_time < self.retry_time - 1:
+                    resp = self._parse_response(response.read())
+                    if resp and resp.get("ret_code") in (5000, 5100) and retry_time < self.retry_time - 1:
                         # 5000: INTERNAL ERROR
                         # 5100: SERVER BUSY
                         self._get_conn(self.host, self.port)
                         time.sleep(next_sleep)
                         retry_time += 1
                         continue
-                    return json_load(resp_str) if resp_str else ""
+                    return resp
             except Exception:
                 if retry_time < self.retry_time - 1:
                     self._get_conn(self.host, self.port)
@@ -149,7 +247,136 @@ class APIConnection(HttpConnection):
             time.sleep(next_sleep)
             retry_time += 1
 
+    def _parse_response(self, resp_str):
+        """ Parse the body of response once, bytes are given to json_load
+            as they are to save decoding.
+        """
+        if self.debug:
+            print(resp_str.decode() if isinstance(resp_str, bytes) else resp_str)
+            sys.stdout.flush()
+        return json_load(resp_str) if resp_str else ""
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    def submit(self, method_name, **kwargs):
+        """ Call api method in background and return a `concurrent.futures.Future`.
+
+        @param method_name: the name of api method, e.g. "stop_instances".
+        @param kwargs: the parameters of api method.
+        """
+        method = getattr(self, method_name)
+        return self._get_executor().submit(method, **kwargs)
+
+    def map(self, method_name, iterable_of_kwargs, max_workers=None,
+            return_exceptions=True):
+        """ Call api method concurrently for each set of parameters,
+            all requests share the connection pool of this connection.
+        @param method_name: the name of api method, e.g. "stop_instances".
+        @param iterable_of_kwargs: the parameters of each call.
+        @param max_workers: the number of concurrent calls, use the threads of
+                            this connection if not specified.
+        @param return_exceptions: put the exception raised by a call at its place
+                                  in the results, or raise the first one.
+        @return the list of responses, in the order of parameters.
+        """
+        method = getattr(self, method_name)
+        if max_workers:
+            from concurrent.futures import ThreadPoolExecutor
+            executor = ThreadPoolExecutor(max_workers=max_workers)
+        else:
+            executor = self._get_executor()
+        try:
+            futures = [executor.submit(method, **kwargs)
+                       for kwargs in iterable_of_kwargs]
+            results = []
+            for future in futures:
+                error = future.exception()
+                if error is None:
+                    results.append(future.result())
+                elif return_exceptions:
+                    results.append(error)
+                else:
+                    for f in futures:
+                        f.cancel()
+                    raise error
+            return results
+        finally:
+            if max_workers:
+                executor.shutdown(wait=False)
+
+    def iter_describe(self, method_name, page_size=100, prefetch=True,
+                      parallel=None, **filters):
+        """ Iterate over all the items returned by a describe method,
+            pages are fetched on demand and the next page is prefetched
+            in background while the current one is consumed.
+        @param method_name: the name of describe method, e.g. "describe_instances".
+        @param page_size: the number of items fetched by one request.
+        @param prefetch: fetch the next page in background.
+        @param parallel: fetch all the pages with that many concurrent requests
+                         once the total count is known, the items are still
+                         returned in order.
+        @param filters: the parameters of describe method.
+        """
+        return iter(DescribePaginator(self, method_name, page_size, prefetch,
+                                      parallel, **filters))
+
+    def stream_describe(self, method_name, fields=None, chunk_size=65536,
+                        **params):
+        """ Call a describe method and iterate over the returned items while
+            the response is received, instead of loading it at once.
+            The other keys of response are in `head` of the stream after
+            iteration, `APIError` is raised if the call failed.
+
+            >>> stream = conn.stream_describe('describe_instances', verbose=1,
+            ...                               fields=['instance_id', 'status'])
+            >>> for instance in stream:
+            ...     print(instance['instance_id'])
+
+        @param method_name: the name of describe method, e.g. "describe_instances".
+        @param fields: the keys kept in items, all of them if not specified.
+        @param chunk_size: the size of data read at a time.
+        @param params: the parameters of describe method.
+        @return `ResponseStream`
+        """
+        self._capture.requests = []
+        try:
+            getattr(self, method_name)(**params)
+            captured = self._capture.requests
+        finally:
+            self._capture.requests = None
+        if not captured:
+            raise InvalidParameterError('invalid parameters of [%s]' % method_name)
+
+        action, body, url, verb = captured[0]
+        request = self._prepare_request(action, body)
+        response = self.send(verb, url, request)
+        if response.status != 200:
+            # read the body so that the connection can be reused
+            try:
+                response.read()
+            finally:
+                response.close()
+            raise APIError(response.status, response.reason)
+        rtype = get_resource_type_by_method(method_name)
+        from petaexpress.misc.json_stream import ResponseStream
+        return ResponseStream(response, rtype.item_set_key if rtype else None,
+                              fields, chunk_size, check_response)
+
+    def shutdown(self, wait=True):
+        """ Stop the threads used by `submit` and `map`.
+        """
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
     def _gen_req_id(self):
+        import uuid
         return uuid.uuid4().hex
 
     def build_http_request(self, verb, url, base_params, auth_path=None,
@@ -388,9 +615,9 @@ class APIConnection(HttpConnection):
             return None
 
         resp = self.send_request(action, body)
-        if resp and resp.get('meter_set') and decompress:
+        if decompress and resp and resp.get('meter_set'):
             p = MonitorProcessor(resp['meter_set'], start_time, end_time, step)
-            resp['meter_set'] = p.decompress_monitoring_data()
+            resp = dict(resp, meter_set=p.decompress_monitoring_data())
         return resp
 
     def get_loadbalancer_monitoring_data(self, resource,
@@ -421,9 +648,9 @@ class APIConnection(HttpConnection):
             return None
 
         resp = self.send_request(action, body)
-        if resp and resp.get('meter_set') and decompress:
+        if decompress and resp and resp.get('meter_set'):
             p = MonitorProcessor(resp['meter_set'], start_time, end_time, step)
-            resp['meter_set'] = p.decompress_lb_monitoring_data()
+            resp = dict(resp, meter_set=p.decompress_lb_monitoring_data())
         return resp
 
     def describe_rdbs(self, rdbs=None,
@@ -1263,13 +1490,15 @@ class APIConnection(HttpConnection):
         return self.send_request(action, body)
 
     def __getattr__(self, attr):
-        """ Get api functions from each Action class
-        """
-        for action in self.actions:
-            if hasattr(action, attr):
-                return getattr(action, attr)
-
-        raise InvalidAction(attr)
+        """ Get api functions from the Action class defining them, the bound
+            method is kept so that later calls do not come here again.
+        """
+        cls = None if attr.startswith('_') else get_dispatch_table().get(attr)
+        if cls is None:
+            raise InvalidAction(attr)
+        method = getattr(self._get_action(cls), attr)
+        self.__dict__[attr] = method
+        return method
 
     def get_balance(self, **ignore):
         """Get the balance information filtered by conditions.
@@ -43,6 +43,65 @@ class APIError(Exception):
                               self.err_code, self.err_msg)
 
 
+class ChunkedRequestError(Exception):
+    """ Error when some chunks of a split request raised an exception
+    """
+
+    def __init__(self, response):
+        """
+        @param response: the merged response, the chunks which raised are
+                         in its `failed_chunks` with their `error`.
+        """
+        super(ChunkedRequestError, self).__init__(self)
+        self.response = response
+        self.errors = [c['error'] for c in response['failed_chunks']
+                       if 'error' in c]
+
+    def __str__(self):
+        return '%s: %d chunks failed, first error: %s' % (
+            self.__class__.__name__, len(self.errors), self.errors[0])
+
+    __repr__ = __str__
+
+
+class WaitTimeoutError(Exception):
+    """ Error when a job, resource or zone is not done before the deadline
+    """
+
+    def __init__(self, resource_id, timeout):
+        super(WaitTimeoutError, self).__init__(self)
+        self.resource_id = resource_id
+        self.timeout = timeout
+
+    def __str__(self):
+        return '%s: %s not done in %s seconds' % (self.__class__.__name__,
+                                                  self.resource_id, self.timeout)
+
+    __repr__ = __str__
+
+
+class WaitFailedError(Exception):
+    """ Error when a job or resource can not be done anymore, e.g. it
+        has been deleted
+    """
+
+    def __init__(self, resource_id, status=None):
+        """
+        @param status: the status it reached, `None` if it was not found.
+        """
+        super(WaitFailedError, self).__init__(self)
+        self.resource_id = resource_id
+        self.status = status
+
+    def __str__(self):
+        if self.status is None:
+            return '%s: %s not found' % (self.__class__.__name__, self.resource_id)
+        return '%s: %s is %s' % (self.__class__.__name__,
+                                 self.resource_id, self.status)
+
+    __repr__ = __str__
+
+
 class InvalidRouterStatic(Exception):
     pass
 
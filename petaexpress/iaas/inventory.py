@@ -0,0 +1,305 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+"""
+In-memory inventory of resources with secondary indexes
+"""
+
+import threading
+
+from .paginator import check_response
+from .resources import MAX_LIST_SIZE, get_resource_type
+
+
+def _ref_ids(item, list_key, ref_key, id_key, own_id_key):
+    """ IDs of the resources an item refers to, whether as a list of
+        references (e.g. "vxnets"), a single reference (e.g. "vxnet")
+        or a flat ID (e.g. "vxnet_id").
+    """
+    ids = []
+    refs = item.get(list_key)
+    if refs:
+        ids.extend(ref.get(id_key) for ref in refs if ref)
+    ref = item.get(ref_key)
+    if ref:
+        ids.append(ref.get(id_key))
+    if id_key != own_id_key:
+        ids.append(item.get(id_key))
+    return [i for i in ids if i]
+
+
+def _index_status(item, own_id_key):
+    status = item.get('status')
+    return [status] if status else []
+
+
+def _index_owner(item, own_id_key):
+    owner = item.get('owner')
+    return [owner] if owner else []
+
+
+def _index_tag(item, own_id_key):
+    return _ref_ids(item, 'tags', 'tag', 'tag_id', own_id_key)
+
+
+def _index_vxnet(item, own_id_key):
+    return _ref_ids(item, 'vxnets', 'vxnet', 'vxnet_id', own_id_key)
+
+
+def _index_security_group(item, own_id_key):
+    return _ref_ids(item, 'security_groups', 'security_group',
+                    'security_group_id', own_id_key)
+
+
+def _index_image(item, own_id_key):
+    return _ref_ids(item, 'images', 'image', 'image_id', own_id_key)
+
+
+def describe_ids(conn, resource_type, resource_ids, **filters):
+    """ Describe resources by their IDs in batches of `MAX_LIST_SIZE`.
+    @param conn: the `APIConnection`.
+    @param resource_type: `ResourceType`.
+    @param resource_ids: the IDs of resources.
+    @param filters: extra parameters of describe method, e.g. verbose.
+    @return generator of (IDs of batch, described items), items of the
+            resources which do not exist are missing.
+    """
+    method = getattr(conn, resource_type.describe_method)
+    resource_ids = list(resource_ids)
+    for i in range(0, len(resource_ids), MAX_LIST_SIZE):
+        batch = resource_ids[i:i + MAX_LIST_SIZE]
+        params = dict(filters)
+        params[resource_type.id_param] = batch
+        params['limit'] = len(batch)
+        resp = check_response(method(**params))
+        yield batch, resp.get(resource_type.item_set_key) or []
+
+
+INDEXES = {
+    'status': _index_status,
+    'tag': _index_tag,
+    'vxnet': _index_vxnet,
+    'security_group': _index_security_group,
+    'image': _index_image,
+    'owner': _index_owner,
+}
+
+
+class Inventory(object):
+    """ Resources of one type kept in memory, indexed by ID and by the
+        values of `INDEXES` for compound queries. It's thread-safe.
+
+        >>> inventory = Inventory('instance')
+        >>> inventory.load(conn, verbose=1, replace=True)
+        >>> inventory.query(vxnet='vxnet-xxxxxxx', tag='tag-xxxxxxxx',
+        ...                 status='running')
+        >>> inventory.refresh(conn, ['i-xxxxxxxx'])
+    """
+
+    def __init__(self, resource_type, indexes=None):
+        """
+        @param resource_type: the name of resource type, e.g. "instance".
+        @param indexes: the names of indexes to keep, all of `INDEXES`
+                        if not specified.
+        """
+        self.resource_type = get_resource_type(resource_type)
+        if self.resource_type is None:
+            raise ValueError('unknown resource type [%s]' % resource_type)
+        indexes = list(INDEXES) if indexes is None else list(indexes)
+        for name in indexes:
+            if name not in INDEXES:
+                raise ValueError('unknown index [%s]' % name)
+        self.indexes = dict((name, {}) for name in indexes)
+        self.items = {}
+        self.index_keys = {}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, resource_id):
+        return resource_id in self.items
+
+    def __iter__(self):
+        with self.lock:
+            return iter(list(self.items.values()))
+
+    def get(self, resource_id, default=None):
+        return self.items.get(resource_id, default)
+
+    def _unindex(self, resource_id):
+        # must be called with lock held
+        for name, keys in self.index_keys.pop(resource_id, {}).items():
+            index = self.indexes[name]
+            for key in keys:
+                ids = index.get(key)
+                if ids is not None:
+                    ids.discard(resource_id)
+                    if not ids:
+                        del index[key]
+
+    def _index(self, resource_id, item):
+        # must be called with lock held
+        own_id_key = self.resource_type.id_key
+        index_keys = {}
+        for name, index in self.indexes.items():
+            keys = set(INDEXES[name](item, own_id_key))
+            for key in keys:
+                index.setdefault(key, set()).add(resource_id)
+            index_keys[name] = keys
+        self.index_keys[resource_id] = index_keys
+
+    def update(self, items):
+        """ Add items or replace the items of the same IDs.
+        @param items: describe items, dicts or models.
+        @return the number of items.
+        """
+        id_key = self.resource_type.id_key
+        count = 0
+        with self.lock:
+            for item in items:
+                resource_id = item.get(id_key)
+                if resource_id is None:
+                    continue
+                self._unindex(resource_id)
+                self.items[resource_id] = item
+                self._index(resource_id, item)
+                count += 1
+        return count
+
+    def add(self, item):
+        self.update([item])
+
+    def remove(self, resource_id):
+        """ Remove an item.
+        @return the removed item, or `None` if not found.
+        """
+        with self.lock:
+            self._unindex(resource_id)
+            return self.items.pop(resource_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.index_keys.clear()
+            for index in self.indexes.values():
+                index.clear()
+
+    def lookup(self, index, key):
+        """ Get the IDs of the items with a key in an index,
+            e.g. `lookup('vxnet', 'vxnet-0')`.
+        """
+        if index not in self.indexes:
+            raise ValueError('unknown index [%s]' % index)
+        with self.lock:
+            return set(self.indexes[index].get(key, ()))
+
+    def ids(self, **criteria):
+        """ Get the IDs of the items matching all the criteria.
+        @param criteria: index name => key, or list of keys matching any
+                         of them, e.g. `status=['running', 'stopped']`.
+                         `None` values are ignored.
+        @return set of IDs.
+        """
+        criteria = dict((k, v) for k, v in criteria.items() if v is not None)
+        for name in criteria:
+            if name not in self.indexes:
+                raise ValueError('unknown index [%s]' % name)
+
+        with self.lock:
+            if not criteria:
+                return set(self.items)
+            candidates = []
+            for name, keys in criteria.items():
+                index = self.indexes[name]
+                if isinstance(keys, (list, tuple, set, frozenset)):
+                    ids = set()
+                    for key in keys:
+                        ids.update(index.get(key, ()))
+                else:
+                    ids = index.get(keys, ())
+                if not ids:
+                    return set()
+                candidates.append(ids)
+            # intersect from the smallest set
+            candidates.sort(key=len)
+            result = set(candidates[0])
+            for ids in candidates[1:]:
+                result.intersection_update(ids)
+                if not result:
+                    break
+            return result
+
+    def query(self, **criteria):
+        """ Get the items matching all the criteria, see `ids`.
+        @return list of items, in no particular order.
+        """
+        ids = self.ids(**criteria)
+        items = self.items
+        return [items[i] for i in ids if i in items]
+
+    def load(self, conn, replace=False, **filters):
+        """ Describe the resources and add them one page at a time, the
+            lock is not held while pages are fetched.
+        @param conn: the `APIConnection`.
+        @param replace: remove the items which are not described, e.g. of
+                        deleted resources, once all the pages are added.
+        @param filters: the parameters of `iter_describe`, e.g. verbose.
+        @return the number of described items.
+        """
+        method = self.resource_type.describe_method
+        id_key = self.resource_type.id_key
+        page_size = filters.get('page_size', 100)
+        # only the items present before loading may be removed, those
+        # added meanwhile by `add` or `refresh` are up to date
+        with self.lock:
+            stale = set(self.items) if replace else set()
+        count = 0
+        page = []
+        for item in conn.iter_describe(method, **filters):
+            page.append(item)
+            if len(page) >= page_size:
+                count += self.update(page)
+                stale.difference_update(i.get(id_key) for i in page)
+                page = []
+        count += self.update(page)
+        stale.difference_update(i.get(id_key) for i in page)
+        if stale:
+            with self.lock:
+                for resource_id in stale:
+                    self._unindex(resource_id)
+                    self.items.pop(resource_id, None)
+        return count
+
+    def refresh(self, conn, resource_ids, **filters):
+        """ Describe again some resources, their items are replaced and
+            removed if the resources no longer exist.
+        @param conn: the `APIConnection`.
+        @param resource_ids: the IDs of resources.
+        @param filters: extra parameters of describe method, e.g. verbose.
+        @return the number of described items.
+        """
+        id_key = self.resource_type.id_key
+        count = 0
+        for batch, items in describe_ids(conn, self.resource_type, resource_ids,
+                                         **filters):
+            count += self.update(items)
+            found = set(item.get(id_key) for item in items)
+            for resource_id in batch:
+                if resource_id not in found:
+                    self.remove(resource_id)
+        return count
@@ -0,0 +1,202 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+"""
+Persistent inventory of resources in sqlite, refreshed by deltas
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+from petaexpress.misc.json_tool import json_dump, json_load
+
+from .inventory import Inventory, describe_ids
+from .resources import get_resource_type
+
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS resources (
+        zone TEXT NOT NULL,
+        resource_type TEXT NOT NULL,
+        resource_id TEXT NOT NULL,
+        status_time TEXT,
+        item TEXT NOT NULL,
+        PRIMARY KEY (zone, resource_type, resource_id)
+    )''',
+    '''CREATE TABLE IF NOT EXISTS syncs (
+        zone TEXT NOT NULL,
+        resource_type TEXT NOT NULL,
+        synced_at REAL NOT NULL,
+        PRIMARY KEY (zone, resource_type)
+    )''',
+]
+
+
+class InventoryCache(object):
+    """ Describe items of a zone kept in a sqlite database, keyed by resource
+        type. The first `sync` of a type describes all its resources, later
+        ones list the resources without details and describe only those
+        whose `status_time` changed. It's thread-safe.
+
+        >>> cache = InventoryCache('~/.petaexpress/inventory.db', 'pek3a')
+        >>> cache.sync(conn, 'instance')
+        {'added': 2, 'updated': 1, 'removed': 0}
+        >>> instances = cache.items('instance')
+        >>> inventory = cache.inventory('instance')    # to query by indexes
+    """
+
+    def __init__(self, path, zone):
+        """
+        @param path: the path of database file, or ":memory:".
+        @param zone: the zone of cached resources.
+        """
+        self.path = path
+        self.zone = zone
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(os.path.expanduser(path),
+                                  check_same_thread=False)
+        with self.db:
+            for statement in SCHEMA:
+                self.db.execute(statement)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _resource_type(self, resource_type):
+        rtype = get_resource_type(resource_type)
+        if rtype is None:
+            raise ValueError('unknown resource type [%s]' % resource_type)
+        return rtype
+
+    def last_sync(self, resource_type):
+        """ @return the timestamp of last sync, or `None` if never synced.
+        """
+        rtype = self._resource_type(resource_type)
+        with self.lock:
+            row = self.db.execute(
+                'SELECT synced_at FROM syncs WHERE zone = ? AND resource_type = ?',
+                (self.zone, rtype.name)).fetchone()
+        return row[0] if row else None
+
+    def get(self, resource_type, resource_id):
+        """ @return the cached item, or `None` if not found.
+        """
+        rtype = self._resource_type(resource_type)
+        with self.lock:
+            row = self.db.execute(
+                'SELECT item FROM resources WHERE zone = ? AND resource_type = ? '
+                'AND resource_id = ?', (self.zone, rtype.name, resource_id)).fetchone()
+        return json_load(row[0]) if row else None
+
+    def items(self, resource_type):
+        """ @return list of the cached items of a resource type.
+        """
+        rtype = self._resource_type(resource_type)
+        with self.lock:
+            rows = self.db.execute(
+                'SELECT item FROM resources WHERE zone = ? AND resource_type = ? '
+                'ORDER BY resource_id', (self.zone, rtype.name)).fetchall()
+        return [json_load(row[0]) for row in rows]
+
+    def inventory(self, resource_type, indexes=None):
+        """ @return `Inventory` of the cached items of a resource type.
+        """
+        inventory = Inventory(resource_type, indexes)
+        inventory.update(self.items(resource_type))
+        return inventory
+
+    def _status_times(self, rtype):
+        # must be called with lock held
+        return dict(self.db.execute(
+            'SELECT resource_id, status_time FROM resources '
+            'WHERE zone = ? AND resource_type = ?', (self.zone, rtype.name)))
+
+    def _store(self, rtype, items, removed_ids, synced_at):
+        id_key = rtype.id_key
+        rows = [(self.zone, rtype.name, item[id_key], item.get('status_time'),
+                 json_dump(item, raise_error=True)) for item in items]
+        with self.lock, self.db:
+            self.db.executemany(
+                'INSERT OR REPLACE INTO resources '
+                '(zone, resource_type, resource_id, status_time, item) '
+                'VALUES (?, ?, ?, ?, ?)', rows)
+            self.db.executemany(
+                'DELETE FROM resources WHERE zone = ? AND resource_type = ? '
+                'AND resource_id = ?',
+                [(self.zone, rtype.name, i) for i in removed_ids])
+            self.db.execute(
+                'INSERT OR REPLACE INTO syncs (zone, resource_type, synced_at) '
+                'VALUES (?, ?, ?)', (self.zone, rtype.name, synced_at))
+
+    def sync(self, conn, resource_type, full=False, verbose=1, **iter_options):
+        """ Bring the cached items of a resource type up to date.
+        @param conn: the `APIConnection` of the zone.
+        @param resource_type: the name of resource type, e.g. "instance".
+        @param full: describe all the resources with details, as the first
+                     sync does. Resources without `status_time` are always
+                     described again.
+        @param verbose: the verbose level of cached items.
+        @param iter_options: options of `iter_describe`, e.g. parallel.
+        @return dict of the numbers of added, updated and removed items.
+        """
+        rtype = self._resource_type(resource_type)
+        if getattr(conn, 'zone', self.zone) != self.zone:
+            raise ValueError('connection of zone [%s] for cache of zone [%s]'
+                             % (conn.zone, self.zone))
+        synced_at = time.time()
+        id_key = rtype.id_key
+        with self.lock:
+            cached = self._status_times(rtype)
+        full = full or self.last_sync(rtype) is None
+
+        if full:
+            items = [item for item in conn.iter_describe(
+                rtype.describe_method, verbose=verbose, **iter_options)
+                if item.get(id_key)]
+            seen = set(item[id_key] for item in items)
+        else:
+            # listing without details, then the details of changed resources
+            changed, seen = [], set()
+            for item in conn.iter_describe(rtype.describe_method, **iter_options):
+                resource_id = item.get(id_key)
+                if not resource_id:
+                    continue
+                seen.add(resource_id)
+                status_time = item.get('status_time')
+                if status_time is None or cached.get(resource_id, False) != status_time:
+                    changed.append(resource_id)
+            items = []
+            for batch, batch_items in describe_ids(conn, rtype, changed,
+                                                   verbose=verbose):
+                items.extend(batch_items)
+                # deleted since listed
+                seen.difference_update(
+                    set(batch) - set(item.get(id_key) for item in batch_items))
+
+        removed = [i for i in cached if i not in seen]
+        self._store(rtype, items, removed, synced_at)
+        added = sum(1 for item in items if item[id_key] not in cached)
+        return {'added': added, 'updated': len(items) - added,
+                'removed': len(removed)}
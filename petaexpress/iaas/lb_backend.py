@@ -15,7 +15,10 @@
 # =========================================================================
 
 import json
-from past.builtins import basestring
+try:
+    basestring
+except NameError:
+    basestring = str
 
 
 class LoadBalancerBackend(object):
@@ -0,0 +1,145 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+"""
+Batch lookups of single resources into multi-ID describe calls
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from .paginator import check_response
+from .resources import MAX_LIST_SIZE, get_resource_type
+
+
+class DescribeLoader(object):
+    """ Collect the lookups of single resources arriving within a short
+        window (or up to `max_batch` IDs) and describe them in one call.
+        It's thread-safe.
+
+        >>> loader = DescribeLoader(conn, 'instance', verbose=1)
+        >>> futures = [loader.load(instance_id) for instance_id in instance_ids]
+        >>> instances = [f.result() for f in futures]
+    """
+
+    def __init__(self, conn, resource_type, max_batch=MAX_LIST_SIZE,
+                 window=0.005, **filters):
+        """
+        @param conn: the `APIConnection`.
+        @param resource_type: the name of resource type, e.g. "instance".
+        @param max_batch: the max number of IDs described by one call.
+        @param window: seconds to wait for more lookups before describing.
+        @param filters: extra parameters of describe method, e.g. verbose.
+        """
+        self.conn = conn
+        self.resource_type = get_resource_type(resource_type)
+        if self.resource_type is None:
+            raise ValueError('unknown resource type [%s]' % resource_type)
+        self.max_batch = max_batch
+        self.window = window
+        self.filters = filters
+        self.lock = threading.Lock()
+        self.pending = OrderedDict()
+        self.timer = None
+
+    def _new_future(self):
+        return Future()
+
+    def load(self, resource_id):
+        """ Look up a resource by ID.
+        @return a future of the described item, or `None` if not found.
+        """
+        future = self._new_future()
+        batch = None
+        with self.lock:
+            self.pending.setdefault(resource_id, []).append(future)
+            if len(self.pending) >= self.max_batch:
+                batch = self._take_batch()
+            elif self.timer is None:
+                self._schedule()
+        if batch:
+            self._dispatch(batch)
+        return future
+
+    def load_many(self, resource_ids):
+        return [self.load(resource_id) for resource_id in resource_ids]
+
+    def get(self, resource_id, timeout=None):
+        """ Look up a resource by ID and wait for the result.
+        """
+        return self.load(resource_id).result(timeout)
+
+    def flush(self):
+        """ Describe pending lookups without waiting for the window.
+        """
+        with self.lock:
+            batch = self._take_batch()
+        if batch:
+            self._dispatch(batch)
+
+    def _schedule(self):
+        self.timer = threading.Timer(self.window, self.flush)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def _take_batch(self):
+        # must be called with lock held
+        batch, self.pending = self.pending, OrderedDict()
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        return batch
+
+    def _dispatch(self, batch):
+        self.conn._get_executor().submit(self._describe, batch)
+
+    def _build_params(self, batch):
+        params = dict(self.filters)
+        params[self.resource_type.id_param] = list(batch)
+        params['limit'] = len(batch)
+        return params
+
+    def _resolve(self, batch, resp, error=None):
+        if error is None:
+            try:
+                check_response(resp)
+            except Exception as e:
+                error = e
+        if error is not None:
+            for futures in batch.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(error)
+            return
+
+        id_key = self.resource_type.id_key
+        items = dict((item.get(id_key), item)
+                     for item in resp.get(self.resource_type.item_set_key) or [])
+        for resource_id, futures in batch.items():
+            for future in futures:
+                if not future.done():
+                    future.set_result(items.get(resource_id))
+
+    def _describe(self, batch):
+        method = getattr(self.conn, self.resource_type.describe_method)
+        try:
+            resp = method(**self._build_params(batch))
+        except Exception as e:
+            self._resolve(batch, None, e)
+        else:
+            self._resolve(batch, resp)
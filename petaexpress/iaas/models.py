@@ -0,0 +1,380 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+"""
+Compact models of the items returned by describe actions.
+
+Every known field of a resource is a slot instead of a dict entry, fields
+not known by the model are kept in a tuple of pairs, short strings
+repeated between resources (status, zone, type...) are interned and equal
+nested items (image, security group, tags...) are shared, so that 100k
+resources don't keep 100k copies of them.
+
+    >>> instances = to_models(conn.describe_instances(verbose=1))
+    >>> instances[0].status, instances[0]['instance_id']
+"""
+
+import sys
+
+try:
+    intern = sys.intern
+except AttributeError:
+    pass
+
+# strings not longer than that are interned
+MAX_INTERN_LENGTH = 32
+# max number of distinct nested models shared by `iter_models`
+MAX_SHARED = 4096
+
+
+def _compact(value):
+    if type(value) is str:
+        if len(value) <= MAX_INTERN_LENGTH:
+            return intern(value)
+        return value
+    if type(value) is list:
+        return tuple([_compact(v) for v in value])
+    if type(value) is dict:
+        return dict((_compact(k), _compact(v)) for k, v in value.items())
+    return value
+
+
+class Model(object):
+    """ Base of models, a model has the fields in its `__slots__`, fields
+        missing in the item are `None`. Models are read-only, lists are
+        turned into tuples and equal nested models may be shared.
+
+        Models can be read like the items they are built from, with
+        `model['field']` and `model.get('field')`.
+    """
+    __slots__ = ('_extra',)
+
+    # field => model class of a nested item or list of items
+    NESTED = {}
+
+    @classmethod
+    def from_dict(cls, item, shared=None):
+        """ Build the model of a describe item.
+        @param item: the describe item.
+        @param shared: a dict to share equal nested models between the
+                       models built with it.
+        """
+        model = cls.__new__(cls)
+        extra = []
+        fields = cls._fields()
+        nested = cls.NESTED
+        for key, value in item.items():
+            if key in nested and value is not None:
+                value = nested[key].from_value(value, shared)
+            else:
+                value = _compact(value)
+            if key in fields:
+                object.__setattr__(model, key, value)
+            else:
+                extra.append((intern(key) if type(key) is str else key, value))
+        object.__setattr__(model, '_extra', tuple(extra) if extra else None)
+        return model
+
+    @classmethod
+    def from_value(cls, value, shared=None):
+        if isinstance(value, list):
+            return tuple([cls.from_value(v, shared) for v in value])
+        if not isinstance(value, dict):
+            return _compact(value)
+        if shared is None:
+            return cls.from_dict(value)
+        try:
+            key = (cls, tuple(sorted(value.items())))
+            hash(key)
+        except TypeError:
+            return cls.from_dict(value, shared)
+        model = shared.get(key)
+        if model is None:
+            model = cls.from_dict(value, shared)
+            if len(shared) < MAX_SHARED:
+                shared[key] = model
+        return model
+
+    def __setattr__(self, name, value):
+        raise AttributeError('%s is read-only' % self.__class__.__name__)
+
+    def __reduce__(self):
+        return _from_dict, (self.__class__, self.to_dict())
+
+    @classmethod
+    def _fields(cls):
+        fields = cls.__dict__.get('_field_set')
+        if fields is None:
+            fields = set()
+            for klass in cls.__mro__:
+                fields.update(klass.__dict__.get('__slots__', ()))
+            fields.discard('_extra')
+            fields = frozenset(fields)
+            setattr(cls, '_field_set', fields)
+        return fields
+
+    def __getattr__(self, name):
+        # only called for unset slots and unknown fields
+        if name in self._fields():
+            return None
+        if name != '_extra':
+            for key, value in self._extra or ():
+                if key == name:
+                    return value
+        raise AttributeError(name)
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def get(self, key, default=None):
+        if key in self._fields():
+            try:
+                return object.__getattribute__(self, key)
+            except AttributeError:
+                return default
+        for k, value in self._extra or ():
+            if k == key:
+                return value
+        return default
+
+    def keys(self):
+        keys = [key for key in sorted(self._fields())
+                if self.get(key, _MISSING) is not _MISSING]
+        return keys + [key for key, _ in self._extra or ()]
+
+    def to_dict(self):
+        """ Convert back to the describe item.
+        """
+        return dict((key, _to_plain(self.get(key))) for key in self.keys())
+
+    def __eq__(self, other):
+        if not isinstance(other, Model):
+            return NotImplemented
+        return type(self) is type(other) and self.to_dict() == other.to_dict()
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        id_field = self.__slots__[0] if self.__slots__ else None
+        return '<%s: %s>' % (self.__class__.__name__,
+                             self.get(id_field) if id_field else '')
+
+
+_MISSING = object()
+
+
+def _from_dict(model_class, item):
+    return model_class.from_dict(item)
+
+
+def _to_plain(value):
+    if isinstance(value, Model):
+        return value.to_dict()
+    if isinstance(value, tuple):
+        return [_to_plain(v) for v in value]
+    if isinstance(value, dict):
+        return dict((k, _to_plain(v)) for k, v in value.items())
+    return value
+
+
+class Tag(Model):
+    __slots__ = ('tag_id', 'tag_name', 'tag_key', 'color', 'description',
+                 'owner', 'create_time', 'resource_count')
+
+
+class ImageRef(Model):
+    __slots__ = ('image_id', 'image_name', 'image_size', 'os_family',
+                 'platform', 'processor_type', 'provider')
+
+
+class SecurityGroupRef(Model):
+    __slots__ = ('security_group_id', 'security_group_name', 'is_default')
+
+
+class EipRef(Model):
+    __slots__ = ('eip_id', 'eip_name', 'eip_addr', 'bandwidth')
+
+
+class InstanceRef(Model):
+    __slots__ = ('instance_id', 'instance_name', 'device', 'status')
+
+
+class InstanceVxnet(Model):
+    __slots__ = ('vxnet_id', 'vxnet_name', 'vxnet_type', 'nic_id',
+                 'private_ip', 'role')
+
+
+class Instance(Model):
+    __slots__ = ('instance_id', 'instance_name', 'description', 'instance_type',
+                 'instance_class', 'vcpus_current', 'memory_current', 'cpu_topology',
+                 'image', 'vxnets', 'eip', 'volume_ids', 'volumes', 'keypair_ids',
+                 'security_group', 'status', 'transition_status', 'sub_code',
+                 'create_time', 'status_time', 'lastest_snapshot_time',
+                 'alarm_status', 'graphics_protocol', 'dns_aliases', 'owner',
+                 'zone_id', 'tags')
+    NESTED = {'image': ImageRef, 'vxnets': InstanceVxnet, 'eip': EipRef,
+              'security_group': SecurityGroupRef, 'tags': Tag}
+
+
+class Volume(Model):
+    __slots__ = ('volume_id', 'volume_name', 'description', 'volume_type',
+                 'size', 'instance', 'instances', 'status', 'transition_status',
+                 'sub_code', 'create_time', 'status_time',
+                 'lastest_snapshot_time', 'owner', 'zone_id', 'tags')
+    NESTED = {'instance': InstanceRef, 'instances': InstanceRef, 'tags': Tag}
+
+
+class Eip(Model):
+    __slots__ = ('eip_id', 'eip_name', 'description', 'eip_addr', 'bandwidth',
+                 'billing_mode', 'eip_group', 'resource', 'associate_mode',
+                 'need_icp', 'icp_codes', 'status', 'transition_status',
+                 'sub_code', 'create_time', 'status_time', 'owner', 'zone_id',
+                 'tags')
+    NESTED = {'tags': Tag}
+
+
+class Vxnet(Model):
+    __slots__ = ('vxnet_id', 'vxnet_name', 'description', 'vxnet_type',
+                 'router', 'instance_ids', 'available_ip_count', 'create_time',
+                 'owner', 'zone_id', 'tags')
+    NESTED = {'tags': Tag}
+
+
+class Router(Model):
+    __slots__ = ('router_id', 'router_name', 'description', 'router_type',
+                 'private_ip', 'eip', 'vxnets', 'security_group_id',
+                 'is_applied', 'status', 'transition_status', 'sub_code',
+                 'create_time', 'status_time', 'owner', 'zone_id', 'tags')
+    NESTED = {'vxnets': InstanceVxnet, 'eip': EipRef, 'tags': Tag}
+
+
+class LoadBalancer(Model):
+    __slots__ = ('loadbalancer_id', 'loadbalancer_name', 'description',
+                 'loadbalancer_type', 'node_count', 'mode', 'eips', 'vxnet_id',
+                 'private_ips', 'security_group_id', 'listeners', 'cluster',
+                 'is_applied', 'status', 'transition_status', 'sub_code',
+                 'create_time', 'status_time', 'owner', 'zone_id', 'tags')
+    NESTED = {'tags': Tag}
+
+
+class SecurityGroup(Model):
+    __slots__ = ('security_group_id', 'security_group_name', 'description',
+                 'is_default', 'is_applied', 'resources', 'create_time',
+                 'owner', 'zone_id', 'tags')
+    NESTED = {'tags': Tag}
+
+
+class Snapshot(Model):
+    __slots__ = ('snapshot_id', 'snapshot_name', 'description', 'snapshot_type',
+                 'root_id', 'parent_id', 'is_head', 'is_taken', 'size',
+                 'total_size', 'total_count', 'head_chain', 'resource',
+                 'status', 'transition_status', 'sub_code', 'snapshot_time',
+                 'create_time', 'status_time', 'owner', 'zone_id', 'tags')
+    NESTED = {'tags': Tag}
+
+
+class Image(Model):
+    __slots__ = ('image_id', 'image_name', 'description', 'os_family',
+                 'platform', 'processor_type', 'provider', 'architecture',
+                 'size', 'visibility', 'recommended_type', 'feature',
+                 'ui_type', 'default_user', 'default_passwd', 'app_billing_id',
+                 'status', 'transition_status', 'sub_code', 'create_time',
+                 'status_time', 'owner', 'zone_id', 'tags')
+    NESTED = {'tags': Tag}
+
+
+class KeyPair(Model):
+    __slots__ = ('keypair_id', 'keypair_name', 'description', 'encrypt_method',
+                 'pub_key', 'instance_ids', 'create_time', 'owner', 'tags')
+    NESTED = {'tags': Tag}
+
+
+class Nic(Model):
+    __slots__ = ('nic_id', 'nic_name', 'vxnet_id', 'vxnet', 'private_ip',
+                 'instance_id', 'role', 'sequence', 'status', 'create_time',
+                 'status_time', 'owner', 'zone_id', 'tags')
+    NESTED = {'tags': Tag}
+
+
+class Job(Model):
+    __slots__ = ('job_id', 'job_action', 'resource_ids', 'status',
+                 'create_time', 'status_time', 'owner', 'zone_id')
+
+
+# resource type => model class
+MODEL_CLASSES = {
+    'instance': Instance,
+    'volume': Volume,
+    'eip': Eip,
+    'vxnet': Vxnet,
+    'router': Router,
+    'loadbalancer': LoadBalancer,
+    'security_group': SecurityGroup,
+    'snapshot': Snapshot,
+    'image': Image,
+    'keypair': KeyPair,
+    'tag': Tag,
+    'nic': Nic,
+    'job': Job,
+}
+
+_MODELS_BY_SET_KEY = dict(('%s_set' % name, model)
+                          for name, model in MODEL_CLASSES.items())
+
+
+def get_model_class(item_set_key):
+    """ Get the model class of items by the key of their set in
+        responses, e.g. "instance_set".
+        @return the model class or `None` if unknown
+    """
+    return _MODELS_BY_SET_KEY.get(item_set_key)
+
+
+def iter_models(items, model_class):
+    """ Build the models of items one by one, the items can be released
+        as soon as their model is built, e.g. with `stream_describe`.
+    """
+    shared = {}
+    for item in items:
+        yield model_class.from_dict(item, shared)
+
+
+def to_models(resp, item_set_key=None):
+    """ Build the models of the items of a describe response.
+    @param resp: the describe response.
+    @param item_set_key: the key of items, the only `*_set` key of response
+                         if not specified.
+    @return the list of models.
+    """
+    if item_set_key is None:
+        keys = [k for k in resp if k.endswith('_set') and isinstance(resp[k], list)]
+        if len(keys) != 1:
+            raise ValueError('item set of response is ambiguous: %s' % keys)
+        item_set_key = keys[0]
+    model_class = get_model_class(item_set_key)
+    if model_class is None:
+        raise ValueError('no model of [%s]' % item_set_key)
+    return list(iter_models(resp[item_set_key], model_class))
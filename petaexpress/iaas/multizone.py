@@ -0,0 +1,219 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+"""
+Run api methods across many zones concurrently
+"""
+
+import threading
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from petaexpress.conn.auth import SignerCache
+from petaexpress.conn.connection import ConnectionPool
+
+from .connection import APIConnection
+from .errors import WaitTimeoutError
+from .paginator import DescribePaginator, check_response, get_item_set_key
+from .resources import get_resource_type_by_method
+
+
+def fan_out(calls, max_workers=None, timeout=None):
+    """ Run calls concurrently and wait for them up to a timeout.
+    @param calls: dict of key => function without argument.
+    @param max_workers: the number of concurrent calls, one per call if
+                        not specified.
+    @param timeout: the seconds to wait for the calls, those which do not
+                    finish in time get `WaitTimeoutError` and are left to
+                    finish in background.
+    @return dict of key => result, or the exception it raised.
+    """
+    if not calls:
+        return {}
+    executor = ThreadPoolExecutor(
+        max_workers=min(max_workers or len(calls), len(calls)))
+    try:
+        futures = dict((key, executor.submit(func)) for key, func in calls.items())
+        wait(futures.values(), timeout=timeout)
+    finally:
+        executor.shutdown(wait=False)
+
+    results = {}
+    for key, future in futures.items():
+        if not future.done():
+            future.cancel()
+            results[key] = WaitTimeoutError(key, timeout)
+        elif future.exception() is not None:
+            results[key] = future.exception()
+        else:
+            results[key] = future.result()
+    return results
+
+
+def describe_all(conn, method_name, **params):
+    """ Describe all the items page by page, as one response.
+    """
+    paginator = DescribePaginator(conn, method_name, **params)
+    items = list(paginator)
+    return {'ret_code': 0, paginator.item_set_key: items,
+            'total_count': len(items)}
+
+
+def merge_describe(method_name, results, tag_key, failed_key):
+    """ Merge the describe responses of many connections.
+    @param method_name: the name of describe method, e.g. "describe_volumes".
+    @param results: dict of key => response, or the exception it raised.
+    @param tag_key: the key set to the key of their response in the copies
+                    of items.
+    @param failed_key: the key of merged response holding the failures.
+    @return the merged response, with the sum of `total_count`, and the
+            failures as key => exception.
+    """
+    rtype = get_resource_type_by_method(method_name)
+    item_set_key = rtype.item_set_key if rtype else None
+    merged = {'ret_code': 0, 'total_count': 0, failed_key: {}}
+    items = []
+    for key in sorted(results):
+        resp = results[key]
+        if not isinstance(resp, Exception):
+            try:
+                check_response(resp)
+            except Exception as e:
+                resp = e
+        if isinstance(resp, Exception):
+            merged[failed_key][key] = resp
+            continue
+
+        set_key = item_set_key or get_item_set_key(method_name, resp)
+        resp_items = resp.get(set_key) or [] if set_key else []
+        # tag copies, the responses may be shared with a cache
+        items.extend(dict(item, **{tag_key: key}) for item in resp_items)
+        merged['total_count'] += resp.get('total_count', len(resp_items))
+        item_set_key = set_key
+    merged[item_set_key or 'item_set'] = items
+    return merged
+
+
+class MultiZoneConnection(object):
+    """ `APIConnection`s of many zones sharing one `ConnectionPool`, api
+        methods are called in all the zones concurrently and a zone which
+        does not answer in time does not hold back the others.
+
+        >>> conn = MultiZoneConnection('access key id', 'secret access key',
+        ...                            timeout=10)
+        >>> ret = conn.describe('describe_instances', status=['running'])
+        >>> for instance in ret['instance_set']:
+        ...     print(instance['zone_id'], instance['instance_id'])
+        >>> ret['failed_zones']
+    """
+
+    def __init__(self, qy_access_key_id, qy_secret_access_key, zones=None,
+                 pool=None, max_workers=None, timeout=None, **conn_kwargs):
+        """
+        @param qy_access_key_id - the access key id
+        @param qy_secret_access_key - the secret access key
+        @param zones - the zone ids, the active zones of `describe_zones`
+                       if not specified.
+        @param pool - the connection pool shared by all the zones.
+        @param max_workers - the number of concurrent calls, one per zone
+                             if not specified.
+        @param timeout - the default seconds to wait for each zone, counted
+                         from the start of a call.
+        @param conn_kwargs - other parameters of `APIConnection`, e.g. host.
+        """
+        self.qy_access_key_id = qy_access_key_id
+        self.qy_secret_access_key = qy_secret_access_key
+        self.pool = pool if pool else ConnectionPool()
+        self.max_workers = max_workers
+        self.timeout = timeout
+        # the connections of all the zones use the same signer
+        self.signers = conn_kwargs.pop('signers', None)
+        if self.signers is None:
+            self.signers = SignerCache()
+        self.conn_kwargs = conn_kwargs
+        self._zones = list(zones) if zones else None
+        self.connections = {}
+        self.lock = threading.Lock()
+
+    def connection(self, zone):
+        """ Get the `APIConnection` of a zone.
+        """
+        with self.lock:
+            conn = self.connections.get(zone)
+            if conn is None:
+                conn = self.connections[zone] = APIConnection(
+                    self.qy_access_key_id, self.qy_secret_access_key, zone,
+                    pool=self.pool, signers=self.signers, **self.conn_kwargs)
+            return conn
+
+    def zones(self, refresh=False):
+        """ Get the zone ids, discovered by `describe_zones` unless given.
+        @param refresh: describe the zones again.
+        """
+        if self._zones is None or refresh:
+            resp = check_response(self.connection(None).describe_zones())
+            self._zones = [z['zone_id'] for z in resp.get('zone_set') or []
+                           if z.get('status', 'active') == 'active']
+        return list(self._zones)
+
+    def call(self, method_name, zones=None, timeout=None, **params):
+        """ Call an api method in many zones concurrently.
+        @param method_name: the name of api method, e.g. "stop_instances".
+        @param zones: the zone ids, all of `zones()` if not specified.
+        @param timeout: the seconds to wait for each zone, `self.timeout` if
+                        not specified, the zones which do not answer in time
+                        get `WaitTimeoutError`.
+        @param params: the parameters of api method.
+        @return dict of zone => response, or the exception it raised.
+        """
+        return self._fan_out(lambda conn: getattr(conn, method_name)(**params),
+                             zones, timeout)
+
+    def describe(self, method_name, zones=None, timeout=None, all_pages=False,
+                 **params):
+        """ Call a describe method in many zones concurrently and merge the
+            items, each of them tagged with its `zone_id`.
+        @param method_name: the name of describe method, e.g. "describe_volumes".
+        @param zones: the zone ids, all of `zones()` if not specified.
+        @param timeout: the seconds to wait for each zone, see `call`.
+        @param all_pages: fetch all the items of each zone page by page
+                          instead of one page.
+        @param params: the parameters of describe method.
+        @return the merged response, see `merge_describe`, the zones which
+                failed or timed out are in `failed_zones`.
+        """
+        if all_pages:
+            results = self._fan_out(
+                lambda conn: describe_all(conn, method_name, **params),
+                zones, timeout)
+        else:
+            results = self.call(method_name, zones, timeout, **params)
+        return merge_describe(method_name, results, 'zone_id', 'failed_zones')
+
+    def _fan_out(self, func, zones, timeout):
+        zones = list(zones) if zones is not None else self.zones()
+        calls = dict((zone, partial(func, self.connection(zone))) for zone in zones)
+        return fan_out(calls, self.max_workers,
+                       self.timeout if timeout is None else timeout)
+
+    def shutdown(self, wait=True):
+        """ Stop the threads of the zone connections.
+        """
+        with self.lock:
+            connections = list(self.connections.values())
+        for conn in connections:
+            conn.shutdown(wait=wait)
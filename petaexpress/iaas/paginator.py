@@ -0,0 +1,190 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+"""
+Iterate over the results of describe actions page by page
+"""
+
+from .errors import APIError
+from .resources import MAX_LIST_SIZE
+
+
+def get_item_set_key(method_name, resp):
+    """ Get the key of the result list in a describe response,
+        e.g. "instance_set" for "describe_instances".
+    """
+    keys = [key for key, value in resp.items()
+            if key.endswith('_set') and isinstance(value, list)]
+    if len(keys) > 1:
+        matched = [key for key in keys if key[:-len('_set')] in method_name]
+        keys = matched or keys
+    return sorted(keys)[0] if keys else None
+
+
+def check_response(resp):
+    """ Raise `APIError` if the response is a failure
+    """
+    if not resp:
+        raise APIError(-1, 'no response')
+    if resp.get('ret_code', 0) != 0:
+        raise APIError(resp.get('ret_code'), resp.get('message'))
+    return resp
+
+
+class DescribePaginator(object):
+    """ Iterate over all the items returned by a describe action,
+        the next page is fetched in background while the current one
+        is consumed.
+
+        >>> for instance in DescribePaginator(conn, 'describe_instances',
+        ...                                   status=['running']):
+        ...     print(instance['instance_id'])
+    """
+
+    # how many times windows are fetched again when total count drifts
+    MAX_DRIFT_RETRIES = 3
+
+    def __init__(self, conn, method_name, page_size=100, prefetch=True,
+                 parallel=None, **filters):
+        """
+        @param conn: the `APIConnection`.
+        @param method_name: the name of describe method, e.g. "describe_instances".
+        @param page_size: the number of items fetched by one request,
+                          at most `MAX_LIST_SIZE`.
+        @param prefetch: fetch the next page in background.
+        @param parallel: fetch all the pages with that many concurrent requests
+                         once the total count is known from the first page.
+        @param filters: the parameters of describe method, `offset` is the
+                        starting offset of iteration.
+        """
+        self.conn = conn
+        self.method_name = method_name
+        # the server returns at most MAX_LIST_SIZE items whatever the limit
+        self.page_size = min(filters.pop('limit', None) or page_size,
+                             MAX_LIST_SIZE)
+        self.offset = filters.pop('offset', None) or 0
+        self.prefetch = prefetch
+        self.parallel = parallel
+        self.filters = filters
+        self.item_set_key = None
+        self.total_count = None
+        # whether total count still changed after the last retry
+        self.drifted = False
+
+    def fetch_page(self, offset):
+        """ Fetch the page starting at offset synchronously
+        """
+        method = getattr(self.conn, self.method_name)
+        return check_response(method(offset=offset, limit=self.page_size,
+                                     **self.filters))
+
+    def _submit_page(self, offset):
+        return self.conn.submit(self.method_name, offset=offset,
+                                limit=self.page_size, **self.filters)
+
+    def _get_items(self, resp):
+        if self.item_set_key is None:
+            self.item_set_key = get_item_set_key(self.method_name, resp)
+        return resp.get(self.item_set_key) or []
+
+    def _has_next(self, offset, items):
+        if not items:
+            return False
+        if self.total_count is not None:
+            return offset + len(items) < self.total_count
+        return len(items) >= self.page_size
+
+    def _parallel_pages(self, first):
+        """ Fetch the pages after the first one concurrently, at most
+            `parallel` at a time, and yield them in order as soon as they
+            are fetched. When a window reports another total count, it
+            and the windows in flight are fetched again, `drifted` is set
+            if windows already yielded do not match the final total count.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        executor = ThreadPoolExecutor(max_workers=self.parallel)
+        total = self.total_count
+        # the total counts of the windows yielded
+        totals = set([total])
+        futures = {}
+        offset = next_offset = self.offset + self.page_size
+        rounds = 0
+        self.drifted = False
+        try:
+            yield first
+            while offset < total:
+                while next_offset < total and len(futures) < self.parallel:
+                    futures[next_offset] = executor.submit(self.fetch_page,
+                                                           next_offset)
+                    next_offset += self.page_size
+                resp = futures.pop(offset).result()
+                page_total = resp.get('total_count', total)
+                if page_total != total:
+                    total = self.total_count = page_total
+                    if rounds < self.MAX_DRIFT_RETRIES:
+                        # the windows in flight may have been fetched
+                        # before the change too
+                        rounds += 1
+                        for future in futures.values():
+                            future.cancel()
+                        futures.clear()
+                        next_offset = offset
+                        continue
+                    self.drifted = True
+                totals.add(page_total)
+                yield resp
+                offset += self.page_size
+        finally:
+            for future in futures.values():
+                future.cancel()
+            executor.shutdown(wait=False)
+        self.drifted = self.drifted or totals != set([total])
+
+    def pages(self):
+        """ Iterate over the responses of each page
+        """
+        offset = self.offset
+        future = None
+        resp = self.fetch_page(offset)
+        if self.parallel and self.parallel > 1 and 'total_count' in resp:
+            self.total_count = resp['total_count']
+            for resp in self._parallel_pages(resp):
+                yield resp
+            return
+        try:
+            while True:
+                self.total_count = resp.get('total_count', self.total_count)
+                items = self._get_items(resp)
+                has_next = self._has_next(offset, items)
+                if has_next and self.prefetch:
+                    future = self._submit_page(offset + len(items))
+                yield resp
+                if not has_next:
+                    return
+                offset += len(items)
+                if future is not None:
+                    resp, future = check_response(future.result()), None
+                else:
+                    resp = self.fetch_page(offset)
+        finally:
+            if future is not None:
+                future.cancel()
+
+    def __iter__(self):
+        for resp in self.pages():
+            for item in self._get_items(resp):
+                yield item
@@ -0,0 +1,101 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+"""
+Resource types and the describe actions returning them
+"""
+
+# the max number of items a list parameter accepts
+MAX_LIST_SIZE = 100
+
+
+class ResourceType(object):
+    """ How to describe resources of one type by their IDs
+    """
+
+    def __init__(self, name, prefix, describe_method, id_param, id_key,
+                 item_set_key):
+        """
+        @param name: the name of resource type, e.g. "instance".
+        @param prefix: the prefix of resource IDs, e.g. "i-".
+        @param describe_method: the describe method, e.g. "describe_instances".
+        @param id_param: the parameter of describe method for IDs, e.g. "instances".
+        @param id_key: the key of ID in the returned items, e.g. "instance_id".
+        @param item_set_key: the key of returned items, e.g. "instance_set".
+        """
+        self.name = name
+        self.prefix = prefix
+        self.describe_method = describe_method
+        self.id_param = id_param
+        self.id_key = id_key
+        self.item_set_key = item_set_key
+
+    def __repr__(self):
+        return '<ResourceType: %s>' % self.name
+
+
+RESOURCE_TYPES = dict((t.name, t) for t in [
+    ResourceType('instance', 'i-', 'describe_instances', 'instances',
+                 'instance_id', 'instance_set'),
+    ResourceType('volume', 'vol-', 'describe_volumes', 'volumes',
+                 'volume_id', 'volume_set'),
+    ResourceType('eip', 'eip-', 'describe_eips', 'eips',
+                 'eip_id', 'eip_set'),
+    ResourceType('vxnet', 'vxnet-', 'describe_vxnets', 'vxnets',
+                 'vxnet_id', 'vxnet_set'),
+    ResourceType('router', 'rtr-', 'describe_routers', 'routers',
+                 'router_id', 'router_set'),
+    ResourceType('loadbalancer', 'lb-', 'describe_loadbalancers', 'loadbalancers',
+                 'loadbalancer_id', 'loadbalancer_set'),
+    ResourceType('security_group', 'sg-', 'describe_security_groups',
+                 'security_groups', 'security_group_id', 'security_group_set'),
+    ResourceType('image', 'img-', 'describe_images', 'images',
+                 'image_id', 'image_set'),
+    ResourceType('snapshot', 'ss-', 'describe_snapshots', 'snapshots',
+                 'snapshot_id', 'snapshot_set'),
+    ResourceType('keypair', 'kp-', 'describe_key_pairs', 'keypairs',
+                 'keypair_id', 'keypair_set'),
+    ResourceType('tag', 'tag-', 'describe_tags', 'tags',
+                 'tag_id', 'tag_set'),
+    ResourceType('nic', None, 'describe_nics', 'nics',
+                 'nic_id', 'nic_set'),
+    ResourceType('job', 'j-', 'describe_jobs', 'jobs',
+                 'job_id', 'job_set'),
+])
+
+_TYPES_BY_PREFIX = dict((t.prefix, t) for t in RESOURCE_TYPES.values() if t.prefix)
+_TYPES_BY_METHOD = dict((t.describe_method, t) for t in RESOURCE_TYPES.values())
+
+
+def get_resource_type(resource):
+    """ Get `ResourceType` by its name, or by the prefix of a resource ID,
+        e.g. "volume" or "vol-12345678".
+        @return `ResourceType` or `None` if unknown
+    """
+    if isinstance(resource, ResourceType):
+        return resource
+    if resource in RESOURCE_TYPES:
+        return RESOURCE_TYPES[resource]
+    prefix = resource.split('-', 1)[0] + '-'
+    return _TYPES_BY_PREFIX.get(prefix)
+
+
+def get_resource_type_by_method(method_name):
+    """ Get `ResourceType` by its describe method, e.g. "describe_volumes".
+        @return `ResourceType` or `None` if unknown
+    """
+    return _TYPES_BY_METHOD.get(method_name)
@@ -0,0 +1,101 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+"""
+Coalesce identical concurrent calls into one
+"""
+
+import threading
+
+
+class _Call(object):
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.frozen = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight(object):
+    """ Concurrent calls with the same key share one execution,
+        every caller gets the result (or the exception) of it.
+        It's thread-safe.
+    """
+
+    def __init__(self, freeze=None, thaw=None):
+        """
+        @param freeze: serialize a shared result once, e.g. to json.
+        @param thaw: create the result of each follower from the frozen
+                     one, so that callers may modify their own. The
+                     followers get the result of the leader if not set,
+                     or if it can not be frozen.
+        """
+        self.freeze = freeze
+        self.thaw = thaw
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.executions = 0
+        self.shared = 0
+
+    def do(self, key, func, *args, **kwargs):
+        """ Call `func` unless a call with the same key is in flight,
+            in which case wait for it and return its result.
+        """
+        with self.lock:
+            call = self.calls.get(key)
+            if call is None:
+                call = _Call()
+                self.calls[key] = call
+                self.executions += 1
+                leader = True
+            else:
+                call.waiters += 1
+                self.shared += 1
+                leader = False
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            if call.frozen is not None:
+                return self.thaw(call.frozen)
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+        except BaseException as e:
+            # e.g. KeyboardInterrupt, followers must not take it as a success
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            if call.error is None and call.waiters and self.freeze is not None:
+                try:
+                    call.frozen = self.freeze(call.result)
+                except Exception:
+                    # followers share the result
+                    pass
+            call.event.set()
+        return call.result
+
+    def stats(self):
+        with self.lock:
+            return {'executions': self.executions, 'shared': self.shared,
+                    'in_flight': len(self.calls)}
@@ -0,0 +1,349 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+"""
+Wait for many jobs or resources with batched describe calls
+"""
+
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, as_completed
+
+from .errors import WaitFailedError, WaitTimeoutError
+from .resources import MAX_LIST_SIZE, get_resource_type
+
+PENDING_JOB_STATUS = ('pending', 'working')
+
+# statuses a resource never leaves
+TERMINAL_STATUSES = ('ceased', 'terminated', 'deleted')
+
+
+class Waiter(object):
+    """ Wait for many things in one background thread, every round
+        describes all of them with batched calls. The polling interval
+        grows exponentially while nothing is done and is reset when
+        something is done or added, with random jitter so that many
+        waiters don't poll in lockstep.
+
+        Subclasses implement `_describe` and `_is_done`, and may
+        implement `_get_error` to fail before the deadline. The futures
+        of a round fail with the exception raised by these methods.
+    """
+
+    def __init__(self, conn, interval=1, max_interval=10, backoff=1.5,
+                 jitter=0.1, timeout=None, max_missing_rounds=3):
+        """
+        @param conn: the `APIConnection`.
+        @param interval: the initial seconds between two rounds.
+        @param max_interval: the max seconds between two rounds.
+        @param backoff: the factor applied to interval after a round
+                        where nothing was done.
+        @param jitter: the max fraction of interval added or removed randomly.
+        @param timeout: the default seconds to wait.
+        @param max_missing_rounds: fail with `WaitFailedError` when it's
+                                   not found in that many rounds in a row,
+                                   never if `None`.
+        """
+        self.conn = conn
+        self.interval = interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.timeout = timeout
+        self.max_missing_rounds = max_missing_rounds
+        # key => the number of rounds it was not found in a row
+        self.missing = {}
+        self.cond = threading.Condition()
+        # key => list of (future, deadline, timeout)
+        self.pending = OrderedDict()
+        self.thread = None
+        self.closed = False
+        self._next_interval = interval
+
+    def _add(self, key, timeout, callback):
+        future = Future()
+        if callback is not None:
+            future.add_done_callback(callback)
+        timeout = timeout if timeout is not None else self.timeout
+        deadline = time.time() + timeout if timeout is not None else None
+        with self.cond:
+            if self.closed:
+                raise RuntimeError('waiter is closed')
+            idle = not self.pending
+            self.pending.setdefault(key, []).append((future, deadline, timeout))
+            self._next_interval = self.interval
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run)
+                self.thread.daemon = True
+                self.thread.start()
+            if idle:
+                self.cond.notify()
+        return future
+
+    def as_completed(self, futures, timeout=None):
+        """ Iterate over the futures as they are done.
+        """
+        return as_completed(futures, timeout)
+
+    def close(self):
+        """ Stop polling, the futures still waiting are cancelled.
+        """
+        with self.cond:
+            self.closed = True
+            pending, self.pending = self.pending, OrderedDict()
+            self.cond.notify()
+        for waiters in pending.values():
+            for future, _, _ in waiters:
+                future.cancel()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.pending and not self.closed:
+                    self.cond.wait()
+                if self.closed:
+                    return
+                interval = self._next_interval
+                if self.jitter:
+                    interval *= 1 + random.uniform(-self.jitter, self.jitter)
+                self.cond.wait(interval)
+                if self.closed:
+                    return
+                keys = list(self.pending)
+
+            try:
+                done = self._poll(keys)
+            except Exception as e:
+                # the thread keeps polling the keys added later
+                done = self._fail(keys, e)
+            with self.cond:
+                if done:
+                    self._next_interval = self.interval
+                else:
+                    self._next_interval = min(self._next_interval * self.backoff,
+                                              self.max_interval)
+
+    def _describe(self, keys):
+        """ Describe the things waited for.
+        @return a dict of key => the described item, or `None` if it was
+                not found, the keys whose describe call failed are omitted.
+        """
+        raise NotImplementedError()
+
+    def _is_done(self, key, item):
+        raise NotImplementedError()
+
+    def _get_error(self, key, item):
+        """ @return the error failing the futures of key, or `None` to
+                    keep waiting.
+        """
+        return None
+
+    def _key_id(self, key):
+        return key
+
+    def _check(self, key, items):
+        # return (result, error) of a key, both `None` if not done
+        if key not in items:
+            return None, None
+        item = items[key]
+        if item is None:
+            rounds = self.missing.get(key, 0) + 1
+            self.missing[key] = rounds
+            if self.max_missing_rounds is not None and \
+                    rounds >= self.max_missing_rounds:
+                return None, WaitFailedError(self._key_id(key))
+            return None, None
+        self.missing.pop(key, None)
+        if self._is_done(key, item):
+            return item, None
+        return None, self._get_error(key, item)
+
+    def _fail(self, keys, error):
+        # fail the futures of keys whose round raised an unexpected error
+        with self.cond:
+            finished = [self.pending.pop(key, None) or [] for key in keys]
+            for key in keys:
+                self.missing.pop(key, None)
+        for waiters in finished:
+            for future, _, _ in waiters:
+                if future.set_running_or_notify_cancel():
+                    future.set_exception(error)
+        return len(keys)
+
+    def _poll(self, keys):
+        items = self._describe(keys)
+        done = 0
+        now = time.time()
+        for key in keys:
+            try:
+                result, error = self._check(key, items)
+            except Exception as e:
+                # e.g. a malformed item, only its futures fail
+                result, error = None, e
+            with self.cond:
+                waiters = self.pending.get(key)
+                if not waiters:
+                    self.missing.pop(key, None)
+                    continue
+                if result is not None or error is not None:
+                    del self.pending[key]
+                    self.missing.pop(key, None)
+                    finished = waiters
+                else:
+                    # every future has its own deadline
+                    finished = [w for w in waiters
+                                if w[1] is not None and now >= w[1]]
+                    if not finished:
+                        continue
+                    waiters = [w for w in waiters if w not in finished]
+                    if waiters:
+                        self.pending[key] = waiters
+                    else:
+                        del self.pending[key]
+                        self.missing.pop(key, None)
+
+            done += 1
+            for future, _, timeout in finished:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                if result is not None:
+                    future.set_result(result)
+                elif error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_exception(WaitTimeoutError(self._key_id(key), timeout))
+        return done
+
+    def _describe_batches(self, method, id_param, id_key, item_set_key, ids):
+        """ Describe the IDs with one call per 100 IDs, errors are ignored
+            and the IDs are described again in next round.
+        @return a dict of ID => the described item, or `None` if not found,
+                the IDs of failed calls are omitted.
+        """
+        items = {}
+        for i in range(0, len(ids), MAX_LIST_SIZE):
+            batch = ids[i:i + MAX_LIST_SIZE]
+            try:
+                ret = method(**{id_param: batch, 'limit': len(batch)})
+            except Exception:
+                continue
+            if ret and ret.get('ret_code') == 0:
+                items.update((resource_id, None) for resource_id in batch)
+                for item in ret.get(item_set_key) or []:
+                    items[item.get(id_key)] = item
+        return items
+
+
+class JobWaiter(Waiter):
+    """ Wait for jobs to finish, successfully or not.
+
+        >>> waiter = JobWaiter(conn)
+        >>> futures = [waiter.wait(ret['job_id']) for ret in rets]
+        >>> for future in waiter.as_completed(futures):
+        ...     print(future.result()['status'])
+    """
+
+    def wait(self, job_id, timeout=None, callback=None):
+        """ Wait for a job in background.
+        @param job_id: the ID of job.
+        @param timeout: seconds to wait, use the default of waiter if not specified.
+        @param callback: called with the future when the job is done.
+        @return a future of the job, whose result is the job described when its
+                status is not pending or working anymore, or `WaitTimeoutError`,
+                or `WaitFailedError` if it is not found.
+        """
+        return self._add(job_id, timeout, callback)
+
+    def wait_all(self, job_ids, timeout=None, callback=None):
+        return [self.wait(job_id, timeout, callback) for job_id in job_ids]
+
+    def _describe(self, keys):
+        return self._describe_batches(self.conn.describe_jobs, 'jobs',
+                                      'job_id', 'job_set', keys)
+
+    def _is_done(self, key, item):
+        return item['status'] not in PENDING_JOB_STATUS
+
+
+class ResourceWaiter(Waiter):
+    """ Wait for resources of any types to reach a status, the resources
+        of a type are described together in every round.
+
+        >>> waiter = ResourceWaiter(conn, timeout=300)
+        >>> futures = waiter.wait_all(ret['instances'], 'running')
+        >>> futures.append(waiter.wait(volume_id, 'available'))
+        >>> [f.result() for f in futures]
+    """
+
+    def wait(self, resource_id, status, timeout=None, callback=None,
+             resource_type=None):
+        """ Wait for a resource in background.
+        @param resource_id: the ID of resource, e.g. "i-12345678".
+        @param status: the status or the list of statuses to reach,
+                       e.g. "running".
+        @param timeout: seconds to wait, use the default of waiter if not specified.
+        @param callback: called with the future when the resource is done.
+        @param resource_type: the name of resource type, guessed from the
+                              prefix of ID if not specified.
+        @return a future of the resource, whose result is the resource described
+                when it reaches the status without transition, or `WaitTimeoutError`,
+                or `WaitFailedError` if it reaches a status of `TERMINAL_STATUSES`
+                or is not found.
+        """
+        rtype = get_resource_type(resource_type or resource_id)
+        if rtype is None:
+            raise ValueError('unknown resource type of [%s]' % resource_id)
+        if not isinstance(status, (list, tuple, set, frozenset)):
+            status = [status]
+        key = (resource_id, rtype.name, frozenset(status))
+        return self._add(key, timeout, callback)
+
+    def wait_all(self, resource_ids, status, timeout=None, callback=None,
+                 resource_type=None):
+        return [self.wait(resource_id, status, timeout, callback, resource_type)
+                for resource_id in resource_ids]
+
+    def _describe(self, keys):
+        ids_by_type = OrderedDict()
+        for resource_id, type_name, _ in keys:
+            ids_by_type.setdefault(type_name, OrderedDict())[resource_id] = None
+
+        items = {}
+        for type_name, ids in ids_by_type.items():
+            rtype = get_resource_type(type_name)
+            items[type_name] = self._describe_batches(
+                getattr(self.conn, rtype.describe_method), rtype.id_param,
+                rtype.id_key, rtype.item_set_key, list(ids))
+        return dict((key, items[key[1]][key[0]]) for key in keys
+                    if key[0] in items[key[1]])
+
+    def _is_done(self, key, item):
+        return item.get('status') in key[2] and not item.get('transition_status')
+
+    def _get_error(self, key, item):
+        # e.g. an instance terminated while waiting for it to be running,
+        # but not while waiting for it to be ceased
+        status = item.get('status')
+        if status in TERMINAL_STATUSES and key[2].isdisjoint(TERMINAL_STATUSES):
+            return WaitFailedError(key[0], status)
+        return None
+
+    def _key_id(self, key):
+        return key[0]
@@ -0,0 +1,218 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+"""
+Incremental decoding of the item set of a json response
+"""
+
+import codecs
+import json as jsmod
+
+WHITESPACE = ' \t\n\r'
+
+
+class ItemSetParser(object):
+    """ Parse a json object like `{"ret_code": 0, "instance_set": [...]}` fed
+        chunk by chunk, the items of set are returned as soon as they are
+        complete and only one item is decoded at a time.
+
+        >>> parser = ItemSetParser(fields=['instance_id'])
+        >>> parser.feed(b'{"ret_code":0,"instance_set":[{"instance_id":"i-1",')
+        []
+        >>> parser.feed(b'"status":"running"}]}')
+        [{'instance_id': 'i-1'}]
+        >>> parser.close()
+        {'ret_code': 0}
+    """
+
+    def __init__(self, item_set_key=None, fields=None):
+        """
+        @param item_set_key: the key of the array to stream, any key ending
+                             with "_set" if not specified.
+        @param fields: the keys kept in items, all of them if not specified.
+        """
+        self.item_set_key = item_set_key
+        self.fields = fields
+        self.head = {}
+        self.buf = ''
+        self.pos = 0
+        self.state = 'start'
+        self.key = None
+        self.decoder = jsmod.JSONDecoder()
+        self.utf8 = codecs.getincrementaldecoder('utf-8')()
+
+    def feed(self, data):
+        """ Feed a chunk of the json text.
+        @return the list of items completed by this chunk.
+        """
+        if isinstance(data, bytes) and not isinstance(data, str):
+            data = self.utf8.decode(data)
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        items = []
+        while self._step(items):
+            pass
+        return items
+
+    def close(self):
+        """ Check the text is complete.
+        @return the other keys of object.
+        """
+        if self.state != 'end' or self.buf[self.pos:].strip(WHITESPACE):
+            raise ValueError('incomplete or invalid json in state [%s]' % self.state)
+        return self.head
+
+    def _skip(self, chars=WHITESPACE):
+        buf, pos = self.buf, self.pos
+        while pos < len(buf) and buf[pos] in chars:
+            pos += 1
+        self.pos = pos
+        return buf[pos] if pos < len(buf) else None
+
+    def _decode(self):
+        """ Decode the value at current position.
+        @return (True, value), or (False, None) if more data are needed.
+        """
+        try:
+            value, end = self.decoder.raw_decode(self.buf, self.pos)
+        except ValueError:
+            return False, None
+        if end == len(self.buf):
+            # a number like "12" might continue in next chunk, a value
+            # inside the object is always followed by "," "]" or "}"
+            return False, None
+        self.pos = end
+        return True, value
+
+    def _is_item_set(self, key):
+        if self.item_set_key is not None:
+            return key == self.item_set_key
+        return key.endswith('_set')
+
+    def _project(self, item):
+        if self.fields is None or not isinstance(item, dict):
+            return item
+        return dict((k, item[k]) for k in self.fields if k in item)
+
+    def _step(self, items):
+        state = self.state
+        if state == 'start':
+            c = self._skip()
+            if c is None:
+                return False
+            if c != '{':
+                raise ValueError('json object expected at %d' % self.pos)
+            self.pos += 1
+            self.state = 'key'
+        elif state in ('key', 'next_key'):
+            c = self._skip()
+            if c is None:
+                return False
+            if c == '}':
+                self.pos += 1
+                self.state = 'end'
+                return False
+            if state == 'next_key':
+                if c != ',':
+                    raise ValueError('"," expected at %d' % self.pos)
+                self.pos += 1
+                self.state = 'key'
+                return True
+            start = self.pos
+            ok, key = self._decode()
+            if not ok:
+                return False
+            c = self._skip()
+            if c is None:
+                # decode the key again with ":"
+                self.pos = start
+                return False
+            if c != ':':
+                raise ValueError('":" expected at %d' % self.pos)
+            self.pos += 1
+            self.key = key
+            self.state = 'value'
+        elif state == 'value':
+            c = self._skip()
+            if c is None:
+                return False
+            if c == '[' and self._is_item_set(self.key):
+                self.pos += 1
+                self.head[self.key] = None
+                self.state = 'item'
+                return True
+            ok, value = self._decode()
+            if not ok:
+                return False
+            self.head[self.key] = value
+            self.state = 'next_key'
+        elif state in ('item', 'next_item'):
+            c = self._skip()
+            if c is None:
+                return False
+            if c == ']':
+                self.pos += 1
+                del self.head[self.key]
+                self.state = 'next_key'
+                return True
+            if state == 'next_item':
+                if c != ',':
+                    raise ValueError('"," expected at %d' % self.pos)
+                self.pos += 1
+                self.state = 'item'
+                return True
+            ok, item = self._decode()
+            if not ok:
+                return False
+            items.append(self._project(item))
+            self.state = 'next_item'
+        else:
+            return False
+        return True
+
+
+class ResponseStream(object):
+    """ Iterate over the item set of a http response while it is received,
+        the other keys of response are in `head` after iteration.
+    """
+
+    def __init__(self, response, item_set_key=None, fields=None,
+                 chunk_size=65536, check=None):
+        """
+        @param response: the http response.
+        @param item_set_key: the key of the array to stream, any key ending
+                             with "_set" if not specified.
+        @param fields: the keys kept in items, all of them if not specified.
+        @param chunk_size: the size of data read at a time.
+        @param check: called with `head` at the end of response.
+        """
+        self.response = response
+        self.parser = ItemSetParser(item_set_key, fields)
+        self.chunk_size = chunk_size
+        self.check = check
+        self.head = None
+
+    def __iter__(self):
+        while True:
+            data = self.response.read(self.chunk_size)
+            if not data:
+                break
+            for item in self.parser.feed(data):
+                yield item
+        self.head = self.parser.close()
+        if self.check is not None:
+            self.check(self.head)
@@ -15,35 +15,167 @@
 # =========================================================================
 
 
+"""
+Json codecs, the fastest installed one is used by `json_load`, with the
+standard json module as fallback. `json_dump` uses the standard json
+module unless another codec is set, since the output of others differs,
+e.g. non-ASCII characters are not escaped and NaN becomes null.
+
+    >>> set_codec('orjson')       # load and dump with orjson
+    >>> set_codec('json')         # use the standard json module only
+    >>> json_load('{"a":1}', raise_error=True)
+"""
+
 import json as jsmod
+from collections import OrderedDict
+
+
+class JsonCodec(object):
+    """ A json backend
+    """
+
+    def __init__(self, name, loads, dumps):
+        """
+        @param name: the name of codec.
+        @param loads: load an object from json str or utf-8 bytes.
+        @param dumps: dumps(obj, indent) to compact json str with sorted keys.
+        """
+        self.name = name
+        self.loads = loads
+        self.dumps = dumps
+
+    def __repr__(self):
+        return '<JsonCodec: %s>' % self.name
+
+
+def _stdlib_loads(json):
+    if isinstance(json, bytes) and not isinstance(json, str):
+        json = json.decode('utf-8')
+    return jsmod.loads(json)
+
+
+def _stdlib_dumps(obj, indent=None):
+    return jsmod.dumps(obj, separators=(',', ':'), indent=indent,
+                       sort_keys=True)
+
+
+def _orjson_codec():
+    import orjson
+    options = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj, indent=None):
+        if indent is None:
+            return orjson.dumps(obj, option=options).decode('utf-8')
+        if indent == 2:
+            return orjson.dumps(obj, option=options | orjson.OPT_INDENT_2).decode('utf-8')
+        raise ValueError('indent %s is not supported by orjson' % indent)
+
+    return JsonCodec('orjson', orjson.loads, dumps)
+
+
+def _ujson_codec():
+    import ujson
+
+    def dumps(obj, indent=None):
+        return ujson.dumps(obj, sort_keys=True, indent=indent or 0,
+                           escape_forward_slashes=False)
+
+    return JsonCodec('ujson', ujson.loads, dumps)
+
+
+STDLIB_CODEC = JsonCodec('json', _stdlib_loads, _stdlib_dumps)
+
+# name => codec, in order of preference
+_codecs = OrderedDict()
+# codecs used by `json_load` and `json_dump`
+_codec = STDLIB_CODEC
+_dump_codec = STDLIB_CODEC
+
+
+def register_codec(codec, preferred=False):
+    """ Register a json codec, it is used to load and dump if it is preferred.
+    """
+    global _codec, _dump_codec
+    _codecs[codec.name] = codec
+    if preferred:
+        _codec = _dump_codec = codec
+
+
+def set_codec(name, dump=True):
+    """ Use the registered codec of that name, e.g. "json".
+    @param dump: use it to dump too, otherwise only to load.
+    """
+    global _codec, _dump_codec
+    if name not in _codecs:
+        raise ValueError('json codec [%s] is not available, choose from %s'
+                         % (name, list(_codecs)))
+    _codec = _codecs[name]
+    if dump:
+        _dump_codec = _codec
+
+
+def get_codec(dump=False):
+    """ Get the codec used to load, or to dump.
+    """
+    return _dump_codec if dump else _codec
+
+
+def available_codecs():
+    return list(_codecs)
+
+
+for _factory in (_orjson_codec, _ujson_codec):
+    try:
+        register_codec(_factory())
+    except ImportError:
+        pass
+register_codec(STDLIB_CODEC)
+set_codec(available_codecs()[0], dump=False)
 
 
-def json_dump(obj, indent=None):
+def json_dump(obj, indent=None, raise_error=False):
     """ Dump an object to json string, only basic types are supported.
+        @param raise_error: raise `TypeError` or `ValueError` if failed.
         @return json string or `None` if failed
 
         >>> json_dump({'int': 1, 'none': None, 'str': 'string'})
         '{"int":1,"none":null,"str":"string"}'
     """
+    codec = _dump_codec
     try:
-        jstr = jsmod.dumps(obj, separators=(',', ':'),
-                           indent=indent, sort_keys=True)
-    except:
-        jstr = None
-    return jstr
+        return codec.dumps(obj, indent)
+    except Exception:
+        # e.g. integer over 64 bits for orjson
+        if codec is not STDLIB_CODEC:
+            try:
+                return STDLIB_CODEC.dumps(obj, indent)
+            except Exception:
+                pass
+        if raise_error:
+            raise
+    return None
 
 
-def json_load(json):
-    """ Load from json string and create a new python object
+def json_load(json, raise_error=False):
+    """ Load from json string or utf-8 bytes and create a new python object
+        @param raise_error: raise `ValueError` if failed.
         @return object or `None` if failed
 
         >>> json_load('{"int":1,"none":null,"str":"string"}')
         {u'int': 1, u'none': None, u'str': u'string'}
     """
+    codec = _codec
     try:
-        obj = jsmod.loads(json)
-    except:
-        obj = None
-    return obj
+        return codec.loads(json)
+    except Exception:
+        # e.g. NaN for orjson
+        if codec is not STDLIB_CODEC:
+            try:
+                return STDLIB_CODEC.loads(json)
+            except Exception:
+                pass
+        if raise_error:
+            raise
+    return None
 
 __all__ = [json_dump, json_load]
@@ -125,7 +125,8 @@ def base64_url_encode(inp):
 
 
 def wait_job(conn, job_id, timeout=60):
-    """ waiting for job complete (success or fail) until timeout
+    """ waiting for job complete (success or fail) until timeout,
+        use `petaexpress.iaas.waiter.JobWaiter` to wait for many jobs.
     """
     def describe_job(job_id):
         ret = conn.describe_jobs([job_id])
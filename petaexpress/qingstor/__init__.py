@@ -2,10 +2,30 @@
 Interface to QingStor (PetaExpress Object Storage).
 """
 
-from petaexpress.qingstor.connection import QSConnection
+import sys
+
+# submodules imported on first access, e.g. `petaexpress.qingstor.bucket`
+_LAZY_SUBMODULES = ('acl', 'aio', 'bucket', 'connection', 'exception', 'key',
+                    'multipart', 'util')
+
+if sys.version_info < (3, 7):
+    from petaexpress.qingstor.connection import QSConnection
+else:
+    def __getattr__(name):
+        """ Import `QSConnection` and the submodules when first used, so
+            that importing this package stays cheap.
+        """
+        if name == 'QSConnection':
+            from petaexpress.qingstor.connection import QSConnection
+            return QSConnection
+        if name in _LAZY_SUBMODULES:
+            import importlib
+            return importlib.import_module('%s.%s' % (__name__, name))
+        raise AttributeError('module %r has no attribute %r' % (__name__, name))
 
 
 def connect(host, access_key_id=None, secret_access_key=None):
     """ Connect to qingstor by access key.
     """
+    from petaexpress.qingstor.connection import QSConnection
     return QSConnection(access_key_id, secret_access_key, host)
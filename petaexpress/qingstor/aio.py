@@ -0,0 +1,369 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+"""
+Asyncio interface to QingStor, requires Python 3.6 or higher.
+
+    >>> conn = AsyncQSConnection('access key id', 'secret access key')
+    >>> bucket = await conn.get_bucket('mybucket')
+    >>> keys = await bucket.list(prefix='logs/')
+    >>> data = await (await bucket.get_key('logs/1.log')).read()
+"""
+
+import asyncio
+import hashlib
+import json
+import random
+from base64 import b64encode
+from datetime import datetime
+
+from petaexpress.conn.aio import AsyncHttpConnection
+
+from .connection import QSConnection, VirtualHostStyleFormat
+from .exception import get_response_error
+from .util import load_data
+
+
+async def read_async_response(response):
+    # read the whole body, a failed read gives the connection back
+    try:
+        return await response.read()
+    except BaseException:
+        response.close()
+        raise
+
+
+async def get_async_response_error(response):
+    body = await read_async_response(response)
+    return get_response_error(response, body)
+
+
+async def _raise_head_error(response, not_exists_code, not_exists_message):
+    err = await get_async_response_error(response)
+    if response.status == 401:
+        err.code = "invalid_access_key_id"
+        err.message = "Request not authenticated, Access Key ID is either " \
+            "missing or invalid."
+    elif response.status == 403:
+        err.code = "permission_denied"
+        err.message = "You don't have enough permission to accomplish " \
+            "this request."
+    elif response.status == 404:
+        err.code = not_exists_code
+        err.message = not_exists_message
+    raise err
+
+
+class AsyncKey(object):
+
+    DefaultContentType = "application/oct-stream"
+    ChunkSize = 64 * 1024
+
+    def __init__(self, bucket=None, name=None):
+
+        self.bucket = bucket
+        self.name = name
+        self.resp = None
+        self.content_type = self.DefaultContentType
+
+    def __repr__(self):
+        return '<AsyncKey: %s, %s>' % (self.name, self.bucket.name)
+
+    async def close(self):
+        if self.resp:
+            await self.resp.read()
+        self.resp = None
+
+    async def open_read(self, headers=None):
+        """ Open this key for reading.
+        """
+        if self.resp is None:
+            self.resp = await self.bucket.connection.make_request(
+                "GET", self.bucket.name, self.name, headers=headers)
+            if self.resp.status != 200 and self.resp.status != 206:
+                err = await get_async_response_error(self.resp)
+                self.resp = None
+                raise err
+
+    async def read(self, size=0):
+        """ Read the whole object, or its first `size` bytes.
+        """
+        if size == 0:
+            await self.open_read()
+        else:
+            headers = {"Range": "bytes=0-%d" % size}
+            await self.open_read(headers)
+        resp, self.resp = self.resp, None
+        return await read_async_response(resp)
+
+    async def stream(self, chunk_size=None):
+        """ Iterate over the object content without buffering it.
+
+            >>> async for chunk in key.stream():
+            ...     f.write(chunk)
+        """
+        await self.open_read()
+        try:
+            while True:
+                chunk = await self.resp.read(chunk_size or self.ChunkSize)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            if not self.resp.isclosed():
+                self.resp.close()
+            self.resp = None
+
+    async def send_file(self, fp, content_type=None):
+        """ Upload a file to a key into the bucket.
+        The file content is streamed to the server block by block.
+
+        Keyword arguments:
+        content_type - The content type of the object
+        """
+        headers = {
+            "Content-Type": content_type or self.content_type
+        }
+        response = await self.bucket.connection.make_request(
+            "PUT", self.bucket.name, self.name, data=fp, headers=headers)
+        if response.status == 201:
+            await response.read()
+            await self.close()
+            return True
+        else:
+            err = await get_async_response_error(response)
+            raise err
+
+    async def exists(self):
+        """ Check whether the object exists or not.
+        """
+        response = await self.bucket.connection.make_request(
+            "HEAD", self.bucket.name, self.name)
+        if response.status == 200:
+            return True
+        elif response.status == 404:
+            return False
+        else:
+            err = await get_async_response_error(response)
+            raise err
+
+
+class AsyncBucket(object):
+
+    def __init__(self, connection=None, name=None):
+        self.connection = connection
+        self.name = name
+
+    def __repr__(self):
+        return '<AsyncBucket: %s>' % self.name
+
+    async def get_key(self, key_name, validate=True):
+        """ Retrieves an object by name.
+        Returns: An instance of a AsyncKey object
+
+        Keyword arguments:
+        key_name - The name of the bucket
+        validate - If True, the function will try to verify the object exists
+            on the service-side (Default: True)
+        """
+        if not validate:
+            return AsyncKey(self, key_name)
+
+        response = await self.connection.make_request("HEAD", self.name, key_name)
+        if response.status == 200:
+            return AsyncKey(self, key_name)
+        await _raise_head_error(response, "object_not_exists",
+                                "The object you are accessing doesn't exist.")
+
+    def new_key(self, key_name):
+        """ Create a new object within the bucket.
+        Returns: An instance of a AsyncKey object
+
+        Keyword arguments:
+        key_name - The name of the object
+        """
+        return AsyncKey(self, key_name)
+
+    async def delete_key(self, key_name):
+        """ Delete the particular object by object name.
+
+        Keyword arguments:
+        key_name - The name of the object
+        """
+        response = await self.connection.make_request("DELETE", self.name, key_name)
+        if response.status == 204:
+            await response.read()
+            return True
+        else:
+            err = await get_async_response_error(response)
+            raise err
+
+    async def delete_keys(self, keys, quiet=False):
+        """ Delete a list of object by keys
+
+        Keyword arguments:
+        keys - A list of keys to delete
+        quiet - Whether or not to return the list of objects successfully
+            deleted, deleted objects list won't be returned when True.
+        """
+        req_data = json.dumps({
+            "objects": [{"key": k} for k in keys],
+            "quiet": quiet
+        })
+        content_md5 = b64encode(hashlib.md5(req_data.encode()).digest()).decode()
+        resp = await self.connection.make_request(
+            "POST",
+            self.name,
+            params="delete",
+            headers={"Content-MD5": content_md5},
+            data=req_data
+        )
+        if resp.status == 200:
+            return load_data(await read_async_response(resp))
+        else:
+            err = await get_async_response_error(resp)
+            raise err
+
+    async def list(self, prefix=None, delimiter=None, marker=None, limit=None):
+        """ List objects of the bucket.
+
+        Keyword arguments:
+        prefix - Limits the response to keys that begin with the specified prefix
+        delimiter - A character you use to group keys
+        marker - Specifies the key to start with when listing objects
+        limit - The count of objects that the request returns
+        """
+        params = {}
+        if prefix:
+            params["prefix"] = prefix
+        if delimiter:
+            params["delimiter"] = delimiter
+        if marker:
+            params["marker"] = marker
+        if limit:
+            params["limit"] = str(limit)
+        response = await self.connection.make_request(
+            "GET", self.name, params=params)
+        if response.status == 200:
+            resp = load_data(await read_async_response(response))
+            result_set = []
+            for k in resp["keys"]:
+                key = AsyncKey(self, k["key"])
+                key.content_type = k["mime_type"]
+                result_set.append(key)
+            return result_set
+        else:
+            err = await get_async_response_error(response)
+            raise err
+
+
+class AsyncQSConnection(AsyncHttpConnection, QSConnection):
+    """ Public connection to qingstor over asyncio
+    """
+
+    def __init__(self, qy_access_key_id=None, qy_secret_access_key=None,
+                 host="qingstor.com", port=443, protocol="https",
+                 style_format_class=VirtualHostStyleFormat,
+                 retry_time=3, timeout=900, debug=False,
+                 pool=None, max_connections=100):
+        """
+        @param qy_access_key_id - the access key id
+        @param qy_secret_access_key - the secret access key
+        @param host - the host to make the connection to
+        @param port - the port to use when connect to host
+        @param protocol - the protocol to access to server, "http" or "https"
+        @param retry_time - the retry_time when message send fail
+        @param timeout - blocking operations will timeout after that many seconds
+        @param debug - debug mode
+        @param pool - the `AsyncConnectionPool`
+        @param max_connections - max number of connections opened per endpoint
+        """
+        QSConnection.__init__(self, qy_access_key_id, qy_secret_access_key,
+                              host, port, protocol, style_format_class,
+                              retry_time, timeout, debug)
+        self._init_async_pool(pool, max_connections)
+
+    async def get_bucket(self, bucket, validate=True):
+        """ Retrieve a bucket by name.
+
+        Keyword arguments:
+        bucket - The name of the bucket
+        validate - If ``True``, the function will try to verify the bucket exists
+            on the service-side. (Default: ``True``)
+        """
+        if not validate:
+            return AsyncBucket(self, bucket)
+
+        response = await self.make_request("HEAD", bucket)
+        if response.status == 200:
+            return AsyncBucket(self, bucket)
+        await _raise_head_error(response, "bucket_not_exists",
+                                "The bucket you are accessing doesn't exist.")
+
+    async def make_request(self, method, bucket="", key="", headers=None,
+                           data="", params=None, num_retries=3):
+        """ Make request
+        """
+        host = self.style_format.build_host(self.host, bucket)
+        path = self.style_format.build_path_base(bucket, key)
+        auth_path = self.style_format.build_auth_path(bucket, key)
+
+        # Build request headers
+        if not headers:
+            headers = {}
+        if "Host" not in headers:
+            headers["Host"] = host
+        if "Date" not in headers:
+            headers["Date"] = datetime.utcnow().strftime("%a, %d %b %Y %X GMT")
+        if "Content-Length" not in headers:
+            length = self._get_body_length(data) if data else 0
+            if length is not None:
+                headers["Content-Length"] = str(length)
+        if data and "Content-MD5" not in headers:
+            # reading a whole file would block the event loop
+            headers["Content-MD5"] = await asyncio.get_event_loop().run_in_executor(
+                None, self._get_body_checksum, data)
+        if "User-Agent" not in headers:
+            headers["User-Agent"] = self.user_agent
+        if key and "Accept-Encoding" not in headers:
+            # only metadata responses are compressed, object data is
+            # returned as stored
+            headers["Accept-Encoding"] = "identity"
+
+        retry_time = 0
+        while retry_time < self.retry_time:
+            next_sleep = random.random() * (2 ** retry_time)
+            if retry_time and hasattr(data, "read") and hasattr(data, "seek"):
+                # the previous attempt may have streamed part of the file
+                data.seek(0)
+            try:
+                response = await self.send(method, path, params, headers, host,
+                                           auth_path, data)
+                if response.status == 307:
+                    await response.read()
+                    location = response.getheader("location")
+                    host, path, params = self._urlparse(location)
+                    headers["Host"] = host
+                elif response.status in (500, 502, 503):
+                    await response.read()
+                    await asyncio.sleep(next_sleep)
+                else:
+                    return response
+            except Exception:
+                if retry_time >= self.retry_time - 1:
+                    raise
+            retry_time += 1
@@ -247,6 +247,10 @@ class QSConnection(HttpConnection):
             headers["Content-MD5"] = self._get_body_checksum(data)
         if "User-Agent" not in headers:
             headers["User-Agent"] = self.user_agent
+        if key and "Accept-Encoding" not in headers:
+            # only metadata responses are compressed, object data is
+            # returned as stored
+            headers["Accept-Encoding"] = "identity"
 
         retry_time = 0
         while retry_time < self.retry_time:
@@ -38,7 +38,7 @@ class QSResponseError(Exception):
 
 
 def get_response_error(response, body=None):
-    if not body:
+    if body is None:
         body = response.read()
     args = {
         "status": response.status,
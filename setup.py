@@ -24,7 +24,7 @@ setup(
     packages=['petaexpress', 'petaexpress.conn', 'petaexpress.iaas', 'petaexpress.iaas.actions',
               'petaexpress.misc', 'petaexpress.qingstor'],
     package_dir={'petaexpress-sdk': 'petaexpress'},
-    namespace_packages=['petaexpress'],
     include_package_data=True,
-    install_requires=['future']
+    install_requires=['futures; python_version < "3.2"'],
+    extras_require={'fast': ['orjson'], 'analytics': ['numpy']},
 )
@@ -1,4 +1,5 @@
 import mock
+import threading
 import unittest
 try:
     import httplib
@@ -62,3 +63,61 @@ class MockTestCase(unittest.TestCase):
     def mock_http_response(self, status_code, header=None, body=None):
         http_response = self.create_http_response(status_code, header, body)
         self.https_connection.getresponse.return_value = http_response
+
+
+def _refs(values, key):
+    return [v if isinstance(v, dict) else {key: v} for v in values]
+
+
+def make_instance(i, status='running', vxnets=('vxnet-0',), tags=(),
+                  sg='sg-1', image='img-1', **fields):
+    """ Build the item of an instance as returned by describe_instances.
+        vxnets, tags and image are IDs or items, image and sg are left
+        out if `None`, fields are added to the item.
+    """
+    item = {
+        'instance_id': 'i-%04d' % i,
+        'status': status,
+        'status_time': '2026-01-01T00:00:00Z',
+        'owner': 'usr-1',
+        'vxnets': _refs(vxnets, 'vxnet_id'),
+        'tags': _refs(tags, 'tag_id'),
+    }
+    if image is not None:
+        item['image'] = _refs([image], 'image_id')[0]
+    if sg is not None:
+        item['security_group'] = {'security_group_id': sg}
+    item.update(fields)
+    return item
+
+
+class FakeDescribe(object):
+    """ Answer describe_instances from a list of instances, to replace
+        `send_request` of `APIConnection`. The request bodies are kept.
+    """
+
+    def __init__(self, instances, verbose_keys=()):
+        """
+        @param instances: the items of instances.
+        @param verbose_keys: the keys of items returned only with verbose.
+        """
+        self.instances = instances
+        self.verbose_keys = verbose_keys
+        self.calls = []
+        self.offsets = []
+        self.threads = set()
+
+    def __call__(self, action, body):
+        self.calls.append(body)
+        self.offsets.append(body.get('offset', 0))
+        self.threads.add(threading.current_thread().name)
+        instances = self.instances
+        if 'instances' in body:
+            instances = [i for i in instances if i['instance_id'] in body['instances']]
+        offset, limit = body.get('offset', 0), body['limit']
+        items = instances[offset:offset + limit]
+        if self.verbose_keys and not body.get('verbose'):
+            items = [dict((k, v) for k, v in i.items() if k not in self.verbose_keys)
+                     for i in items]
+        return {'action': 'DescribeInstancesResponse', 'ret_code': 0,
+                'instance_set': items, 'total_count': len(instances)}
@@ -0,0 +1,239 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+import asyncio
+import io
+import json
+import unittest
+
+from petaexpress.qingstor.aio import AsyncQSConnection
+from petaexpress.qingstor.connection import VirtualHostStyleFormat
+from petaexpress.qingstor.exception import QSResponseError
+
+
+class LocalStyleFormat(VirtualHostStyleFormat):
+    """ Send every bucket to the local server """
+
+    def build_host(self, server, bucket=""):
+        return server
+
+    def build_path_base(self, bucket="", key=""):
+        return "/%s/%s" % (bucket, key) if bucket else "/"
+
+
+class FakeQingStor(object):
+
+    def __init__(self):
+        self.objects = {}
+        self.connections = 0
+        self.requests = []
+        self.server = None
+        self.port = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._serve, '127.0.0.1', 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    def handle(self, method, path, body):
+        path, _, query = path.partition('?')
+        bucket, _, key = path.lstrip('/').partition('/')
+        if method == 'PUT':
+            self.objects[key] = body
+            return 201, b''
+        if method == 'HEAD':
+            return (200 if not key or key in self.objects else 404), b''
+        if method == 'GET' and key:
+            if key not in self.objects:
+                return 404, json.dumps({'code': 'object_not_exists',
+                                        'message': 'not found', 'url': ''}).encode()
+            return 200, self.objects[key]
+        if method == 'GET':
+            keys = [{'key': k, 'mime_type': 'text/plain'} for k in sorted(self.objects)]
+            return 200, json.dumps({'keys': keys}).encode()
+        if method == 'POST' and query == 'delete':
+            deleted = [o['key'] for o in json.loads(body.decode())['objects']]
+            for key in deleted:
+                self.objects.pop(key, None)
+            return 200, json.dumps({'deleted': [{'key': k} for k in deleted],
+                                    'errors': []}).encode()
+        return 400, b''
+
+    async def _serve(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                method, path, _ = line.decode().split(' ', 2)
+                length = 0
+                chunked = False
+                while True:
+                    header = (await reader.readline()).decode().strip()
+                    if not header:
+                        break
+                    name, _, value = header.partition(':')
+                    if name.lower() == 'content-length':
+                        length = int(value)
+                    if name.lower() == 'transfer-encoding':
+                        chunked = 'chunked' in value
+                if chunked:
+                    body = b''
+                    while True:
+                        size = int(await reader.readline(), 16)
+                        body += (await reader.readexactly(size + 2))[:-2]
+                        if not size:
+                            break
+                else:
+                    body = await reader.readexactly(length) if length else b''
+                self.requests.append((method, chunked, length))
+                status, data = self.handle(method, path, body)
+                head = 'HTTP/1.1 %d OK\r\n' % status
+                if method == 'HEAD' or status == 201:
+                    head += 'Content-Length: 0\r\n\r\n'
+                    data = b''
+                elif path.endswith('chunked'):
+                    head += 'Transfer-Encoding: chunked\r\n\r\n'
+                    data = b''.join([b'%x\r\n%s\r\n' % (len(data[i:i + 3]), data[i:i + 3])
+                                     for i in range(0, len(data), 3)]) + b'0\r\n\r\n'
+                elif path.endswith('truncated'):
+                    # body cut short by the server
+                    head += 'Content-Length: %d\r\n\r\n' % (len(data) + 10)
+                    writer.write(head.encode() + data)
+                    await writer.drain()
+                    break
+                else:
+                    head += 'Content-Length: %d\r\n\r\n' % len(data)
+                writer.write(head.encode() + data)
+                await writer.drain()
+        finally:
+            writer.close()
+
+
+class AsyncQSConnectionTestCase(unittest.TestCase):
+
+    def run_with_server(self, test):
+        async def main():
+            server = FakeQingStor()
+            await server.start()
+            conn = AsyncQSConnection('access_key_id', 'secret_access_key',
+                                     host='127.0.0.1', port=server.port,
+                                     protocol='http', max_connections=8,
+                                     style_format_class=LocalStyleFormat)
+            try:
+                await test(conn, server)
+            finally:
+                await conn.close()
+                await server.stop()
+        asyncio.run(main())
+
+    def test_send_and_read(self):
+        async def test(conn, server):
+            bucket = await conn.get_bucket('mybucket')
+            key = bucket.new_key('hello.txt')
+            self.assertTrue(await key.send_file(io.BytesIO(b'hello world')))
+            self.assertEqual(server.objects['hello.txt'], b'hello world')
+            key = await bucket.get_key('hello.txt')
+            self.assertEqual(await key.read(), b'hello world')
+
+        self.run_with_server(test)
+
+    def test_send_unknown_length(self):
+        class Pipe(object):
+            # a stream which can't tell its length
+
+            def __init__(self, data):
+                self.data = io.BytesIO(data)
+
+            def read(self, size=-1):
+                return self.data.read(size)
+
+        async def test(conn, server):
+            data = b'0123456789' * 10000
+            conn.BLOCK_SIZE = 30000
+            response = await conn.make_request(
+                'PUT', 'mybucket', 'pipe.txt', data=Pipe(data),
+                headers={'Content-MD5': 'checksum'})
+            self.assertEqual(response.status, 201)
+            await response.read()
+            self.assertEqual(server.requests[-1], ('PUT', True, 0))
+            self.assertEqual(server.objects['pipe.txt'], data)
+            # the connection is still usable
+            keys = await conn.get_bucket('mybucket', validate=False)
+            self.assertEqual(len(await keys.list()), 1)
+            self.assertEqual(server.connections, 1)
+
+        self.run_with_server(test)
+
+    def test_stream_chunked(self):
+        async def test(conn, server):
+            server.objects['big.chunked'] = b'0123456789' * 10
+            bucket = await conn.get_bucket('mybucket')
+            key = bucket.new_key('big.chunked')
+            chunks = [chunk async for chunk in key.stream(chunk_size=7)]
+            self.assertTrue(all(len(chunk) <= 7 for chunk in chunks))
+            self.assertEqual(b''.join(chunks), b'0123456789' * 10)
+            # the connection has been given back to the pool
+            self.assertEqual(conn._conn.size(), 1)
+
+        self.run_with_server(test)
+
+    def test_failed_read_releases_connection(self):
+        async def test(conn, server):
+            server.objects['big.truncated'] = b'0123456789'
+            bucket = await conn.get_bucket('mybucket', validate=False)
+            key = bucket.new_key('big.truncated')
+            for _ in range(10):
+                with self.assertRaises(asyncio.IncompleteReadError):
+                    await key.read()
+                self.assertIsNone(key.resp)
+            # every slot of the pool has been given back
+            keys = await asyncio.wait_for(bucket.list(), 5)
+            self.assertEqual(len(keys), 1)
+
+        self.run_with_server(test)
+
+    def test_get_key_not_exists(self):
+        async def test(conn, server):
+            bucket = await conn.get_bucket('mybucket')
+            with self.assertRaises(QSResponseError) as ctx:
+                await bucket.get_key('missing')
+            self.assertEqual(ctx.exception.code, 'object_not_exists')
+
+        self.run_with_server(test)
+
+    def test_list_and_delete_keys(self):
+        async def test(conn, server):
+            bucket = await conn.get_bucket('mybucket', validate=False)
+            await asyncio.gather(*[bucket.new_key('k%d' % i).send_file(io.BytesIO(b'x'))
+                                   for i in range(20)])
+            keys = await bucket.list()
+            self.assertEqual(len(keys), 20)
+            self.assertLessEqual(server.connections, 8)
+            ret = await bucket.delete_keys(['k%d' % i for i in range(10)])
+            self.assertEqual(len(ret['deleted']), 10)
+            self.assertEqual(len(await bucket.list()), 10)
+
+        self.run_with_server(test)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -51,6 +51,8 @@ class TestQingStorConnection(MockTestCase):
         self.mock_http_response(status_code=200, body=json.dumps(body))
         buckets = self.conn.get_all_buckets()
         self.assertDictEqual(buckets, body)
+        headers = self.https_connection.request.call_args[0][3]
+        self.assertEqual(headers["Accept-Encoding"], "gzip, deflate")
 
 if __name__ == "__main__":
     unittest.main()
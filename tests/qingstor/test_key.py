@@ -26,6 +26,8 @@ class TestQingStorKey(MockTestCase):
         self.mock_http_response(status_code=200, body="hello world")
         data = self.key.read()
         self.assertEqual(data, "hello world")
+        headers = self.https_connection.request.call_args[0][3]
+        self.assertEqual(headers["Accept-Encoding"], "identity")
 
     def test_key_send_file(self):
         with open(".test_key_send_file", "w+") as f:
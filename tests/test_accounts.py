@@ -0,0 +1,172 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+import json
+import threading
+import unittest
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlparse, parse_qs
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlparse, parse_qs
+
+from petaexpress.conn.auth import SignerCache
+from petaexpress.iaas.accounts import AccountManager
+from petaexpress.iaas.cache import ResponseCache
+from petaexpress.iaas.errors import APIError
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        params = dict((k, v[0]) for k, v in parse_qs(urlparse(self.path).query).items())
+        self.server.sockets.add(self.client_address)
+        key_id = params['access_key_id']
+        if key_id == 'denied':
+            resp = {'ret_code': 1400, 'message': 'denied'}
+        else:
+            resp = {'ret_code': 0, 'total_count': 2, 'volume_set': [
+                {'volume_id': 'vol-%s-%s' % (key_id, i)} for i in range(2)]}
+        body = json.dumps(resp).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class AccountManagerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = Server(('127.0.0.1', 0), Handler)
+        self.server.sockets = set()
+        thread = threading.Thread(target=self.server.serve_forever, args=(0.05,))
+        thread.daemon = True
+        thread.start()
+        self.manager = AccountManager('zone', max_workers=4, host='127.0.0.1',
+                                      port=self.server.server_address[1],
+                                      protocol='http', retry_time=1)
+        for i in range(40):
+            self.manager.add_account('acc-%02d' % i, 'key-%02d' % i, 'secret')
+
+    def tearDown(self):
+        self.manager.shutdown()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_accounts(self):
+        manager = self.manager
+        self.assertEqual(len(manager), 40)
+        self.assertIn('acc-01', manager)
+        self.assertEqual(manager.names()[:2], ['acc-00', 'acc-01'])
+        self.assertIs(manager.connection('acc-01')._conn, manager.pool)
+        self.assertEqual(manager.connection('acc-01').zone, 'zone')
+        conn = manager.add_account('acc-01', 'key-01', 'secret', zone='other')
+        self.assertEqual(manager.connection('acc-01').zone, 'other')
+        self.assertIs(manager.remove_account('acc-01'), conn)
+        self.assertIsNone(manager.remove_account('acc-01'))
+        self.assertEqual(len(manager), 39)
+
+    def test_shared_signers(self):
+        manager = self.manager
+        conn = manager.add_account('copy', 'key-00', 'secret', zone='other')
+        self.assertIs(conn._auth_handler, manager.connection('acc-00')._auth_handler)
+        self.assertIs(conn._auth_handler,
+                      manager.signers.get('127.0.0.1', 'key-00', 'secret'))
+        self.assertIsNot(conn._auth_handler, manager.connection('acc-01')._auth_handler)
+        # signers are scoped to the manager
+        other = AccountManager('zone', pool=manager.pool, host='127.0.0.1')
+        self.assertIsNot(other.add_account('acc-00', 'key-00', 'secret')._auth_handler,
+                         conn._auth_handler)
+        shared = AccountManager('zone', pool=manager.pool, host='127.0.0.1',
+                                signers=manager.signers)
+        self.assertIs(shared.add_account('acc-00', 'key-00', 'secret')._auth_handler,
+                      conn._auth_handler)
+
+    def test_signer_cache(self):
+        signers = SignerCache(max_size=2)
+        a = signers.get('host', 'key-a', 'secret-a')
+        b = signers.get('host', 'key-b', 'secret-b')
+        self.assertIs(signers.get('host', 'key-a', 'secret-a'), a)
+        # the least recently used signer is evicted
+        c = signers.get('host', 'key-c', 'secret-c')
+        self.assertEqual(len(signers), 2)
+        self.assertIs(signers.get('host', 'key-a', 'secret-a'), a)
+        self.assertIs(signers.get('host', 'key-c', 'secret-c'), c)
+        self.assertIsNot(signers.get('host', 'key-b', 'secret-b'), b)
+        for key in signers.signers:
+            self.assertNotIn('secret', key)
+
+    def test_cache_per_account(self):
+        with self.assertRaises(ValueError):
+            AccountManager('zone', cache=ResponseCache())
+        manager = AccountManager('zone', pool=self.manager.pool,
+                                 cache_factory=ResponseCache, host='127.0.0.1',
+                                 port=self.server.server_address[1],
+                                 protocol='http', retry_time=1)
+        try:
+            for name in ('a', 'b'):
+                manager.add_account(name, 'key-%s' % name, 'secret')
+            self.assertIsNot(manager.connection('a').cache,
+                             manager.connection('b').cache)
+            for _ in range(2):
+                results = manager.call('describe_volumes')
+                self.assertEqual(results['a']['volume_set'][0]['volume_id'],
+                                 'vol-key-a-0')
+                self.assertEqual(results['b']['volume_set'][0]['volume_id'],
+                                 'vol-key-b-0')
+            self.assertEqual(manager.connection('a').cache.stats()['hits'], 1)
+        finally:
+            manager.shutdown()
+
+    def test_sockets_do_not_grow_with_accounts(self):
+        results = self.manager.call('describe_volumes')
+        self.assertEqual(len(results), 40)
+        self.assertEqual(results['acc-03']['volume_set'][0]['volume_id'],
+                         'vol-key-03-0')
+        self.manager.call('describe_volumes')
+        # bounded by the concurrent calls rather than the 40 accounts
+        self.assertLessEqual(len(self.server.sockets), 4)
+
+    def test_describe(self):
+        self.manager.add_account('bad', 'denied', 'secret')
+        ret = self.manager.describe('describe_volumes', accounts=['acc-00', 'acc-01', 'bad'])
+        self.assertEqual(ret['total_count'], 4)
+        self.assertEqual([v['account'] for v in ret['volume_set']],
+                         ['acc-00', 'acc-00', 'acc-01', 'acc-01'])
+        self.assertIsInstance(ret['failed_accounts']['bad'], APIError)
+
+        ret = self.manager.describe('describe_volumes', all_pages=True)
+        self.assertEqual(len(ret['volume_set']), 80)
+        self.assertEqual(list(ret['failed_accounts']), ['bad'])
+
+    def test_run(self):
+        results = self.manager.run(lambda conn: conn.qy_access_key_id,
+                                   accounts=['acc-05'])
+        self.assertEqual(results, {'acc-05': 'key-05'})
@@ -0,0 +1,227 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+import asyncio
+import json
+import unittest
+
+try:
+    from urllib.parse import urlparse, parse_qs
+except ImportError:
+    from urlparse import urlparse, parse_qs
+
+from petaexpress.conn.compression import gzip_compress
+from petaexpress.iaas.aio import AsyncAPIConnection, AsyncDescribeLoader
+
+
+class FakeAPIServer(object):
+    """ Keep-alive http server answering IaaS requests """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.connections = 0
+        self.requests = []
+        self.encodings = []
+        self.server = None
+        self.port = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._serve, '127.0.0.1', 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _serve(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                method, path, _ = line.decode().split(' ', 2)
+                length = 0
+                gzip = False
+                while True:
+                    header = (await reader.readline()).decode().strip()
+                    if not header:
+                        break
+                    name, _, value = header.partition(':')
+                    if name.lower() == 'content-length':
+                        length = int(value)
+                    if name.lower() == 'accept-encoding':
+                        gzip = 'gzip' in value
+                body = await reader.readexactly(length) if length else b''
+                if method == 'POST':
+                    params = parse_qs(body.decode())
+                else:
+                    params = parse_qs(urlparse(path).query)
+                params = dict((k, v[0]) for k, v in params.items())
+                self.requests.append((method, params))
+                resp = await self.handler(params)
+                if resp is None:
+                    # body cut short by the server
+                    writer.write(b'HTTP/1.1 200 OK\r\nContent-Length: 100\r\n\r\n{')
+                    await writer.drain()
+                    break
+                data = json.dumps(resp).encode()
+                encoding = b''
+                if gzip:
+                    data = gzip_compress(data)
+                    encoding = b'Content-Encoding: gzip\r\n'
+                self.encodings.append(encoding)
+                writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n' +
+                             encoding +
+                             b'Content-Length: %d\r\n\r\n' % len(data) + data)
+                await writer.drain()
+        finally:
+            writer.close()
+
+
+class AsyncAPIConnectionTestCase(unittest.TestCase):
+
+    def run_with_server(self, handler, test):
+        async def main():
+            server = FakeAPIServer(handler)
+            await server.start()
+            conn = AsyncAPIConnection('access_key_id', 'secret_access_key', 'zone',
+                                      host='127.0.0.1', port=server.port,
+                                      protocol='http', max_connections=4)
+            try:
+                await test(conn, server)
+            finally:
+                await conn.close()
+                await server.stop()
+        asyncio.run(main())
+
+    def test_describe_instances(self):
+        async def handler(params):
+            return {'action': 'DescribeInstancesResponse', 'ret_code': 0,
+                    'instance_set': [{'instance_id': 'i-1'}], 'total_count': 1}
+
+        async def test(conn, server):
+            ret = await conn.describe_instances(instances=['i-1'], limit=10)
+            self.assertEqual(ret['instance_set'], [{'instance_id': 'i-1'}])
+            method, params = server.requests[0]
+            self.assertEqual(method, 'GET')
+            self.assertEqual(params['action'], 'DescribeInstances')
+            self.assertEqual(params['zone'], 'zone')
+            self.assertEqual(params['instances.1'], 'i-1')
+            self.assertEqual(params['access_key_id'], 'access_key_id')
+            self.assertIn('signature', params)
+            self.assertEqual(server.encodings, [b'Content-Encoding: gzip\r\n'])
+
+        self.run_with_server(handler, test)
+
+    def test_post_request(self):
+        async def handler(params):
+            return {'ret_code': 0, 'server_certificate_id': 'sc-1'}
+
+        async def test(conn, server):
+            ret = await conn.create_server_certificate(certificate_content='cert',
+                                                       private_key='key')
+            self.assertEqual(ret['server_certificate_id'], 'sc-1')
+            method, params = server.requests[0]
+            self.assertEqual(method, 'POST')
+            self.assertEqual(params['certificate_content'], 'cert')
+
+        self.run_with_server(handler, test)
+
+    def test_concurrent_requests_share_connections(self):
+        async def handler(params):
+            await asyncio.sleep(0.01)
+            return {'ret_code': 0, 'volume_set': [{'volume_id': params['volumes.1']}]}
+
+        async def test(conn, server):
+            ids = ['vol-%d' % i for i in range(50)]
+            rets = await asyncio.gather(*[conn.describe_volumes(volumes=[i]) for i in ids])
+            self.assertEqual([r['volume_set'][0]['volume_id'] for r in rets], ids)
+            self.assertLessEqual(server.connections, 4)
+            self.assertEqual(len(server.requests), 50)
+
+        self.run_with_server(handler, test)
+
+    def test_retry_server_busy(self):
+        calls = []
+
+        async def handler(params):
+            calls.append(params)
+            if len(calls) == 1:
+                return {'ret_code': 5100, 'message': 'server busy'}
+            return {'ret_code': 0, 'zone_set': []}
+
+        async def test(conn, server):
+            ret = await conn.describe_zones()
+            self.assertEqual(ret['ret_code'], 0)
+            self.assertEqual(len(calls), 2)
+
+        self.run_with_server(handler, test)
+
+    def test_failed_read_releases_connection(self):
+        calls = []
+
+        async def handler(params):
+            calls.append(params)
+            if params['action'] == 'DescribeZones':
+                return None
+            return {'ret_code': 0, 'volume_set': []}
+
+        async def test(conn, server):
+            conn.retry_time = 1
+            for _ in range(6):
+                with self.assertRaises(asyncio.IncompleteReadError):
+                    await conn.describe_zones()
+            # every slot of the pool has been given back
+            ret = await asyncio.wait_for(conn.describe_volumes(), 5)
+            self.assertEqual(ret['ret_code'], 0)
+            self.assertEqual(len(calls), 7)
+
+        self.run_with_server(handler, test)
+
+    def test_chunked_request(self):
+        async def handler(params):
+            return {'ret_code': 0, 'job_id': 'j-%s' % params['instances.1']}
+
+        async def test(conn, server):
+            instances = ['i-%03d' % i for i in range(150)]
+            ret = await conn.terminate_instances(instances)
+            self.assertEqual(sorted(ret['job_ids']), ['j-i-000', 'j-i-100'])
+            self.assertEqual(len(server.requests), 2)
+
+        self.run_with_server(handler, test)
+
+    def test_describe_loader(self):
+        async def handler(params):
+            ids = [v for k, v in sorted(params.items()) if k.startswith('volumes.')]
+            return {'ret_code': 0, 'total_count': len(ids),
+                    'volume_set': [{'volume_id': i} for i in ids if i != 'vol-missing']}
+
+        async def test(conn, server):
+            loader = AsyncDescribeLoader(conn, 'volume', window=0.01)
+            ids = ['vol-1', 'vol-2', 'vol-missing', 'vol-1']
+            rets = await asyncio.gather(*[loader.get(i) for i in ids])
+            self.assertEqual(rets, [{'volume_id': 'vol-1'}, {'volume_id': 'vol-2'},
+                                    None, {'volume_id': 'vol-1'}])
+            self.assertEqual(len(server.requests), 1)
+            self.assertEqual(server.requests[0][1]['limit'], '3')
+
+        self.run_with_server(handler, test)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,182 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+import time
+import unittest
+
+from mock import Mock
+
+from petaexpress.iaas.cache import (ResponseCache, canonical_key, is_read_only,
+                                    action_words)
+from petaexpress.iaas.connection import APIConnection
+
+
+class ResponseCacheTestCase(unittest.TestCase):
+
+    def test_is_read_only(self):
+        self.assertTrue(is_read_only('DescribeInstances'))
+        self.assertTrue(is_read_only('GetMonitor'))
+        self.assertFalse(is_read_only('RunInstances'))
+
+    def test_canonical_key(self):
+        key1 = canonical_key('DescribeInstances', {'status': ['running'], 'limit': 10,
+                                                   'action': 'DescribeInstances'})
+        key2 = canonical_key('DescribeInstances', {'limit': 10, 'status': ['running'],
+                                                   'expires': 'x'})
+        self.assertEqual(key1, key2)
+        self.assertNotEqual(key1, canonical_key('DescribeInstances', {'limit': 20}))
+        self.assertNotEqual(canonical_key('DescribeInstances', {}, 'key1@host'),
+                            canonical_key('DescribeInstances', {}, 'key2@host'))
+
+    def test_action_words(self):
+        self.assertEqual(action_words('ModifyInstanceAttributes'),
+                         set(['instance', 'attribute']))
+        self.assertEqual(action_words('DescribeSecurityGroups'),
+                         set(['security', 'group']))
+
+    def test_get_set(self):
+        cache = ResponseCache(ttl=60)
+        self.assertIsNone(cache.get('DescribeInstances', 'k'))
+        cache.set('DescribeInstances', 'k', {'ret_code': 0})
+        self.assertEqual(cache.get('DescribeInstances', 'k'), {'ret_code': 0})
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 1,
+                                         'invalidations': 0, 'size': 1})
+
+    def test_get_returns_copy(self):
+        cache = ResponseCache(ttl=60)
+        resp = {'ret_code': 0, 'instance_set': [{'instance_id': 'i-1'}]}
+        cache.set('DescribeInstances', 'k', resp)
+        resp['instance_set'].append({'instance_id': 'i-2'})
+        cached = cache.get('DescribeInstances', 'k')
+        cached['instance_set'][0]['status'] = 'running'
+        self.assertEqual(cache.get('DescribeInstances', 'k'),
+                         {'ret_code': 0, 'instance_set': [{'instance_id': 'i-1'}]})
+
+    def test_stale_set_dropped(self):
+        cache = ResponseCache(ttl=60)
+        generation = cache.generation
+        cache.invalidate('TerminateInstances', {'instances': ['i-1']})
+        cache.set('DescribeInstances', 'k', {'ret_code': 0}, generation)
+        self.assertIsNone(cache.get('DescribeInstances', 'k'))
+        cache.set('DescribeInstances', 'k', {'ret_code': 0}, cache.generation)
+        self.assertIsNotNone(cache.get('DescribeInstances', 'k'))
+
+    def test_failures_not_cached(self):
+        cache = ResponseCache(ttl=60)
+        cache.set('DescribeInstances', 'k', {'ret_code': 5100})
+        cache.set('DescribeInstances', 'k2', None)
+        self.assertEqual(cache.size(), 0)
+
+    def test_ttl(self):
+        cache = ResponseCache(ttl=60, ttls={'DescribeJobs': 0, 'DescribeZones': 0.01})
+        cache.set('DescribeJobs', 'jobs', {'ret_code': 0})
+        self.assertIsNone(cache.get('DescribeJobs', 'jobs'))
+        cache.set('DescribeZones', 'zones', {'ret_code': 0})
+        time.sleep(0.02)
+        self.assertIsNone(cache.get('DescribeZones', 'zones'))
+        self.assertEqual(cache.size(), 0)
+
+    def test_lru(self):
+        cache = ResponseCache(max_size=2)
+        cache.set('DescribeInstances', 'a', {'ret_code': 0})
+        cache.set('DescribeInstances', 'b', {'ret_code': 0})
+        cache.get('DescribeInstances', 'a')
+        cache.set('DescribeInstances', 'c', {'ret_code': 0})
+        self.assertIsNotNone(cache.get('DescribeInstances', 'a'))
+        self.assertIsNone(cache.get('DescribeInstances', 'b'))
+
+    def test_invalidate(self):
+        cache = ResponseCache()
+        cache.set('DescribeInstances', 'i', {'ret_code': 0})
+        cache.set('DescribeVolumes', 'v', {'ret_code': 0})
+        cache.set('DescribeVxnets', 'n', {'ret_code': 0})
+        cache.invalidate('ModifyInstanceAttributes', {'instance': 'i-1'})
+        self.assertIsNone(cache.get('DescribeInstances', 'i'))
+        self.assertIsNotNone(cache.get('DescribeVolumes', 'v'))
+        # volumes attached to an instance
+        cache.set('DescribeInstances', 'i', {'ret_code': 0})
+        cache.invalidate('AttachVolumes', {'volumes': ['vol-1'], 'instance': 'i-1'})
+        self.assertIsNone(cache.get('DescribeInstances', 'i'))
+        self.assertIsNone(cache.get('DescribeVolumes', 'v'))
+        self.assertIsNotNone(cache.get('DescribeVxnets', 'n'))
+        self.assertEqual(cache.stats()['invalidations'], 3)
+
+
+class APIConnectionCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = ResponseCache(ttl=60)
+        self.conn = APIConnection('access_key_id', 'secret_access_key', 'zone',
+                                  cache=self.cache)
+        self.conn._send_request = Mock(return_value={'ret_code': 0, 'instance_set': []})
+
+    def test_cache_describe(self):
+        self.conn.describe_instances(status=['running'])
+        self.conn.describe_instances(status=['running'])
+        self.assertEqual(self.conn._send_request.call_count, 1)
+        self.conn.describe_instances(status=['stopped'])
+        self.assertEqual(self.conn._send_request.call_count, 2)
+
+    def test_invalidate_on_mutation(self):
+        self.conn.describe_instances()
+        self.conn.terminate_instances(instances=['i-1'])
+        self.conn.describe_instances()
+        self.assertEqual(self.conn._send_request.call_count, 3)
+
+    def test_read_during_mutation_not_cached(self):
+        def send_request(request, url, verb):
+            if request['action'] == 'DescribeInstances':
+                # the instance is terminated while describing it
+                self.conn.terminate_instances(instances=['i-1'])
+                return {'ret_code': 0, 'instance_set': [{'status': 'running'}]}
+            return {'ret_code': 0}
+        self.conn._send_request.side_effect = send_request
+        self.conn.describe_instances()
+        self.assertEqual(self.cache.size(), 0)
+
+    def test_cache_per_credentials(self):
+        conn = APIConnection('other_key_id', 'secret_access_key', 'zone',
+                             cache=self.cache)
+        conn._send_request = Mock(return_value={'ret_code': 0, 'instance_set': []})
+        self.conn.describe_instances()
+        conn.describe_instances()
+        self.assertEqual(self.conn._send_request.call_count, 1)
+        self.assertEqual(conn._send_request.call_count, 1)
+
+    def test_decompress_cached_monitoring_data(self):
+        meter_set = [{'meter_id': 'cpu', 'data': [[1500000000, 10], 20]}]
+        self.conn._send_request.return_value = {'ret_code': 0,
+                                                'meter_set': meter_set}
+        params = dict(resource='i-1', meters=['cpu'], step='5m',
+                      start_time='2017-07-14T02:40:00Z',
+                      end_time='2017-07-14T02:50:00Z')
+        decompressed = self.conn.get_monitoring_data(decompress=True, **params)
+        self.assertEqual(decompressed['meter_set'][0]['data'][1][1], 20)
+        raw = self.conn.get_monitoring_data(**params)
+        self.assertEqual(self.conn._send_request.call_count, 1)
+        self.assertEqual(raw['meter_set'], meter_set)
+
+    def test_no_cache(self):
+        conn = APIConnection('access_key_id', 'secret_access_key', 'zone')
+        conn._send_request = Mock(return_value={'ret_code': 0})
+        conn.describe_zones()
+        conn.describe_zones()
+        self.assertEqual(conn._send_request.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+import threading
+import unittest
+
+from mock import Mock
+
+from petaexpress.iaas.chunking import split_request, merge_responses
+from petaexpress.iaas.connection import APIConnection
+from petaexpress.iaas.errors import ChunkedRequestError
+
+
+class ChunkingTestCase(unittest.TestCase):
+
+    def test_split_request(self):
+        body = {'instances': ['i-%d' % i for i in range(250)], 'zone': 'z'}
+        chunks = split_request('TerminateInstances', body)
+        self.assertEqual([len(items) for items, _ in chunks], [100, 100, 50])
+        self.assertEqual(chunks[2][1], {'instances': body['instances'][200:],
+                                        'zone': 'z'})
+        self.assertEqual(len(body['instances']), 250)
+
+    def test_no_split(self):
+        self.assertIsNone(split_request('TerminateInstances',
+                                        {'instances': ['i-1'] * 100}))
+        self.assertIsNone(split_request('DescribeInstances',
+                                        {'instances': ['i-1'] * 200}))
+        self.assertIsNone(split_request('TerminateInstances', {}))
+
+    def test_merge_responses(self):
+        chunks = [(['i-1'], {}), (['i-2'], {}), (['i-3'], {})]
+        merged = merge_responses(chunks, [
+            {'ret_code': 0, 'action': 'StopInstancesResponse', 'job_id': 'j-1',
+             'instances': ['i-1']},
+            {'ret_code': 1400, 'message': 'bad'},
+            {'ret_code': 0, 'action': 'StopInstancesResponse', 'job_id': 'j-3',
+             'instances': ['i-3']},
+        ])
+        self.assertEqual(merged['ret_code'], 1400)
+        self.assertEqual(merged['message'], 'bad')
+        self.assertEqual(merged['action'], 'StopInstancesResponse')
+        self.assertEqual(merged['job_id'], 'j-1')
+        self.assertEqual(merged['job_ids'], ['j-1', 'j-3'])
+        self.assertEqual(merged['instances'], ['i-1', 'i-3'])
+        self.assertEqual(merged['failed_chunks'],
+                         [{'items': ['i-2'], 'ret_code': 1400, 'message': 'bad'}])
+
+    def test_merge_errors(self):
+        chunks = [(['i-1'], {}), (['i-2'], {})]
+        error = IOError('timeout')
+        try:
+            merge_responses(chunks, [{'ret_code': 0, 'job_id': 'j-1'}, error])
+        except ChunkedRequestError as e:
+            self.assertEqual(e.errors, [error])
+            self.assertEqual(e.response['job_ids'], ['j-1'])
+        else:
+            self.fail('ChunkedRequestError not raised')
+
+        self.assertRaises(IOError, merge_responses, chunks, [error, error])
+
+
+class ChunkedSendRequestTestCase(unittest.TestCase):
+
+    def test_send_chunks_concurrently(self):
+        conn = APIConnection('access_key_id', 'secret_access_key', 'zone')
+        barrier = threading.Barrier(3)
+        requests = []
+
+        def send_request(request, url, verb):
+            requests.append(request)
+            barrier.wait(1)
+            return {'ret_code': 0, 'action': 'DeleteVolumesResponse',
+                    'job_id': 'j-%s' % request['volumes'][0]}
+
+        conn._send_request = Mock(side_effect=send_request)
+        volumes = ['vol-%03d' % i for i in range(201)]
+        ret = conn.delete_volumes(volumes)
+        conn.shutdown()
+
+        self.assertEqual(ret['ret_code'], 0)
+        self.assertEqual(ret['job_ids'], ['j-vol-000', 'j-vol-100', 'j-vol-200'])
+        self.assertEqual(sorted(v for r in requests for v in r['volumes']), volumes)
+        for request in requests:
+            self.assertEqual(request['action'], 'DeleteVolumes')
+            self.assertLessEqual(len(request['volumes']), 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
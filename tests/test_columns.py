@@ -0,0 +1,171 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+import unittest
+
+from mock import patch
+
+from petaexpress.iaas import columns
+from petaexpress.iaas.columns import (to_columns, mask_and, mask_or,
+                                      NumericColumn, StringColumn, ListColumn)
+from petaexpress.iaas.models import to_models
+
+from tests import make_instance
+
+
+def make_instances():
+    return [
+        make_instance(1, instance_type='c1m1', vcpus_current=1,
+                      memory_current=1024, image='centos',
+                      vxnets=['vxnet-0', 'vxnet-a']),
+        make_instance(2, instance_type='c2m4', vcpus_current=2,
+                      memory_current=4096, image='ubuntu'),
+        make_instance(3, status='stopped', instance_type='c2m4',
+                      vcpus_current=2, memory_current=None, image='ubuntu',
+                      vxnets=[]),
+        make_instance(4, vcpus_current=4, memory_current=8192.5, image=None,
+                      vxnets=['vxnet-a']),
+    ]
+
+
+FIELDS = ['instance_id', 'instance_type', 'status', 'vcpus_current',
+          'memory_current', 'image.image_id', 'vxnets.vxnet_id']
+
+
+class ColumnsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cols = to_columns(make_instances(), FIELDS)
+
+    def test_to_columns(self):
+        cols = self.cols
+        self.assertEqual(len(cols), 4)
+        self.assertEqual(cols.names, sorted(FIELDS))
+        self.assertIsInstance(cols['vcpus_current'], NumericColumn)
+        self.assertEqual(cols['vcpus_current'].data.typecode, 'q')
+        self.assertEqual(cols['memory_current'].data.typecode, 'd')
+        self.assertEqual(cols['memory_current'].to_list(),
+                         [1024, 4096, None, 8192.5])
+
+        status = cols['status']
+        self.assertIsInstance(status, StringColumn)
+        self.assertEqual(status.categories, ['running', 'stopped'])
+        self.assertEqual(list(status.codes), [0, 0, 1, 0])
+        self.assertEqual(cols['instance_type'].to_list(),
+                         ['c1m1', 'c2m4', 'c2m4', None])
+        self.assertEqual(cols['image.image_id'].to_list(),
+                         ['centos', 'ubuntu', 'ubuntu', None])
+
+        vxnets = cols['vxnets.vxnet_id']
+        self.assertIsInstance(vxnets, ListColumn)
+        self.assertEqual(vxnets.to_list(), [['vxnet-0', 'vxnet-a'],
+                                            ['vxnet-0'], [], ['vxnet-a']])
+        self.assertEqual(cols.row(1)['instance_type'], 'c2m4')
+
+    def test_missing_first_values(self):
+        cols = to_columns([{}, {'a': 1, 'b': 'x'}, {'a': 2}], ['a', 'b', 'c'])
+        self.assertEqual(cols['a'].to_list(), [None, 1, 2])
+        self.assertEqual(cols['b'].to_list(), [None, 'x', None])
+        self.assertEqual(cols['c'].to_list(), [None, None, None])
+
+    def test_mixed_types(self):
+        with self.assertRaises(ValueError):
+            to_columns([{'a': 1}, {'a': 'x'}], ['a'])
+
+    def test_from_models(self):
+        items = to_models({'instance_set': make_instances()}, 'instance_set')
+        cols = to_columns(items, FIELDS)
+        self.assertEqual(cols['vxnets.vxnet_id'][0], ['vxnet-0', 'vxnet-a'])
+        self.assertEqual(cols['image.image_id'][1], 'ubuntu')
+
+    def check_where_and_filter(self):
+        cols = self.cols
+        running = cols.where('status', '==', 'running')
+        self.assertEqual(list(running), [1, 1, 0, 1])
+        self.assertEqual(list(cols.where('status', '!=', 'running')), [0, 0, 1, 0])
+        self.assertEqual(list(cols.where('status', '==', 'unknown')), [0, 0, 0, 0])
+        self.assertEqual(list(cols.where('instance_type', 'in', ['c1m1', 'c2m4'])),
+                         [1, 1, 1, 0])
+        big = cols.where('memory_current', '>=', 4096)
+        self.assertEqual(list(big), [0, 1, 0, 1])
+        self.assertEqual(list(cols.where('vcpus_current', 'in', [1, 4])),
+                         [1, 0, 0, 1])
+        self.assertEqual(list(cols.where('vxnets.vxnet_id', '==', 'vxnet-a')),
+                         [1, 0, 0, 1])
+        self.assertEqual(list(mask_and(running, big)), [0, 1, 0, 1])
+        self.assertEqual(list(mask_or(running, big)), [1, 1, 0, 1])
+        self.assertRaises(ValueError, cols.where, 'status', '<', 'running')
+
+        selected = cols.filter(mask_and(running, big))
+        self.assertEqual(len(selected), 2)
+        self.assertEqual(selected['instance_id'].to_list(), ['i-0002', 'i-0004'])
+        self.assertEqual(selected['vxnets.vxnet_id'].to_list(),
+                         [['vxnet-0'], ['vxnet-a']])
+        self.assertEqual(selected['memory_current'].to_list(), [4096, 8192.5])
+
+    def check_group_by(self):
+        cols = self.cols
+        ret = cols.group_by('instance_type', count=('instance_id', 'count'),
+                            cpu=('vcpus_current', 'sum'),
+                            memory=('memory_current', 'mean'),
+                            min_memory=('memory_current', 'min'),
+                            max_cpu=('vcpus_current', 'max'))
+        self.assertEqual(sorted(ret, key=str), [None, 'c1m1', 'c2m4'])
+        self.assertEqual(ret['c1m1'], {'count': 1, 'cpu': 1, 'memory': 1024,
+                                       'min_memory': 1024, 'max_cpu': 1})
+        self.assertEqual(ret['c2m4'], {'count': 2, 'cpu': 4, 'memory': 4096,
+                                       'min_memory': 4096, 'max_cpu': 2})
+        self.assertEqual(ret[None]['cpu'], 4)
+
+        ret = cols.group_by('vcpus_current', count=('instance_id', 'count'),
+                            memory=('memory_current', 'sum'))
+        self.assertEqual(ret[2], {'count': 2, 'memory': 4096})
+        self.assertEqual(sorted(ret), [1, 2, 4])
+
+        ret = cols.group_by('vxnets.vxnet_id', count=('instance_id', 'count'),
+                            cpu=('vcpus_current', 'sum'))
+        self.assertEqual(ret, {'vxnet-0': {'count': 2, 'cpu': 3},
+                               'vxnet-a': {'count': 2, 'cpu': 5}})
+
+        # groups without any value
+        ret = cols.group_by('status', memory=('memory_current', 'max'))
+        self.assertEqual(ret, {'running': {'memory': 8192.5},
+                               'stopped': {'memory': None}})
+
+        self.assertRaises(ValueError, cols.group_by, 'status',
+                          x=('status', 'sum'))
+        self.assertRaises(ValueError, cols.group_by, 'status',
+                          x=('vcpus_current', 'median'))
+        self.assertRaises(ValueError, cols.group_by, 'status',
+                          x=('vxnets.vxnet_id', 'count'))
+
+    def test_with_numpy(self):
+        if columns.numpy is None:
+            self.skipTest('numpy is not installed')
+        self.check_where_and_filter()
+        self.check_group_by()
+
+    def test_without_numpy(self):
+        with patch.object(columns, 'numpy', None):
+            self.check_where_and_filter()
+            self.check_group_by()
+
+    def test_empty(self):
+        cols = to_columns([], ['status', 'vcpus_current'])
+        self.assertEqual(len(cols), 0)
+        self.assertEqual(cols.group_by('status', n=('status', 'count')), {})
+        self.assertEqual(len(cols.filter(cols.where('status', '==', 'x'))), 0)
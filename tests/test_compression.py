@@ -0,0 +1,175 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+import unittest
+import zlib
+from io import BytesIO
+
+from mock import Mock, patch
+
+from petaexpress.conn.compression import (ContentDecoder, create_decoder,
+                                          gzip_compress, has_header, set_header)
+from petaexpress.conn.connection import HTTPResponse
+from petaexpress.iaas.connection import APIConnection
+from petaexpress.qingstor.connection import QSConnection
+
+BODY = b'{"ret_code":0,"instance_set":[' + b','.join(
+    [b'{"instance_id":"i-%08d"}' % i for i in range(500)]) + b']}'
+
+
+class FakeSocket(object):
+
+    def __init__(self, data):
+        self.data = data
+
+    def makefile(self, *args, **kwargs):
+        return BytesIO(self.data)
+
+
+def make_response(body, encoding=None, status=200):
+    headers = b'HTTP/1.1 %d OK\r\nContent-Length: %d\r\n' % (status, len(body))
+    if encoding:
+        headers += b'Content-Encoding: %s\r\n' % encoding.encode()
+    response = HTTPResponse(FakeSocket(headers + b'\r\n' + body))
+    response.begin()
+    return response
+
+
+class CompressionTestCase(unittest.TestCase):
+
+    def test_headers(self):
+        headers = {'content-length': '1'}
+        self.assertTrue(has_header(headers, 'Content-Length'))
+        self.assertFalse(has_header(None, 'Content-Length'))
+        set_header(headers, 'Content-Length', '2')
+        self.assertEqual(headers, {'Content-Length': '2'})
+
+    def test_create_decoder(self):
+        self.assertIsNone(create_decoder(None))
+        self.assertIsNone(create_decoder('identity'))
+        self.assertEqual(create_decoder('GZIP').encoding, 'gzip')
+        self.assertEqual(create_decoder('deflate').encoding, 'deflate')
+
+    def test_decode_by_chunks(self):
+        raw = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+        for encoding, data in [('gzip', gzip_compress(BODY)),
+                               ('deflate', zlib.compress(BODY)),
+                               ('deflate', raw.compress(BODY) + raw.flush())]:
+            decoder = ContentDecoder(encoding)
+            out = b''.join(decoder.decompress(data[i:i + 7])
+                           for i in range(0, len(data), 7)) + decoder.flush()
+            self.assertEqual(out, BODY)
+
+    def test_read_decoded_response(self):
+        response = make_response(gzip_compress(BODY), 'gzip')
+        response.decode_content()
+        self.assertEqual(response.read(), BODY)
+        self.assertEqual(response.read(), BODY)
+
+    def test_read_decoded_response_by_amt(self):
+        response = make_response(gzip_compress(BODY), 'gzip')
+        response.decode_content()
+        chunks = []
+        while True:
+            data = response.read(100)
+            if not data:
+                break
+            self.assertLessEqual(len(data), 100)
+            chunks.append(data)
+        self.assertEqual(b''.join(chunks), BODY)
+
+    def test_not_requested(self):
+        data = gzip_compress(BODY)
+        response = make_response(data, 'gzip')
+        self.assertEqual(response.read(), data)
+        response = make_response(BODY)
+        response.decode_content()
+        self.assertEqual(response.read(), BODY)
+
+
+class ConnectionCompressionTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.conn = APIConnection('access_key_id', 'secret_access_key', 'zone')
+        self.http_conn = Mock()
+        self.http_conn.getresponse.return_value = make_response(
+            gzip_compress(BODY), 'gzip')
+        self.conn._get_conn = Mock(return_value=self.http_conn)
+
+    def sent_headers(self):
+        return self.http_conn.request.call_args[0][3]
+
+    def test_accept_encoding(self):
+        ret = self.conn.describe_instances()
+        self.assertEqual(len(ret['instance_set']), 500)
+        self.assertEqual(self.sent_headers()['Accept-Encoding'], 'gzip, deflate')
+
+    def test_disabled(self):
+        self.conn.accept_encoding = None
+        self.http_conn.getresponse.return_value = make_response(BODY)
+        self.conn.describe_instances()
+        self.assertFalse(has_header(self.sent_headers(), 'Accept-Encoding'))
+
+    def test_compress_request_body(self):
+        self.conn.compress_threshold = 1024
+        content = 'x' * 4096
+        self.conn.upload_userdata(attachment_content=content)
+        method, path, body, headers = self.http_conn.request.call_args[0]
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertEqual(headers['Content-Length'], str(len(body)))
+        self.assertIn(b'attachment_content=' + b'x' * 4096,
+                      zlib.decompress(body, 16 + zlib.MAX_WBITS))
+
+        self.conn.compress_threshold = 1024 * 1024
+        self.conn.upload_userdata(attachment_content=content)
+        self.assertNotIn('Content-Encoding', self.sent_headers())
+
+    def test_no_compression_with_md5(self):
+        self.conn.compress_threshold = 1024
+        request = Mock(body=b'x' * 4096, header={'Content-MD5': 'checksum'})
+        self.conn._set_content_encoding(request)
+        self.assertEqual(request.body, b'x' * 4096)
+        self.assertFalse(has_header(request.header, 'Content-Encoding'))
+
+
+class RetryCompressionTestCase(unittest.TestCase):
+
+    @patch('petaexpress.qingstor.connection.time.sleep')
+    def test_decode_after_retry(self, sleep):
+        conn = QSConnection('access_key_id', 'secret_access_key')
+        http_conn = Mock()
+        http_conn.getresponse.side_effect = [
+            make_response(b'busy', status=503),
+            make_response(gzip_compress(b'{"buckets": []}'), 'gzip')]
+        conn._get_conn = Mock(return_value=http_conn)
+        self.assertEqual(conn.get_all_buckets(), {'buckets': []})
+        self.assertEqual(http_conn.request.call_count, 2)
+        for call in http_conn.request.call_args_list:
+            self.assertEqual(call[0][3]['Accept-Encoding'], 'gzip, deflate')
+
+    def test_caller_headers_kept(self):
+        conn = APIConnection('access_key_id', 'secret_access_key', 'zone')
+        conn.compress_threshold = 1024
+        headers = {'X-Test': '1'}
+        request = Mock(body=b'x' * 4096, header=headers)
+        self.assertTrue(conn._set_content_encoding(request))
+        self.assertEqual(headers, {'X-Test': '1'})
+        self.assertEqual(request.header['Content-Encoding'], 'gzip')
+
+
+if __name__ == '__main__':
+    unittest.main()
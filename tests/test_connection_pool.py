@@ -0,0 +1,267 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+import time
+import threading
+import unittest
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+from petaexpress.conn.connection import ConnectionQueue, ConnectionPool
+from petaexpress.iaas.connection import APIConnection
+
+
+class FakeConnection(object):
+
+    def __init__(self, busy=False):
+        self.busy = busy
+        self.closed = False
+
+    @property
+    def _HTTPConnection__response(self):
+        if self.busy:
+            return self
+        return None
+
+    def isclosed(self):
+        return not self.busy
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionQueueTestCase(unittest.TestCase):
+
+    def test_get_conn_lifo(self):
+        queue = ConnectionQueue()
+        first, second = FakeConnection(), FakeConnection()
+        queue.put_conn(first)
+        queue.put_conn(second)
+        self.assertIs(queue.get_conn(), second)
+        self.assertIs(queue.get_conn(), first)
+        self.assertIsNone(queue.get_conn())
+
+    def test_get_conn_skip_busy(self):
+        queue = ConnectionQueue()
+        idle, busy = FakeConnection(), FakeConnection(busy=True)
+        queue.put_conn(idle)
+        queue.put_conn(busy)
+        self.assertIs(queue.get_conn(), idle)
+        # the busy connection is left to the one reading its response
+        self.assertEqual(queue.size(), 0)
+        self.assertFalse(busy.closed)
+
+    def test_max_idle(self):
+        queue = ConnectionQueue(max_idle=2)
+        conns = [FakeConnection() for _ in range(3)]
+        for conn in conns:
+            queue.put_conn(conn)
+        self.assertEqual(queue.size(), 2)
+        self.assertTrue(conns[0].closed)
+        self.assertFalse(conns[2].closed)
+
+    def test_max_lifetime(self):
+        queue = ConnectionQueue(max_lifetime=10)
+        conn = FakeConnection()
+        conn._created_time = time.time() - 20
+        queue.put_conn(conn)
+        self.assertEqual(queue.size(), 0)
+        self.assertTrue(conn.closed)
+
+    def test_clear(self):
+        queue = ConnectionQueue(timeout=10)
+        expired, fresh = FakeConnection(), FakeConnection()
+        queue.put_conn(expired)
+        queue.put_conn(fresh)
+        queue.queue[0] = (expired, time.time() - 20, time.time() - 20)
+        queue.clear()
+        self.assertEqual(queue.size(), 1)
+        self.assertTrue(expired.closed)
+        self.assertIs(queue.get_conn(), fresh)
+
+
+class ConnectionPoolTestCase(unittest.TestCase):
+
+    def test_put_get_conn(self):
+        pool = ConnectionPool()
+        conn = FakeConnection()
+        self.assertTrue(pool.put_conn('host', 443, conn))
+        self.assertEqual(pool.size(), 1)
+        self.assertIsNone(pool.get_conn('other', 443))
+        self.assertIs(pool.get_conn('host', 443), conn)
+        self.assertEqual(pool.size(), 0)
+        pool.close()
+
+    def test_max_total(self):
+        pool = ConnectionPool(max_total=2)
+        self.assertTrue(pool.put_conn('host1', 443, FakeConnection()))
+        self.assertTrue(pool.put_conn('host2', 443, FakeConnection()))
+        self.assertFalse(pool.put_conn('host3', 443, FakeConnection()))
+        self.assertEqual(pool.size(), 2)
+        pool.close()
+
+    def test_clear(self):
+        pool = ConnectionPool(timeout=0)
+        conn = FakeConnection()
+        pool.put_conn('host', 443, conn)
+        time.sleep(0.01)
+        pool.clear()
+        self.assertEqual(pool.size(), 0)
+        self.assertEqual(pool.pool, {})
+        self.assertTrue(conn.closed)
+
+    def test_many_hosts(self):
+        pool = ConnectionPool()
+        conns = {}
+        for i in range(32):
+            conns[i] = FakeConnection()
+            pool.put_conn('bucket-%d.qingstor.com' % i, 443, conns[i])
+        self.assertEqual(pool.size(), 32)
+        for i in range(32):
+            self.assertIs(pool.get_conn('bucket-%d.qingstor.com' % i, 443), conns[i])
+        self.assertEqual(pool.size(), 0)
+        pool.close()
+
+    def test_concurrent_max_total(self):
+        pool = ConnectionPool(max_total=10)
+
+        def worker(index):
+            for i in range(50):
+                pool.put_conn('host-%d' % (index % 8), 443, FakeConnection())
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(16)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(pool.size(), 10)
+        self.assertEqual(sum([q.size() for q in pool.pool.values()]), 10)
+        pool.close()
+
+    def test_concurrent_put_get(self):
+        pool = ConnectionPool()
+        errors = []
+
+        def worker(index):
+            try:
+                for _ in range(200):
+                    host = 'host-%d' % (index % 8)
+                    conn = pool.get_conn(host, 443) or FakeConnection()
+                    pool.put_conn(host, 443, conn)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(16)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(pool.size(), sum([len(q.queue) for q in pool.pool.values()]))
+        pool.close()
+
+    def test_close(self):
+        pool = ConnectionPool()
+        conn = FakeConnection()
+        pool.put_conn('host', 443, conn)
+        pool.close()
+        self.assertEqual(pool.size(), 0)
+        self.assertTrue(conn.closed)
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.sockets.add(self.client_address)
+        time.sleep(0.002)
+        body = b'{"ret_code":0,"zone_set":[]}' + b' ' * 4096
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class ConnectionReuseTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = Server(('127.0.0.1', 0), Handler)
+        self.server.sockets = set()
+        thread = threading.Thread(target=self.server.serve_forever, args=(0.05,))
+        thread.daemon = True
+        thread.start()
+        self.conn = APIConnection('access_key_id', 'secret_access_key', 'zone',
+                                  host='127.0.0.1', port=self.server.server_address[1],
+                                  protocol='http', retry_time=1)
+
+    def tearDown(self):
+        self.conn._conn.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_released_after_read(self):
+        response = self.conn.send('GET', '/iaas/', {'action': 'DescribeZones'})
+        self.assertEqual(self.conn._conn.size(), 0)
+        response.read()
+        self.assertEqual(self.conn._conn.size(), 1)
+
+    def test_discarded_if_closed_before_read(self):
+        response = self.conn.send('GET', '/iaas/', {'action': 'DescribeZones'})
+        response.read(10)
+        response.close()
+        self.assertEqual(self.conn._conn.size(), 0)
+        self.conn.send('GET', '/iaas/', {'action': 'DescribeZones'}).read()
+        self.assertEqual(len(self.server.sockets), 2)
+
+    def test_refused_connection_closed(self):
+        self.conn._conn = ConnectionPool(max_total=1)
+        self.conn._conn.put_conn('other', 80, FakeConnection())
+        conn = FakeConnection()
+        conn.host, conn.port = '127.0.0.1', 80
+        self.conn._set_conn(conn)
+        self.assertTrue(conn.closed)
+
+    def test_sockets_bounded_by_threads(self):
+        def worker():
+            for _ in range(20):
+                self.conn.describe_zones()
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        # a connection is only reused once its response has been read,
+        # so no more sockets are opened than requests are concurrent
+        self.assertLessEqual(len(self.server.sockets), 8)
+        self.assertLessEqual(self.conn._conn.size(), 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+import threading
+import time
+import unittest
+from io import BytesIO
+
+from mock import Mock, patch
+
+from petaexpress.iaas.connection import APIConnection
+from petaexpress.iaas.errors import APIError, InvalidAction, InvalidParameterError
+from petaexpress.misc.json_tool import json_load
+
+
+class APIConnectionTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.conn = APIConnection('access_key_id', 'secret_access_key', 'zone')
+
+    def tearDown(self):
+        self.conn.shutdown()
+
+    def test_submit(self):
+        self.conn.send_request = Mock(return_value={'ret_code': 0, 'job_id': 'j-1'})
+        future = self.conn.submit('stop_instances', instances=['i-1'], force=1)
+        self.assertEqual(future.result(), {'ret_code': 0, 'job_id': 'j-1'})
+        action, body = self.conn.send_request.call_args[0]
+        self.assertEqual(action, 'StopInstances')
+        self.assertEqual(body, {'instances': ['i-1'], 'force': 1})
+
+    def test_submit_invalid_method(self):
+        self.assertRaises(InvalidAction, self.conn.submit, 'no_such_method')
+
+    def test_dispatch(self):
+        conn = self.conn
+        self.assertEqual(conn._actions, {})
+        method = conn.describe_instances
+        self.assertEqual(method.__self__.__class__.__name__, 'InstanceAction')
+        self.assertIs(method.__self__.conn, conn)
+        # bound on first use
+        self.assertIs(conn.__dict__['describe_instances'], method)
+        self.assertIs(conn.describe_instances, method)
+        self.assertIs(conn.stop_instances.__self__, method.__self__)
+        self.assertEqual(len(conn._actions), 1)
+        self.assertEqual(conn.describe_vpc_borders.__self__.__class__.__name__,
+                         'VpcBorder')
+        self.assertRaises(InvalidAction, getattr, conn, 'no_such_method')
+        self.assertRaises(InvalidAction, getattr, conn, '_private')
+        self.assertEqual(len(conn.actions), 19)
+        self.assertIs(conn.actions[0], method.__self__)
+
+    def test_map_ordered(self):
+        def send_request(action, body):
+            # later calls finish first
+            time.sleep(0.01 * (5 - int(body['instances'][0][2:])))
+            return {'ret_code': 0, 'instances': body['instances']}
+        self.conn.send_request = Mock(side_effect=send_request)
+        ret = self.conn.map('stop_instances',
+                            [{'instances': ['i-%d' % i]} for i in range(5)],
+                            max_workers=5)
+        self.assertEqual([r['instances'][0] for r in ret],
+                         ['i-%d' % i for i in range(5)])
+
+    def test_map_concurrent(self):
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def send_request(action, body):
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.02)
+            with lock:
+                active.pop()
+            return {'ret_code': 0}
+        self.conn.send_request = Mock(side_effect=send_request)
+        self.conn.map('start_instances', [{'instances': ['i-%d' % i]} for i in range(8)])
+        self.assertGreater(max(peak), 1)
+
+    def test_map_errors(self):
+        def send_request(action, body):
+            if body['instances'] == ['i-1']:
+                raise APIError(1400, 'invalid instance')
+            return {'ret_code': 0}
+        self.conn.send_request = Mock(side_effect=send_request)
+        kwargs = [{'instances': ['i-%d' % i]} for i in range(3)]
+        ret = self.conn.map('stop_instances', kwargs)
+        self.assertEqual(ret[0], {'ret_code': 0})
+        self.assertIsInstance(ret[1], APIError)
+        self.assertEqual(ret[2], {'ret_code': 0})
+        self.assertRaises(APIError, self.conn.map, 'stop_instances', kwargs,
+                          return_exceptions=False)
+
+    def test_response_parsed_once(self):
+        response = Mock(status=200)
+        response.read.side_effect = [b'{"ret_code":5100}',
+                                     b'{"ret_code":0,"zone_set":[]}']
+        self.conn.send = Mock(return_value=response)
+        self.conn._get_conn = Mock()
+        with patch('petaexpress.iaas.connection.json_load',
+                   wraps=json_load) as loader, patch('time.sleep'):
+            ret = self.conn.describe_zones()
+        self.assertEqual(ret, {'ret_code': 0, 'zone_set': []})
+        self.assertEqual(loader.call_count, 2)
+
+    def test_stream_describe(self):
+        data = (b'{"action":"DescribeVolumesResponse","total_count":2,"ret_code":0,'
+                b'"volume_set":[{"volume_id":"vol-1","size":10},'
+                b'{"volume_id":"vol-2","size":20}]}')
+        body = BytesIO(data)
+        response = Mock(status=200)
+        response.read.side_effect = body.read
+        self.conn.send = Mock(return_value=response)
+        stream = self.conn.stream_describe('describe_volumes', fields=['volume_id'],
+                                           volumes=['vol-1', 'vol-2'], chunk_size=16)
+        self.assertEqual(list(stream), [{'volume_id': 'vol-1'}, {'volume_id': 'vol-2'}])
+        self.assertEqual(stream.head['total_count'], 2)
+        verb, url, request = self.conn.send.call_args[0]
+        self.assertEqual(request['action'], 'DescribeVolumes')
+        self.assertEqual(request['volumes'], ['vol-1', 'vol-2'])
+
+    def test_stream_describe_error(self):
+        response = Mock(status=200)
+        response.read.side_effect = BytesIO(b'{"ret_code":1400,"message":"bad"}').read
+        self.conn.send = Mock(return_value=response)
+        stream = self.conn.stream_describe('describe_volumes')
+        self.assertRaises(APIError, list, stream)
+        self.assertRaises(InvalidParameterError, self.conn.stream_describe,
+                          'describe_volumes', limit='x')
+
+    def test_stream_describe_http_error(self):
+        response = Mock(status=503, reason='Service Unavailable')
+        self.conn.send = Mock(return_value=response)
+        self.assertRaises(APIError, self.conn.stream_describe, 'describe_volumes')
+        response.read.assert_called_once_with()
+        response.close.assert_called_once_with()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_python(code, path=None):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([ROOT] + (path or []))
+    return subprocess.check_output([sys.executable, '-c', code], env=env,
+                                   stderr=subprocess.STDOUT).decode().strip()
+
+
+class ImportTestCase(unittest.TestCase):
+
+    @unittest.skipIf(sys.version_info < (3, 7), 'lazy imports need Python 3.7')
+    def test_packages_import_lazily(self):
+        output = run_python(
+            'import sys\n'
+            'import petaexpress.iaas, petaexpress.qingstor\n'
+            'print(sorted(m for m in ["pkg_resources", "past", "concurrent.futures",\n'
+            '    "petaexpress.iaas.connection", "petaexpress.iaas.actions.instance",\n'
+            '    "petaexpress.qingstor.connection"] if m in sys.modules))')
+        self.assertEqual(output, '[]')
+
+    @unittest.skipIf(sys.version_info < (3, 7), 'lazy imports need Python 3.7')
+    def test_connection_imports_actions_on_first_call(self):
+        output = run_python(
+            'import sys\n'
+            'from petaexpress.iaas import APIConnection\n'
+            'conn = APIConnection("key", "secret", "zone")\n'
+            'print("petaexpress.iaas.actions.instance" in sys.modules)\n'
+            'conn.describe_instances\n'
+            'print("petaexpress.iaas.actions.instance" in sys.modules)\n'
+            'import petaexpress.iaas as iaas\n'
+            'print(iaas.waiter.JobWaiter.__name__)')
+        self.assertEqual(output.split(), ['False', 'True', 'JobWaiter'])
+
+    def test_namespace_portions(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            os.makedirs(os.path.join(tmpdir, 'petaexpress', 'extra'))
+            with open(os.path.join(tmpdir, 'petaexpress', 'extra', '__init__.py'), 'w') as f:
+                f.write('NAME = "extra"\n')
+            output = run_python('import petaexpress.extra, petaexpress.iaas\n'
+                                'print(petaexpress.extra.NAME)', [tmpdir])
+            self.assertEqual(output, 'extra')
+        finally:
+            shutil.rmtree(tmpdir)
@@ -0,0 +1,183 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+import unittest
+
+from mock import Mock
+
+from petaexpress.iaas.connection import APIConnection
+from petaexpress.iaas.errors import APIError
+from petaexpress.iaas.inventory import Inventory
+from petaexpress.iaas.models import to_models
+
+from tests import FakeDescribe, make_instance
+
+
+class InventoryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.inventory = Inventory('instance')
+        self.inventory.update([
+            make_instance(1, vxnets=['vxnet-0', 'vxnet-a'], tags=['tag-1']),
+            make_instance(2, tags=['tag-1', 'tag-2']),
+            make_instance(3, status='stopped', tags=['tag-1'], sg='sg-2'),
+            make_instance(4, vxnets=[], image='img-2'),
+        ])
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, Inventory, 'unknown')
+        self.assertRaises(ValueError, Inventory, 'instance', indexes=['color'])
+        self.assertRaises(ValueError, self.inventory.ids, color='red')
+        self.assertRaises(ValueError, self.inventory.lookup, 'color', 'red')
+
+    def test_get(self):
+        inventory = self.inventory
+        self.assertEqual(len(inventory), 4)
+        self.assertIn('i-0001', inventory)
+        self.assertEqual(inventory.get('i-0002')['tags'][1]['tag_id'], 'tag-2')
+        self.assertIsNone(inventory.get('i-9999'))
+        self.assertEqual(len(list(inventory)), 4)
+
+    def test_lookup(self):
+        inventory = self.inventory
+        self.assertEqual(inventory.lookup('vxnet', 'vxnet-0'),
+                         set(['i-0001', 'i-0002', 'i-0003']))
+        self.assertEqual(inventory.lookup('security_group', 'sg-2'), set(['i-0003']))
+        self.assertEqual(inventory.lookup('image', 'img-2'), set(['i-0004']))
+        self.assertEqual(inventory.lookup('owner', 'usr-1'), set(inventory.ids()))
+        self.assertEqual(inventory.lookup('tag', 'tag-9'), set())
+
+    def test_query(self):
+        inventory = self.inventory
+        self.assertEqual(inventory.ids(vxnet='vxnet-0', tag='tag-1', status='running'),
+                         set(['i-0001', 'i-0002']))
+        self.assertEqual(inventory.ids(tag=['tag-2', 'tag-9'], status=None),
+                         set(['i-0002']))
+        self.assertEqual(inventory.ids(status=['running', 'stopped'], image='img-1'),
+                         set(['i-0001', 'i-0002', 'i-0003']))
+        self.assertEqual(inventory.ids(vxnet='vxnet-a', status='stopped'), set())
+        self.assertEqual(inventory.ids(vxnet='vxnet-x'), set())
+        items = inventory.query(tag='tag-1', security_group='sg-2')
+        self.assertEqual([i['instance_id'] for i in items], ['i-0003'])
+
+    def test_update_reindexes(self):
+        inventory = self.inventory
+        inventory.add(make_instance(1, status='stopped', vxnets=['vxnet-b']))
+        self.assertEqual(len(inventory), 4)
+        self.assertEqual(inventory.ids(status='stopped'), set(['i-0001', 'i-0003']))
+        self.assertNotIn('i-0001', inventory.lookup('vxnet', 'vxnet-0'))
+        self.assertEqual(inventory.lookup('vxnet', 'vxnet-b'), set(['i-0001']))
+        # empty keys are dropped
+        self.assertNotIn('vxnet-a', inventory.indexes['vxnet'])
+
+        self.assertEqual(inventory.remove('i-0003')['status'], 'stopped')
+        self.assertIsNone(inventory.remove('i-0003'))
+        self.assertEqual(inventory.ids(status='stopped'), set(['i-0001']))
+        self.assertNotIn('sg-2', inventory.indexes['security_group'])
+
+        inventory.clear()
+        self.assertEqual(len(inventory), 0)
+        self.assertEqual(inventory.ids(status='running'), set())
+
+    def test_selected_indexes(self):
+        inventory = Inventory('instance', indexes=['status'])
+        inventory.update([make_instance(1)])
+        self.assertEqual(list(inventory.indexes), ['status'])
+        self.assertEqual(inventory.ids(status='running'), set(['i-0001']))
+
+    def test_models(self):
+        inventory = Inventory('instance')
+        inventory.update(to_models({'instance_set': [
+            make_instance(1, tags=['tag-1'])]}, 'instance_set'))
+        self.assertEqual(inventory.ids(tag='tag-1', vxnet='vxnet-0'), set(['i-0001']))
+
+    def test_own_id_is_not_indexed(self):
+        inventory = Inventory('vxnet')
+        inventory.update([{'vxnet_id': 'vxnet-1', 'router_id': 'rtr-1',
+                           'owner': 'usr-1'}])
+        self.assertEqual(inventory.indexes['vxnet'], {})
+        nics = Inventory('nic')
+        nics.update([{'nic_id': '52:54:00:00:00:01', 'vxnet_id': 'vxnet-1',
+                      'security_group_id': 'sg-1'}])
+        self.assertEqual(nics.ids(vxnet='vxnet-1', security_group='sg-1'),
+                         set(['52:54:00:00:00:01']))
+
+
+class InventoryLoadTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.conn = APIConnection('access_key_id', 'secret_access_key', 'zone')
+        self.fake = FakeDescribe([make_instance(i) for i in range(250)])
+        self.conn.send_request = Mock(side_effect=self.fake)
+
+    def tearDown(self):
+        self.conn.shutdown()
+
+    def test_load(self):
+        inventory = Inventory('instance')
+        inventory.add(make_instance(999))
+        self.assertEqual(inventory.load(self.conn, verbose=1), 250)
+        self.assertEqual(len(inventory), 251)
+        _, body = self.conn.send_request.call_args[0]
+        self.assertEqual(body['verbose'], 1)
+
+        self.fake.instances = self.fake.instances[:200]
+        self.assertEqual(inventory.load(self.conn, replace=True), 200)
+        self.assertEqual(len(inventory), 200)
+        self.assertNotIn('i-0999', inventory)
+        self.assertEqual(len(inventory.ids(status='running')), 200)
+
+    def test_load_without_lock(self):
+        inventory = Inventory('instance')
+        inventory.add(make_instance(999))
+        states = []
+
+        def describe(action, body):
+            states.append((inventory.lock.locked(), len(inventory)))
+            if body['offset'] == 100:
+                inventory.add(make_instance(888))
+            return self.fake(action, body)
+        self.conn.send_request = Mock(side_effect=describe)
+        self.assertEqual(inventory.load(self.conn, replace=True, prefetch=False), 250)
+        # each page is added before the next one is fetched
+        self.assertEqual(states, [(False, 1), (False, 101), (False, 202)])
+        self.assertNotIn('i-0999', inventory)
+        self.assertIn('i-0888', inventory)
+        self.assertEqual(len(inventory), 251)
+
+    def test_refresh(self):
+        inventory = Inventory('instance')
+        inventory.load(self.conn)
+        self.conn.send_request.reset_mock()
+
+        self.fake.instances[5]['status'] = 'stopped'
+        del self.fake.instances[7]
+        ids = ['i-%04d' % i for i in range(150)]
+        self.assertEqual(inventory.refresh(self.conn, ids, verbose=1), 149)
+        self.assertEqual(self.conn.send_request.call_count, 2)
+        _, body = self.conn.send_request.call_args_list[0][0]
+        self.assertEqual(len(body['instances']), 100)
+        self.assertEqual(body['verbose'], 1)
+        self.assertEqual(inventory.ids(status='stopped'), set(['i-0005']))
+        self.assertNotIn('i-0007', inventory)
+        self.assertEqual(len(inventory), 249)
+
+    def test_refresh_failed(self):
+        inventory = Inventory('instance')
+        self.conn.send_request = Mock(return_value={'ret_code': 1400,
+                                                    'message': 'denied'})
+        self.assertRaises(APIError, inventory.refresh, self.conn, ['i-0001'])
@@ -0,0 +1,115 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from mock import Mock
+
+from petaexpress.iaas.connection import APIConnection
+from petaexpress.iaas.inventory_cache import InventoryCache
+
+from tests import FakeDescribe, make_instance
+
+
+class InventoryCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'inventory.db')
+        self.conn = APIConnection('access_key_id', 'secret_access_key', 'zone')
+        self.fake = FakeDescribe([make_instance(i) for i in range(150)],
+                                 verbose_keys=['vxnets'])
+        self.conn.send_request = Mock(side_effect=self.fake)
+
+    def tearDown(self):
+        self.conn.shutdown()
+        shutil.rmtree(self.tmpdir)
+
+    def test_first_sync(self):
+        with InventoryCache(self.path, 'zone') as cache:
+            self.assertIsNone(cache.last_sync('instance'))
+            self.assertEqual(cache.sync(self.conn, 'instance'),
+                             {'added': 150, 'updated': 0, 'removed': 0})
+            self.assertIsNotNone(cache.last_sync('instance'))
+            self.assertTrue(all(body['verbose'] == 1 for body in self.fake.calls))
+            self.assertEqual(len(cache.items('instance')), 150)
+            self.assertEqual(cache.get('instance', 'i-0001'), make_instance(1))
+            self.assertIsNone(cache.get('instance', 'i-9999'))
+            self.assertEqual(cache.items('volume'), [])
+
+    def test_delta_sync(self):
+        with InventoryCache(self.path, 'zone') as cache:
+            cache.sync(self.conn, 'instance')
+
+        self.fake.instances[3] = make_instance(3, status='stopped',
+                                               status_time='2026-01-02T00:00:00Z')
+        del self.fake.instances[5]
+        self.fake.instances.append(make_instance(500))
+        self.fake.calls = []
+        # persisted across opens
+        with InventoryCache(self.path, 'zone') as cache:
+            self.assertEqual(cache.sync(self.conn, 'instance'),
+                             {'added': 1, 'updated': 1, 'removed': 1})
+            details = [body for body in self.fake.calls if 'instances' in body]
+            self.assertEqual(len(details), 1)
+            self.assertEqual(details[0]['instances'], ['i-0003', 'i-0500'])
+            self.assertEqual(details[0]['verbose'], 1)
+            listing = [body for body in self.fake.calls if 'instances' not in body]
+            self.assertFalse(any(body.get('verbose') for body in listing))
+
+            self.assertEqual(len(cache.items('instance')), 150)
+            self.assertIsNone(cache.get('instance', 'i-0005'))
+            self.assertEqual(cache.get('instance', 'i-0003')['status'], 'stopped')
+            # the details are kept
+            self.assertEqual(cache.get('instance', 'i-0500')['vxnets'],
+                             [{'vxnet_id': 'vxnet-0'}])
+
+            inventory = cache.inventory('instance')
+            self.assertEqual(inventory.ids(status='stopped'), set(['i-0003']))
+            self.assertEqual(len(inventory.ids(vxnet='vxnet-0')), 150)
+
+            self.assertEqual(cache.sync(self.conn, 'instance'),
+                             {'added': 0, 'updated': 0, 'removed': 0})
+            self.assertEqual(cache.sync(self.conn, 'instance', full=True),
+                             {'added': 0, 'updated': 150, 'removed': 0})
+
+    def test_deleted_while_syncing(self):
+        cache = InventoryCache(':memory:', 'zone')
+        cache.sync(self.conn, 'instance')
+        self.fake.instances[0] = make_instance(0, status_time='2026-01-02T00:00:00Z')
+        fake = self.fake
+
+        def send_request(action, body):
+            if 'instances' in body:
+                fake.instances = fake.instances[1:]
+            return fake(action, body)
+        self.conn.send_request = Mock(side_effect=send_request)
+        self.assertEqual(cache.sync(self.conn, 'instance'),
+                         {'added': 0, 'updated': 0, 'removed': 1})
+        self.assertIsNone(cache.get('instance', 'i-0000'))
+
+    def test_zones(self):
+        with InventoryCache(self.path, 'zone') as cache:
+            cache.sync(self.conn, 'instance')
+        with InventoryCache(self.path, 'other') as cache:
+            self.assertEqual(cache.items('instance'), [])
+            self.assertIsNone(cache.last_sync('instance'))
+            self.assertRaises(ValueError, cache.sync, self.conn, 'instance')
+            self.assertRaises(ValueError, cache.items, 'unknown')
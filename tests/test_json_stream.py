@@ -0,0 +1,93 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+import json
+import unittest
+from io import BytesIO
+
+from petaexpress.misc.json_stream import ItemSetParser, ResponseStream
+
+
+def feed_by(parser, data, size):
+    items = []
+    for i in range(0, len(data), size):
+        items += parser.feed(data[i:i + size])
+    return items
+
+
+class ItemSetParserTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.resp = {
+            'action': 'DescribeInstancesResponse',
+            'instance_set': [{'instance_id': 'i-%d' % i, 'cpu': i, 'ok': True,
+                              'vxnets': [{'vxnet_id': 'vxnet-0'}], 'name': u'你好'}
+                             for i in range(20)],
+            'total_count': 20,
+            'ret_code': 0,
+        }
+        self.data = json.dumps(self.resp, ensure_ascii=False).encode('utf-8')
+
+    def test_every_chunk_size(self):
+        for size in (1, 2, 3, 7, 64, len(self.data)):
+            parser = ItemSetParser()
+            self.assertEqual(feed_by(parser, self.data, size), self.resp['instance_set'])
+            self.assertEqual(parser.close(), {'action': 'DescribeInstancesResponse',
+                                              'total_count': 20, 'ret_code': 0})
+
+    def test_items_yielded_early(self):
+        parser = ItemSetParser()
+        half = self.data.index(b'"i-10"')
+        self.assertEqual(len(parser.feed(self.data[:half])), 10)
+
+    def test_fields(self):
+        parser = ItemSetParser(fields=['instance_id', 'vxnets'])
+        items = feed_by(parser, self.data, 5)
+        self.assertEqual(items[3], {'instance_id': 'i-3', 'vxnets': [{'vxnet_id': 'vxnet-0'}]})
+
+    def test_item_set_key(self):
+        data = b'{"ret_code":0,"tags":[1,2],"instance_set":[{"instance_id":"i-1"}]}'
+        parser = ItemSetParser(item_set_key='tags')
+        self.assertEqual(feed_by(parser, data, 3), [1, 2])
+        self.assertEqual(parser.close()['instance_set'], [{'instance_id': 'i-1'}])
+
+    def test_error_response(self):
+        parser = ItemSetParser()
+        self.assertEqual(parser.feed(b'{"ret_code":1400,"message":"bad"}'), [])
+        self.assertEqual(parser.close(), {'ret_code': 1400, 'message': 'bad'})
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, ItemSetParser().feed, b'[1, 2]')
+        self.assertRaises(ValueError, ItemSetParser().feed, b'{"a" 1}')
+        parser = ItemSetParser()
+        parser.feed(self.data[:-10])
+        self.assertRaises(ValueError, parser.close)
+
+
+class ResponseStreamTestCase(unittest.TestCase):
+
+    def test_stream(self):
+        heads = []
+        data = b'{"ret_code":0,"volume_set":[{"volume_id":"vol-1"},{"volume_id":"vol-2"}]}'
+        stream = ResponseStream(BytesIO(data), chunk_size=4, check=heads.append)
+        self.assertEqual([v['volume_id'] for v in stream], ['vol-1', 'vol-2'])
+        self.assertEqual(stream.head, {'ret_code': 0})
+        self.assertEqual(heads, [{'ret_code': 0}])
+
+
+if __name__ == '__main__':
+    unittest.main()
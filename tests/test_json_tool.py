@@ -15,7 +15,10 @@
 # =========================================================================
 
 import unittest
-from petaexpress.misc.json_tool import json_dump, json_load
+from petaexpress.misc import json_tool
+from petaexpress.misc.json_tool import (json_dump, json_load, JsonCodec,
+                                       register_codec, set_codec, get_codec,
+                                       available_codecs)
 
 
 class JsonToolTestCase(unittest.TestCase):
@@ -45,7 +48,76 @@ class JsonToolTestCase(unittest.TestCase):
         expected = {'int': 1, 'str': 'string', 'none': None}
         self.assertEqual(json_load(string), expected)
 
+    def test_json_load_bytes(self):
+        string = b'{"str":"\xe4\xbd\xa0\xe5\xa5\xbd"}'
+        self.assertEqual(json_load(string), {'str': u'\u4f60\u597d'})
+
+    def test_json_load_fallback(self):
+        # not accepted by every backend
+        obj = json_load('{"nan":NaN}')
+        self.assertNotEqual(obj['nan'], obj['nan'])
+
     def test_json_load_invalid_string(self):
         string = '{"int":1,:null,"str":"string"}'
         expected = None
         self.assertEqual(json_load(string), expected)
+
+    def test_json_load_raise_error(self):
+        self.assertRaises(ValueError, json_load, '{"int":1,:null}', raise_error=True)
+        self.assertEqual(json_load('[1]', raise_error=True), [1])
+
+    def test_json_dump_raise_error(self):
+        self.assertRaises(TypeError, json_dump, {'a': unittest}, raise_error=True)
+
+    def test_json_dump_fallback(self):
+        big = 123456789012345678901234567890
+        self.assertEqual(json_dump({'big': big}), '{"big":%d}' % big)
+        self.assertEqual(json_dump({'a': [1]}, indent=4), '{\n    "a":[\n        1\n    ]\n}')
+
+
+class JsonCodecTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.codec = get_codec()
+
+    def tearDown(self):
+        json_tool._codecs.pop('fake', None)
+        set_codec('json')
+        set_codec(self.codec.name, dump=False)
+
+    def test_available_codecs(self):
+        self.assertEqual(available_codecs()[-1], 'json')
+        self.assertEqual(self.codec.name, available_codecs()[0])
+
+    def test_every_codec(self):
+        obj = {'b': [1, None], 'a': u'\u4f60'}
+        for name in available_codecs():
+            set_codec(name)
+            self.assertEqual(json_load(json_dump(obj)), obj)
+            self.assertTrue(json_dump(obj).startswith('{"a":'))
+            self.assertEqual(json_load(b'{"a":[1.5,true]}'), {'a': [1.5, True]})
+
+    def test_dump_with_stdlib_by_default(self):
+        obj = {'a': u'\u4f60', 'b': 1.0, 'c': float('nan')}
+        expected = '{"a":"\\u4f60","b":1.0,"c":NaN}'
+        self.assertEqual(json_tool.STDLIB_CODEC.dumps(obj), expected)
+        for name in available_codecs():
+            set_codec(name, dump=False)
+            self.assertEqual(get_codec().name, name)
+            self.assertIs(get_codec(dump=True), json_tool.STDLIB_CODEC)
+            self.assertEqual(json_dump(obj), expected)
+
+    def test_auto_selected_for_load_only(self):
+        self.assertEqual(self.codec.name, available_codecs()[0])
+        self.assertIs(get_codec(dump=True), json_tool.STDLIB_CODEC)
+
+    def test_set_unknown_codec(self):
+        self.assertRaises(ValueError, set_codec, 'unknown')
+
+    def test_register_codec(self):
+        codec = JsonCodec('fake', lambda s: 'loaded', lambda obj, indent: 'dumped')
+        register_codec(codec, preferred=True)
+        self.assertEqual(json_load('{}'), 'loaded')
+        self.assertEqual(json_dump({}), 'dumped')
+        set_codec('json')
+        self.assertEqual(json_load('{}'), {})
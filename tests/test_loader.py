@@ -0,0 +1,93 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+import threading
+import time
+import unittest
+
+from mock import Mock
+
+from petaexpress.iaas.connection import APIConnection
+from petaexpress.iaas.errors import APIError
+from petaexpress.iaas.loader import DescribeLoader
+
+
+def describe_volumes(action, body):
+    return {'ret_code': 0, 'action': 'DescribeVolumesResponse',
+            'volume_set': [{'volume_id': v} for v in body['volumes'] if v != 'vol-missing'],
+            'total_count': len(body['volumes'])}
+
+
+class DescribeLoaderTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.conn = APIConnection('access_key_id', 'secret_access_key', 'zone')
+        self.conn.send_request = Mock(side_effect=describe_volumes)
+
+    def tearDown(self):
+        self.conn.shutdown()
+
+    def test_unknown_type(self):
+        self.assertRaises(ValueError, DescribeLoader, self.conn, 'unknown')
+
+    def test_batch_within_window(self):
+        loader = DescribeLoader(self.conn, 'volume', window=0.05, verbose=1)
+        futures = loader.load_many(['vol-1', 'vol-2', 'vol-1', 'vol-missing'])
+        results = [f.result(1) for f in futures]
+        self.assertEqual(results, [{'volume_id': 'vol-1'}, {'volume_id': 'vol-2'},
+                                   {'volume_id': 'vol-1'}, None])
+        self.assertEqual(self.conn.send_request.call_count, 1)
+        action, body = self.conn.send_request.call_args[0]
+        self.assertEqual(action, 'DescribeVolumes')
+        self.assertEqual(body['volumes'], ['vol-1', 'vol-2', 'vol-missing'])
+        self.assertEqual(body['verbose'], 1)
+        self.assertEqual(body['limit'], 3)
+
+    def test_batch_max_size(self):
+        loader = DescribeLoader(self.conn, 'volume', max_batch=10, window=10)
+        start = time.time()
+        futures = loader.load_many(['vol-%d' % i for i in range(25)])
+        [f.result(1) for f in futures[:20]]
+        self.assertLess(time.time() - start, 1)
+        self.assertEqual(self.conn.send_request.call_count, 2)
+        loader.flush()
+        self.assertEqual(futures[-1].result(1), {'volume_id': 'vol-24'})
+        self.assertEqual(self.conn.send_request.call_count, 3)
+
+    def test_concurrent_callers(self):
+        loader = DescribeLoader(self.conn, 'volume', window=0.05)
+        results = {}
+
+        def worker(i):
+            results[i] = loader.get('vol-%d' % i, timeout=1)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(50)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(results[7], {'volume_id': 'vol-7'})
+        self.assertLessEqual(self.conn.send_request.call_count, 2)
+
+    def test_error(self):
+        self.conn.send_request = Mock(return_value={'ret_code': 1400, 'message': 'bad'})
+        loader = DescribeLoader(self.conn, 'volume', window=0.01)
+        self.assertRaises(APIError, loader.get, 'vol-1', 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
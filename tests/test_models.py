@@ -0,0 +1,97 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+import pickle
+import unittest
+
+from petaexpress.iaas.models import (Instance, Volume, Tag, ImageRef,
+                                     get_model_class, iter_models, to_models)
+
+from tests import make_instance
+
+
+def make_verbose_instance(i):
+    return make_instance(
+        i, image={'image_id': 'img-1', 'platform': 'linux'},
+        vxnets=[{'vxnet_id': 'vxnet-0', 'private_ip': '10.0.0.%d' % i}],
+        tags=[{'tag_id': 'tag-1', 'tag_name': 'prod'}],
+        volume_ids=['vol-%d' % i], unknown_field={'a': [1, 2]})
+
+
+class ModelTestCase(unittest.TestCase):
+
+    def test_fields(self):
+        instance = Instance.from_dict(make_verbose_instance(1))
+        self.assertEqual(instance.instance_id, 'i-0001')
+        self.assertEqual(instance['status'], 'running')
+        self.assertIsNone(instance.description)
+        self.assertIsNone(instance.get('description'))
+        self.assertEqual(instance.get('description', 'default'), 'default')
+        self.assertNotIn('description', instance)
+        self.assertRaises(KeyError, lambda: instance['description'])
+        self.assertRaises(AttributeError, getattr, instance, 'no_such_field')
+        self.assertEqual(instance.volume_ids, ('vol-1',))
+
+    def test_unknown_fields(self):
+        instance = Instance.from_dict(make_verbose_instance(1))
+        self.assertEqual(instance.unknown_field, {'a': (1, 2)})
+        self.assertIn('unknown_field', instance)
+        self.assertFalse(hasattr(instance, '__dict__'))
+
+    def test_nested(self):
+        instance = Instance.from_dict(make_verbose_instance(1))
+        self.assertIsInstance(instance.image, ImageRef)
+        self.assertEqual(instance.image.platform, 'linux')
+        self.assertEqual(instance.vxnets[0].private_ip, '10.0.0.1')
+        self.assertIsInstance(instance.tags[0], Tag)
+
+    def test_to_dict(self):
+        item = make_verbose_instance(1)
+        self.assertEqual(Instance.from_dict(item).to_dict(), item)
+
+    def test_read_only(self):
+        instance = Instance.from_dict(make_verbose_instance(1))
+        self.assertRaises(AttributeError, setattr, instance, 'status', 'stopped')
+
+    def test_equal(self):
+        self.assertEqual(Instance.from_dict(make_verbose_instance(1)),
+                         Instance.from_dict(make_verbose_instance(1)))
+        self.assertNotEqual(Instance.from_dict(make_verbose_instance(1)),
+                            Instance.from_dict(make_verbose_instance(2)))
+
+    def test_pickle(self):
+        instance = Instance.from_dict(make_verbose_instance(1))
+        self.assertEqual(pickle.loads(pickle.dumps(instance, 2)), instance)
+
+    def test_shared_nested(self):
+        a, b = iter_models([make_verbose_instance(1), make_verbose_instance(2)], Instance)
+        self.assertIs(a.image, b.image)
+        self.assertIs(a.tags[0], b.tags[0])
+        self.assertIsNot(a.vxnets[0], b.vxnets[0])
+
+    def test_to_models(self):
+        resp = {'ret_code': 0, 'total_count': 2,
+                'volume_set': [{'volume_id': 'vol-1'}, {'volume_id': 'vol-2'}]}
+        volumes = to_models(resp)
+        self.assertEqual([v.volume_id for v in volumes], ['vol-1', 'vol-2'])
+        self.assertIsInstance(volumes[0], Volume)
+        self.assertIs(get_model_class('instance_set'), Instance)
+        self.assertRaises(ValueError, to_models, {'ret_code': 0})
+
+
+if __name__ == '__main__':
+    unittest.main()
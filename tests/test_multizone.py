@@ -0,0 +1,127 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+import threading
+import time
+import unittest
+
+from mock import patch
+
+from petaexpress.iaas.connection import APIConnection
+from petaexpress.iaas.errors import APIError, WaitTimeoutError
+from petaexpress.iaas.multizone import MultiZoneConnection, merge_describe
+
+
+class FakeZones(object):
+
+    def __init__(self, sizes, slow=(), failed=()):
+        self.sizes = sizes
+        self.slow = slow
+        self.failed = failed
+        self.released = threading.Event()
+        self.pools = set()
+
+    def __call__(self, conn, request, url, verb):
+        self.pools.add(id(conn._conn))
+        zone = request.get('zone')
+        if request['action'] == 'DescribeZones':
+            return {'ret_code': 0, 'zone_set': [
+                {'zone_id': z, 'status': 'active'} for z in sorted(self.sizes)] + [
+                {'zone_id': 'old', 'status': 'faulty'}]}
+        if zone in self.slow:
+            self.released.wait(5)
+        if zone in self.failed:
+            return {'ret_code': 5100, 'message': 'busy'}
+        offset, limit = request.get('offset', 0), request.get('limit', 100)
+        total = self.sizes[zone]
+        return {'ret_code': 0, 'total_count': total, 'volume_set': [
+            {'volume_id': 'vol-%s-%d' % (zone, i)}
+            for i in range(offset, min(offset + limit, total))]}
+
+
+class MultiZoneConnectionTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.fake = FakeZones({'pek3a': 3, 'sh1a': 2, 'gd2': 150})
+        patcher = patch.object(APIConnection, '_send_request', autospec=True,
+                               side_effect=self.fake)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.conn = MultiZoneConnection('access_key_id', 'secret_access_key')
+
+    def tearDown(self):
+        self.fake.released.set()
+        self.conn.shutdown()
+
+    def test_zones(self):
+        self.assertEqual(self.conn.zones(), ['gd2', 'pek3a', 'sh1a'])
+        conn = MultiZoneConnection('access_key_id', 'secret_access_key',
+                                   zones=['pek3a'])
+        self.assertEqual(conn.zones(), ['pek3a'])
+
+    def test_shared_pool(self):
+        self.conn.describe('describe_volumes')
+        self.assertIs(self.conn.connection('pek3a')._conn, self.conn.pool)
+        self.assertIs(self.conn.connection('pek3a'), self.conn.connection('pek3a'))
+        self.assertEqual(self.fake.pools, set([id(self.conn.pool)]))
+
+    def test_describe(self):
+        ret = self.conn.describe('describe_volumes', limit=10)
+        self.assertEqual(ret['total_count'], 155)
+        self.assertEqual(len(ret['volume_set']), 15)
+        self.assertEqual(ret['failed_zones'], {})
+        for volume in ret['volume_set']:
+            self.assertIn(volume['zone_id'], volume['volume_id'])
+
+    def test_describe_all_pages(self):
+        ret = self.conn.describe('describe_volumes', zones=['gd2', 'sh1a'],
+                                 all_pages=True)
+        self.assertEqual(len(ret['volume_set']), 152)
+        self.assertEqual(ret['total_count'], 152)
+
+    def test_failed_zone(self):
+        self.fake.failed = ['sh1a']
+        ret = self.conn.describe('describe_volumes')
+        self.assertEqual(list(ret['failed_zones']), ['sh1a'])
+        self.assertIsInstance(ret['failed_zones']['sh1a'], APIError)
+        self.assertEqual(len(ret['volume_set']), 103)
+
+    def test_slow_zone(self):
+        self.fake.slow = ['gd2']
+        start = time.time()
+        ret = self.conn.describe('describe_volumes', timeout=0.2)
+        self.assertLess(time.time() - start, 2)
+        self.assertIsInstance(ret['failed_zones']['gd2'], WaitTimeoutError)
+        self.assertEqual(len(ret['volume_set']), 5)
+
+    def test_call(self):
+        results = self.conn.call('describe_volumes', zones=['pek3a', 'sh1a'])
+        self.assertEqual(sorted(results), ['pek3a', 'sh1a'])
+        self.assertEqual(results['sh1a']['total_count'], 2)
+        self.assertEqual(self.conn.call('describe_volumes', zones=[]), {})
+
+
+class MergeDescribeTestCase(unittest.TestCase):
+
+    def test_items_not_modified(self):
+        resp = {'ret_code': 0, 'total_count': 1,
+                'volume_set': [{'volume_id': 'vol-1'}]}
+        ret = merge_describe('describe_volumes', {'pek3a': resp},
+                             'zone_id', 'failed_zones')
+        self.assertEqual(ret['volume_set'],
+                         [{'volume_id': 'vol-1', 'zone_id': 'pek3a'}])
+        self.assertEqual(resp['volume_set'], [{'volume_id': 'vol-1'}])
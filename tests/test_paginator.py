@@ -0,0 +1,172 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+import threading
+import unittest
+
+from mock import Mock
+
+from petaexpress.iaas.connection import APIConnection
+from petaexpress.iaas.errors import APIError
+from petaexpress.iaas.paginator import DescribePaginator, get_item_set_key
+
+from tests import FakeDescribe, make_instance
+
+
+def make_fake(count):
+    return FakeDescribe([make_instance(i) for i in range(count)])
+
+
+class DescribePaginatorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.conn = APIConnection('access_key_id', 'secret_access_key', 'zone')
+
+    def tearDown(self):
+        self.conn.shutdown()
+
+    def test_get_item_set_key(self):
+        self.assertEqual(get_item_set_key('describe_instances',
+                                          {'instance_set': [], 'total_count': 0}),
+                         'instance_set')
+        self.assertEqual(get_item_set_key('describe_vxnet_instances',
+                                          {'instance_set': [], 'vxnet_set': []}),
+                         'instance_set')
+        self.assertIsNone(get_item_set_key('describe_zones', {'ret_code': 0}))
+
+    def test_iter_describe(self):
+        fake = make_fake(250)
+        self.conn.send_request = Mock(side_effect=fake)
+        items = list(self.conn.iter_describe('describe_instances', page_size=100,
+                                             status=['running']))
+        self.assertEqual(items, fake.instances)
+        self.assertEqual(fake.offsets, [0, 100, 200])
+        _, body = self.conn.send_request.call_args[0]
+        self.assertEqual(body['status'], ['running'])
+        # following pages are fetched in background
+        self.assertGreater(len(fake.threads), 1)
+
+    def test_iter_describe_without_prefetch(self):
+        fake = make_fake(200)
+        self.conn.send_request = Mock(side_effect=fake)
+        items = list(self.conn.iter_describe('describe_instances', page_size=100,
+                                             prefetch=False))
+        self.assertEqual(len(items), 200)
+        self.assertEqual(fake.offsets, [0, 100])
+        self.assertEqual(fake.threads, set([threading.current_thread().name]))
+
+    def test_pages_offset(self):
+        fake = make_fake(30)
+        self.conn.send_request = Mock(side_effect=fake)
+        paginator = DescribePaginator(self.conn, 'describe_instances',
+                                      limit=10, offset=10)
+        pages = list(paginator.pages())
+        self.assertEqual(len(pages), 2)
+        self.assertEqual(paginator.total_count, 30)
+
+    def test_short_pages(self):
+        fake = make_fake(250)
+
+        def send_request(action, body):
+            # the server may return fewer items than the limit
+            return fake(action, dict(body, limit=min(body['limit'], 60)))
+        self.conn.send_request = Mock(side_effect=send_request)
+        items = list(self.conn.iter_describe('describe_instances', page_size=100))
+        self.assertEqual(items, fake.instances)
+        self.assertEqual(fake.offsets, [0, 60, 120, 180, 240])
+
+    def test_page_size_clamped(self):
+        fake = make_fake(250)
+        self.conn.send_request = Mock(side_effect=fake)
+        paginator = DescribePaginator(self.conn, 'describe_instances',
+                                      page_size=500, parallel=4)
+        self.assertEqual(paginator.page_size, 100)
+        self.assertEqual(list(paginator), fake.instances)
+
+    def test_parallel(self):
+        fake = make_fake(1050)
+        self.conn.send_request = Mock(side_effect=fake)
+        paginator = DescribePaginator(self.conn, 'describe_instances',
+                                      page_size=100, parallel=4)
+        self.assertEqual(list(paginator), fake.instances)
+        self.assertEqual(sorted(fake.offsets), list(range(0, 1100, 100)))
+        self.assertFalse(paginator.drifted)
+
+    def test_parallel_streamed(self):
+        fake = make_fake(1050)
+        self.conn.send_request = Mock(side_effect=fake)
+        paginator = DescribePaginator(self.conn, 'describe_instances',
+                                      page_size=100, parallel=3)
+        fetched = []
+        for resp in paginator.pages():
+            fetched.append(len(fake.offsets))
+        self.assertEqual(len(fetched), 11)
+        # pages are yielded before the last ones are fetched, with at
+        # most `parallel` requests ahead
+        self.assertLess(fetched[0], 11)
+        for i, count in enumerate(fetched):
+            self.assertLessEqual(count, i + 1 + 3)
+
+    def test_parallel_drift(self):
+        fake = make_fake(300)
+        old = list(fake.instances)
+        served = threading.Event()
+        inserted = []
+
+        def send_request(action, body):
+            if body['offset'] == 200 and not inserted:
+                served.wait(5)
+                # new instances show up at the head during the scan
+                fake.instances[:0] = [{'instance_id': 'i-new%d' % i} for i in range(20)]
+                inserted.append(True)
+            resp = fake(action, body)
+            if body['offset'] == 100:
+                served.set()
+            return resp
+        self.conn.send_request = Mock(side_effect=send_request)
+        paginator = DescribePaginator(self.conn, 'describe_instances',
+                                      page_size=100, parallel=2)
+        items = list(paginator)
+        # the windows from the one reporting the change are fetched again
+        self.assertEqual(items[:200], old[:200])
+        self.assertEqual(items[200:], fake.instances[200:])
+        self.assertEqual(fake.offsets.count(200), 2)
+        self.assertEqual(paginator.total_count, 320)
+        # the windows already yielded were fetched before the change
+        self.assertTrue(paginator.drifted)
+
+    def test_parallel_keep_drifting(self):
+        fake = make_fake(300)
+
+        def send_request(action, body):
+            fake.instances.append({'instance_id': 'i-more'})
+            return fake(action, body)
+        self.conn.send_request = Mock(side_effect=send_request)
+        paginator = DescribePaginator(self.conn, 'describe_instances',
+                                      page_size=100, parallel=4)
+        list(paginator)
+        self.assertTrue(paginator.drifted)
+
+    def test_error(self):
+        self.conn.send_request = Mock(return_value={'ret_code': 1400,
+                                                    'message': 'invalid'})
+        with self.assertRaises(APIError):
+            list(self.conn.iter_describe('describe_instances'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+import threading
+import time
+import unittest
+
+from mock import Mock
+
+from petaexpress.iaas.cache import dump_response, load_response
+from petaexpress.iaas.connection import APIConnection
+from petaexpress.iaas.singleflight import SingleFlight
+
+
+def run_concurrently(count, func):
+    results = [None] * count
+    start = threading.Event()
+
+    def worker(index):
+        start.wait()
+        try:
+            results[index] = func()
+        except Exception as e:
+            results[index] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for t in threads:
+        t.start()
+    start.set()
+    for t in threads:
+        t.join()
+    return results
+
+
+class SingleFlightTestCase(unittest.TestCase):
+
+    def test_coalesce(self):
+        flight = SingleFlight(dump_response, load_response)
+        calls = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.1)
+            return {'ret_code': 0}
+
+        results = run_concurrently(20, lambda: flight.do('key', slow))
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(r == {'ret_code': 0} for r in results))
+        self.assertEqual(len(set(id(r) for r in results)), 20)
+        self.assertEqual(flight.stats(), {'executions': 1, 'shared': 19, 'in_flight': 0})
+
+    def test_error_shared(self):
+        flight = SingleFlight()
+
+        def fail():
+            time.sleep(0.05)
+            raise ValueError('failed')
+
+        results = run_concurrently(5, lambda: flight.do('key', fail))
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+
+    def test_shared_result_without_thaw(self):
+        flight = SingleFlight()
+
+        def slow():
+            time.sleep(0.1)
+            return {'ret_code': 0}
+
+        results = run_concurrently(5, lambda: flight.do('key', slow))
+        self.assertTrue(all(r is results[0] for r in results))
+
+    def test_base_exception_shared(self):
+        flight = SingleFlight()
+        leader = threading.Event()
+
+        def interrupted():
+            leader.set()
+            time.sleep(0.1)
+            raise KeyboardInterrupt()
+
+        def call():
+            try:
+                return flight.do('key', interrupted)
+            except KeyboardInterrupt as e:
+                return e
+
+        thread = threading.Thread(target=call)
+        thread.start()
+        leader.wait()
+        self.assertIsInstance(call(), KeyboardInterrupt)
+        thread.join()
+        self.assertEqual(flight.stats()['in_flight'], 0)
+
+    def test_sequential_calls_not_shared(self):
+        flight = SingleFlight()
+        func = Mock(return_value=1)
+        flight.do('key', func)
+        flight.do('key', func)
+        self.assertEqual(func.call_count, 2)
+
+
+class APIConnectionCoalesceTestCase(unittest.TestCase):
+
+    def test_coalesce_describe(self):
+        conn = APIConnection('access_key_id', 'secret_access_key', 'zone',
+                             coalesce=True)
+
+        def send_request(request, url, verb):
+            time.sleep(0.1)
+            return {'ret_code': 0, 'zone_set': []}
+        conn._send_request = Mock(side_effect=send_request)
+        results = run_concurrently(50, conn.describe_zones)
+        self.assertEqual(conn._send_request.call_count, 1)
+        self.assertEqual(results[0], {'ret_code': 0, 'zone_set': []})
+        # every caller may modify its own response
+        self.assertEqual(len(set(id(r['zone_set']) for r in results)), 50)
+
+    def test_coalesce_decompress(self):
+        conn = APIConnection('access_key_id', 'secret_access_key', 'zone',
+                             coalesce=True)
+        meter_set = [{'meter_id': 'cpu', 'data': [[1500000000, 10], 20]}]
+
+        def send_request(request, url, verb):
+            time.sleep(0.1)
+            return {'ret_code': 0, 'meter_set': meter_set}
+        conn._send_request = Mock(side_effect=send_request)
+        params = dict(resource='i-1', meters=['cpu'], step='5m',
+                      start_time='2017-07-14T02:40:00Z',
+                      end_time='2017-07-14T02:50:00Z')
+        results = run_concurrently(
+            10, lambda: conn.get_monitoring_data(decompress=True, **params))
+        self.assertEqual(conn._send_request.call_count, 1)
+        expected = [[1500000000, 10], [1500000300, 20]]
+        for resp in results:
+            self.assertEqual(resp['meter_set'][0]['data'], expected)
+            resp['meter_set'][0]['data'].append(None)
+        self.assertEqual(len(set(id(r['meter_set']) for r in results)), 10)
+
+    def test_mutations_not_coalesced(self):
+        conn = APIConnection('access_key_id', 'secret_access_key', 'zone',
+                             coalesce=True)
+
+        def send_request(request, url, verb):
+            time.sleep(0.05)
+            return {'ret_code': 0}
+        conn._send_request = Mock(side_effect=send_request)
+        run_concurrently(5, lambda: conn.stop_instances(instances=['i-1']))
+        self.assertEqual(conn._send_request.call_count, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,252 @@
+# =========================================================================
+# Copyright 2012-present RAKSmart, Inc.
+# -------------------------------------------------------------------------
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this work except in compliance with the License.
+# You may obtain a copy of the License in the LICENSE file, or at:
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+
+
+import threading
+import unittest
+
+from mock import Mock
+
+from petaexpress.iaas.errors import WaitFailedError, WaitTimeoutError
+from petaexpress.iaas.waiter import JobWaiter, ResourceWaiter
+
+
+class FakeJobs(object):
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.status = {}
+        self.calls = []
+
+    def describe_jobs(self, jobs, limit=None):
+        with self.lock:
+            self.calls.append(list(jobs))
+            return {'ret_code': 0, 'job_set': [
+                {'job_id': j, 'status': self.status[j]} for j in jobs if j in self.status
+            ]}
+
+
+class JobWaiterTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.jobs = FakeJobs()
+        self.conn = Mock()
+        self.conn.describe_jobs = self.jobs.describe_jobs
+        self.waiter = JobWaiter(self.conn, interval=0.01, max_interval=0.05)
+
+    def tearDown(self):
+        self.waiter.close()
+
+    def test_batched_polling(self):
+        for i in range(250):
+            self.jobs.status['j-%d' % i] = 'successful'
+        # the first round can't start before all the jobs are added
+        with self.waiter.cond:
+            futures = self.waiter.wait_all(['j-%d' % i for i in range(250)],
+                                           timeout=5)
+        results = [f.result(5) for f in futures]
+        self.assertEqual(results[42], {'job_id': 'j-42', 'status': 'successful'})
+        # one round with 3 describe calls
+        self.assertEqual([len(c) for c in self.jobs.calls], [100, 100, 50])
+
+    def test_wait_until_done(self):
+        self.jobs.status['j-1'] = 'working'
+        callback = Mock()
+        future = self.waiter.wait('j-1', timeout=5, callback=callback)
+        self.assertRaises(Exception, future.result, 0.1)
+        self.jobs.status['j-1'] = 'failed'
+        self.assertEqual(future.result(5)['status'], 'failed')
+        callback.assert_called_once_with(future)
+
+    def test_same_job_waited_twice(self):
+        self.jobs.status['j-1'] = 'successful'
+        futures = [self.waiter.wait('j-1', timeout=5) for _ in range(2)]
+        self.assertEqual([f.result(5)['job_id'] for f in futures], ['j-1', 'j-1'])
+
+    def test_timeout(self):
+        self.jobs.status['j-1'] = 'pending'
+        future = self.waiter.wait('j-1', timeout=0.05)
+        self.assertRaises(WaitTimeoutError, future.result, 5)
+
+    def test_timeout_per_wait(self):
+        self.jobs.status['j-1'] = 'pending'
+        short = self.waiter.wait('j-1', timeout=0.05)
+        long = self.waiter.wait('j-1', timeout=5)
+        self.assertRaises(WaitTimeoutError, short.result, 5)
+        self.assertFalse(long.done())
+        self.jobs.status['j-1'] = 'successful'
+        self.assertEqual(long.result(5)['status'], 'successful')
+
+    def test_as_completed(self):
+        self.jobs.status['j-1'] = 'working'
+        self.jobs.status['j-2'] = 'successful'
+        futures = self.waiter.wait_all(['j-1', 'j-2'], timeout=5)
+        first = next(self.waiter.as_completed(futures, timeout=5))
+        self.assertEqual(first.result()['job_id'], 'j-2')
+        self.jobs.status['j-1'] = 'successful'
+        futures[0].result(5)
+
+    def test_describe_error(self):
+        self.conn.describe_jobs = Mock(side_effect=[IOError('timeout'),
+                                                    {'ret_code': 0, 'job_set': [
+                                                        {'job_id': 'j-1', 'status': 'successful'}]}])
+        future = self.waiter.wait('j-1', timeout=5)
+        self.assertEqual(future.result(5)['status'], 'successful')
+
+    def test_job_without_status(self):
+        self.jobs.status['j-2'] = 'successful'
+        self.conn.describe_jobs = Mock(return_value={'ret_code': 0, 'job_set': [
+            {'job_id': 'j-1'}, {'job_id': 'j-2', 'status': 'successful'}]})
+        futures = self.waiter.wait_all(['j-1', 'j-2'], timeout=5)
+        self.assertRaises(KeyError, futures[0].result, 5)
+        self.assertEqual(futures[1].result(5)['status'], 'successful')
+
+    def test_unexpected_error(self):
+        self.jobs.status['j-1'] = 'successful'
+        describe = self.waiter._describe
+        self.waiter._describe = Mock(side_effect=ValueError('bug'))
+        future = self.waiter.wait('j-1', timeout=5)
+        self.assertRaises(ValueError, future.result, 5)
+        self.assertEqual(self.waiter.pending, {})
+        # the thread keeps polling
+        self.waiter._describe = describe
+        self.assertEqual(self.waiter.wait('j-1', timeout=5).result(5)['status'],
+                         'successful')
+
+    def test_close(self):
+        self.jobs.status['j-1'] = 'working'
+        future = self.waiter.wait('j-1')
+        self.waiter.close()
+        self.assertTrue(future.cancelled())
+        self.assertRaises(RuntimeError, self.waiter.wait, 'j-2')
+
+
+class FakeResources(object):
+
+    def __init__(self):
+        self.status = {}
+        self.calls = []
+
+    def describe(self, id_param, id_key, item_set_key):
+        def method(limit=None, **params):
+            ids = params[id_param]
+            self.calls.append((id_param, list(ids)))
+            return {'ret_code': 0, item_set_key: [
+                dict(self.status[i], **{id_key: i}) for i in ids if i in self.status
+            ]}
+        return method
+
+
+class ResourceWaiterTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.resources = FakeResources()
+        self.conn = Mock()
+        self.conn.describe_instances = self.resources.describe(
+            'instances', 'instance_id', 'instance_set')
+        self.conn.describe_volumes = self.resources.describe(
+            'volumes', 'volume_id', 'volume_set')
+        self.waiter = ResourceWaiter(self.conn, interval=0.01, max_interval=0.05)
+
+    def tearDown(self):
+        self.waiter.close()
+
+    def test_group_by_type(self):
+        for i in range(150):
+            self.resources.status['i-%d' % i] = {'status': 'running'}
+        self.resources.status['vol-1'] = {'status': 'available'}
+        futures = self.waiter.wait_all(['i-%d' % i for i in range(150)], 'running',
+                                       timeout=5)
+        futures.append(self.waiter.wait('vol-1', ['available', 'in-use'], timeout=5))
+        self.assertEqual(futures[0].result(5)['instance_id'], 'i-0')
+        self.assertEqual(futures[-1].result(5)['volume_id'], 'vol-1')
+        self.assertEqual([(p, len(ids)) for p, ids in self.resources.calls],
+                         [('instances', 100), ('instances', 50), ('volumes', 1)])
+
+    def test_wait_transition(self):
+        self.resources.status['i-1'] = {'status': 'pending', 'transition_status': ''}
+        future = self.waiter.wait('i-1', 'running', timeout=5)
+        self.resources.status['i-1'] = {'status': 'running',
+                                        'transition_status': 'starting'}
+        self.assertRaises(Exception, future.result, 0.1)
+        self.resources.status['i-1'] = {'status': 'running', 'transition_status': ''}
+        self.assertEqual(future.result(5)['status'], 'running')
+
+    def test_different_status_of_same_resource(self):
+        self.resources.status['vol-1'] = {'status': 'available'}
+        in_use = self.waiter.wait('vol-1', 'in-use', timeout=0.1)
+        available = self.waiter.wait('vol-1', 'available', timeout=5)
+        self.assertEqual(available.result(5)['status'], 'available')
+        try:
+            in_use.result(5)
+        except WaitTimeoutError as e:
+            self.assertEqual(e.resource_id, 'vol-1')
+        else:
+            self.fail('WaitTimeoutError not raised')
+
+    def test_terminal_status(self):
+        self.resources.status['i-1'] = {'status': 'pending'}
+        self.resources.status['i-2'] = {'status': 'terminated'}
+        running = self.waiter.wait('i-1', 'running', timeout=5)
+        ceased = self.waiter.wait('i-2', 'ceased', timeout=5)
+        self.resources.status['i-1'] = {'status': 'terminated'}
+        try:
+            running.result(1)
+        except WaitFailedError as e:
+            self.assertEqual((e.resource_id, e.status), ('i-1', 'terminated'))
+        else:
+            self.fail('WaitFailedError not raised')
+        # terminated resources become ceased
+        self.assertFalse(ceased.done())
+        self.resources.status['i-2'] = {'status': 'ceased'}
+        self.assertEqual(ceased.result(5)['status'], 'ceased')
+
+    def test_missing_resource(self):
+        self.resources.status['vol-1'] = {'status': 'creating'}
+        future = self.waiter.wait('vol-missing', 'available', timeout=5)
+        waited = self.waiter.wait('vol-1', 'available', timeout=5)
+        try:
+            future.result(1)
+        except WaitFailedError as e:
+            self.assertEqual((e.resource_id, e.status), ('vol-missing', None))
+        else:
+            self.fail('WaitFailedError not raised')
+        ids = [ids for _, ids in self.resources.calls if 'vol-missing' in ids]
+        self.assertEqual(len(ids), 3)
+        self.assertFalse(waited.done())
+
+    def test_missing_without_limit(self):
+        self.waiter.max_missing_rounds = None
+        future = self.waiter.wait('vol-1', 'available', timeout=0.2)
+        self.assertRaises(WaitTimeoutError, future.result, 5)
+        self.assertEqual(self.waiter.missing, {})
+
+    def test_malformed_item(self):
+        self.resources.status['i-1'] = {'status': ['running']}
+        self.resources.status['i-2'] = {'status': 'pending'}
+        malformed = self.waiter.wait('i-1', 'running', timeout=5)
+        waited = self.waiter.wait('i-2', 'running', timeout=5)
+        self.assertRaises(TypeError, malformed.result, 5)
+        self.assertFalse(waited.done())
+        self.resources.status['i-2'] = {'status': 'running'}
+        self.assertEqual(waited.result(5)['status'], 'running')
+
+    def test_unknown_type(self):
+        self.assertRaises(ValueError, self.waiter.wait, 'unknown', 'running')
+
+
+if __name__ == '__main__':
+    unittest.main()